@@ -0,0 +1,69 @@
+"""add effective interest rate to loans
+
+Revision ID: 2c7e4b9d1a3f
+Revises: faba428b1ef5
+Create Date: 2026-10-18 21:55:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7e4b9d1a3f'
+down_revision: Union[str, None] = 'faba428b1ef5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('loans', sa.Column('effective_interest_rate', sa.Float(), nullable=True))
+
+    # Backfill existing loans in the database. The recursive query runs the
+    # same Newton iteration as calculate_effective_interest_rates on the
+    # closed-form annuity value, one row per loan per step, and stops a
+    # loan once it converges, its rate leaves the range the formula is valid
+    # for, or it runs out of steps; loans that never converge stay NULL.
+    # Exponents are clamped so no step can overflow or underflow a float8.
+    op.execute(
+        """
+        WITH RECURSIVE newton (id, principal, term, payment, rate, iteration, converged) AS (
+            SELECT id, loan_amount::float8, loan_term::float8, monthly_installment::float8, 0.1::float8, 0, false
+            FROM loans
+            WHERE loan_amount IS NOT NULL AND loan_term > 0 AND monthly_installment IS NOT NULL
+          UNION ALL
+            SELECT n.id, n.principal, n.term, n.payment,
+                   n.rate - step.npv / step.derivative, n.iteration + 1, abs(step.npv) < 1e-6
+            FROM newton n
+            CROSS JOIN LATERAL (
+                SELECT n.payment * annuity.value - n.principal AS npv,
+                       n.payment * annuity.derivative AS derivative
+                FROM (
+                    SELECT
+                        CASE WHEN abs(n.rate) < 1e-12 THEN n.term
+                             ELSE (1 - discount.value) / n.rate END AS value,
+                        CASE WHEN abs(n.rate) < 1e-12 THEN -n.term * (n.term + 1) / 2
+                             ELSE (n.term * discount.value / (1 + n.rate) * n.rate - (1 - discount.value)) / (n.rate * n.rate)
+                        END AS derivative
+                    FROM (
+                        SELECT exp(greatest(least(-n.term * ln(1 + n.rate), 700), -700)) AS value
+                    ) discount
+                ) annuity
+            ) step
+            WHERE NOT n.converged AND n.iteration < 100 AND n.rate > -1 AND n.rate < 1000
+              AND abs(step.derivative) > 1e-12
+        )
+        UPDATE loans
+        SET effective_interest_rate = newton.rate * 12 * 100
+        FROM newton
+        WHERE newton.converged AND newton.id = loans.id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('loans', 'effective_interest_rate')
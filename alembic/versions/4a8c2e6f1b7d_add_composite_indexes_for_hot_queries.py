@@ -0,0 +1,54 @@
+"""add composite indexes for hot queries
+
+Revision ID: 4a8c2e6f1b7d
+Revises: 7d3f1a9c5e2b
+Create Date: 2026-10-19 09:12:48.775310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8c2e6f1b7d'
+down_revision: Union[str, None] = '7d3f1a9c5e2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_clients_portfolio_id_employee_id', 'clients', ['portfolio_id', 'employee_id']),
+    ('ix_loans_portfolio_id_employee_id', 'loans', ['portfolio_id', 'employee_id']),
+    ('ix_loans_portfolio_id_ndia', 'loans', ['portfolio_id', 'ndia']),
+    ('ix_loans_portfolio_id_loan_no', 'loans', ['portfolio_id', 'loan_no']),
+    ('ix_guarantees_portfolio_id', 'guarantees', ['portfolio_id']),
+    ('ix_securities_client_id', 'securities', ['client_id']),
+    ('ix_quality_issues_portfolio_id_status', 'quality_issues', ['portfolio_id', 'status']),
+    ('ix_reports_portfolio_id_created_at', 'reports', ['portfolio_id', 'created_at']),
+    ('ix_staging_results_portfolio_id_type_created_at', 'staging_results', ['portfolio_id', 'staging_type', 'created_at']),
+    ('ix_calculation_results_portfolio_id_type_created_at', 'calculation_results', ['portfolio_id', 'calculation_type', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY avoids blocking ingestion writes while the indexes build,
+    # but can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+    for table in sorted({table for _, table, _ in INDEXES}):
+        op.execute(sa.text(f'ANALYZE {table}'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,37 @@
+"""add background tasks table
+
+Revision ID: 7d3f1a9c5e2b
+Revises: 2c7e4b9d1a3f
+Create Date: 2026-10-18 22:41:37.502113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f1a9c5e2b'
+down_revision: Union[str, None] = '2c7e4b9d1a3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('background_tasks',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('task_type', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('state', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_background_tasks_status'), 'background_tasks', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_background_tasks_status'), table_name='background_tasks')
+    op.drop_table('background_tasks')
@@ -0,0 +1,39 @@
+"""add quality issue listing index
+
+Revision ID: b3f7c1e9d2a4
+Revises: 4a8c2e6f1b7d
+Create Date: 2026-10-19 16:40:12.093518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f7c1e9d2a4'
+down_revision: Union[str, None] = '4a8c2e6f1b7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Matches the keyset order of the quality issues listing
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_quality_issues_portfolio_id_severity_created_at_id', 'quality_issues',
+            ['portfolio_id', 'severity', 'created_at', 'id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+    op.execute(sa.text('ANALYZE quality_issues'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_quality_issues_portfolio_id_severity_created_at_id', table_name='quality_issues',
+            postgresql_concurrently=True, if_exists=True,
+        )
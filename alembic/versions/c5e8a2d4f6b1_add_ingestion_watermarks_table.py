@@ -0,0 +1,37 @@
+"""add ingestion watermarks table
+
+Revision ID: c5e8a2d4f6b1
+Revises: b3f7c1e9d2a4
+Create Date: 2026-10-20 10:12:48.305517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a2d4f6b1'
+down_revision: Union[str, None] = 'b3f7c1e9d2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_watermarks',
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('checked_version', sa.Integer(), nullable=False),
+    sa.Column('ingested_at', sa.DateTime(), nullable=True),
+    sa.Column('checked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('portfolio_id', 'table_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ingestion_watermarks')
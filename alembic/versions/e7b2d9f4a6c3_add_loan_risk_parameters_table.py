@@ -0,0 +1,37 @@
+"""add loan risk parameters table
+
+Revision ID: e7b2d9f4a6c3
+Revises: c5e8a2d4f6b1
+Create Date: 2026-10-20 15:27:06.814392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2d9f4a6c3'
+down_revision: Union[str, None] = 'c5e8a2d4f6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('loan_risk_parameters',
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('loan_no', sa.String(), nullable=False),
+    sa.Column('parameter', sa.String(length=10), nullable=False),
+    sa.Column('fingerprint', sa.String(length=32), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('portfolio_id', 'loan_no', 'parameter')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('loan_risk_parameters')
@@ -0,0 +1,61 @@
+"""add calculation loan results table
+
+Revision ID: f3a9c7e1b5d8
+Revises: e7b2d9f4a6c3
+Create Date: 2026-10-21 09:41:23.570218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c7e1b5d8'
+down_revision: Union[str, None] = 'e7b2d9f4a6c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('calculation_loan_results',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('calculation_id', sa.Integer(), nullable=False),
+    sa.Column('calculation_type', sa.String(), nullable=False),
+    sa.Column('loan_id', sa.Integer(), nullable=False),
+    sa.Column('loan_no', sa.String(), nullable=True),
+    sa.Column('employee_id', sa.String(), nullable=True),
+    sa.Column('branch', sa.String(), nullable=True),
+    sa.Column('stage', sa.String(), nullable=False),
+    sa.Column('outstanding_loan_balance', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('ead_value', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('pd', sa.Float(), nullable=True),
+    sa.Column('lgd', sa.Float(), nullable=True),
+    sa.Column('ecl', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('provision', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['calculation_id'], ['calculation_results.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_calculation_loan_results_calculation_id_id', 'calculation_loan_results', ['calculation_id', 'id'], unique=False)
+    op.create_index('ix_calculation_loan_results_calculation_id_stage_id', 'calculation_loan_results', ['calculation_id', 'stage', 'id'], unique=False)
+    op.create_index('ix_calculation_loan_results_calculation_id_balance_id', 'calculation_loan_results', ['calculation_id', 'outstanding_loan_balance', 'id'], unique=False)
+    op.create_index('ix_calculation_loan_results_calculation_id_ead_value_id', 'calculation_loan_results', ['calculation_id', 'ead_value', 'id'], unique=False, postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.create_index('ix_calculation_loan_results_calculation_id_pd_id', 'calculation_loan_results', ['calculation_id', 'pd', 'id'], unique=False, postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.create_index('ix_calculation_loan_results_calculation_id_lgd_id', 'calculation_loan_results', ['calculation_id', 'lgd', 'id'], unique=False, postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.create_index('ix_calculation_loan_results_calculation_id_ecl_id', 'calculation_loan_results', ['calculation_id', 'ecl', 'id'], unique=False, postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.create_index('ix_calculation_loan_results_calculation_id_provision_id', 'calculation_loan_results', ['calculation_id', 'provision', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_calculation_loan_results_calculation_id_provision_id', table_name='calculation_loan_results')
+    op.drop_index('ix_calculation_loan_results_calculation_id_ecl_id', table_name='calculation_loan_results', postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.drop_index('ix_calculation_loan_results_calculation_id_lgd_id', table_name='calculation_loan_results', postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.drop_index('ix_calculation_loan_results_calculation_id_pd_id', table_name='calculation_loan_results', postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.drop_index('ix_calculation_loan_results_calculation_id_ead_value_id', table_name='calculation_loan_results', postgresql_where=sa.text("calculation_type = 'ecl'"))
+    op.drop_index('ix_calculation_loan_results_calculation_id_balance_id', table_name='calculation_loan_results')
+    op.drop_index('ix_calculation_loan_results_calculation_id_stage_id', table_name='calculation_loan_results')
+    op.drop_index('ix_calculation_loan_results_calculation_id_id', table_name='calculation_loan_results')
+    op.drop_table('calculation_loan_results')
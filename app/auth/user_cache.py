@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import settings
+from app.models import User
+
+# Never cached, so it's loaded from the database only when needed
+UNCACHED_COLUMNS = {"hashed_password"}
+
+
+class UserCache:
+    """
+    Short-lived, size-bounded cache of authenticated users' column values by
+    email, so authenticating a request doesn't need a query every time.
+
+    Each worker process has its own cache. Routes that change a user's role,
+    active flag, email or password invalidate it in their process; other
+    workers see the change once the entry expires after ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, email: str, values: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl_seconds, values)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: Optional[str] = None) -> None:
+        """Drop one user's entry, or every entry when email is None."""
+        with self._lock:
+            if email is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(email, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+user_cache = UserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_SIZE)
+
+
+def _column_values(user: User) -> Dict[str, Any]:
+    return {
+        column.key: getattr(user, column.key)
+        for column in inspect(User).column_attrs
+        if column.key not in UNCACHED_COLUMNS
+    }
+
+
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    """
+    The user with this email, attached to db.
+
+    On a cache hit the user is rebuilt from the cached values and merged into
+    the session without a query, so it behaves like a loaded user: changes
+    are flushed, relationships and the password hash load on access.
+    """
+    values = user_cache.get(email) if user_cache.enabled else None
+    if values is None:
+        user = db.query(User).filter(User.email == email).first()
+        if user is not None:
+            user_cache.put(email, _column_values(user))
+        return user
+
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, WebSocket, Query
@@ -12,11 +12,18 @@ import os
 from dotenv import load_dotenv
 from app import models
 from app.config import settings
+from app.auth.user_cache import get_user_by_email
 
 
 ALGORITHM = "HS256"
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -24,6 +31,17 @@ def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if its hash was made with other argon2 parameters
+    than the configured ones, return a new hash to store (otherwise None).
+
+    Hashing is CPU-bound for tens of milliseconds: call this and
+    get_password_hash from async routes with run_in_threadpool.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
@@ -126,7 +144,7 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = get_user_by_email(db, token_data.email)
     if user is None:
         raise credentials_exception
     return user
@@ -159,7 +177,7 @@ async def get_current_active_user_ws(
             await websocket.close(code=1008, reason="Invalid token type")
             return None
             
-        user = db.query(User).filter(User.email == token_data.email).first()
+        user = get_user_by_email(db, token_data.email)
         if user is None or not user.is_active:
             await websocket.close(code=1008, reason="Invalid or inactive user")
             return None
@@ -1,11 +1,13 @@
-import pickle
-import pandas as pd
+import hashlib
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional, Tuple, List, Union, Dict, Any
+from functools import lru_cache
+from typing import Optional, Tuple, List, Union, Dict, Any, Iterable
 from app.models import Client
-import numpy as np
 import math
+import warnings
+
+PD_MODEL_PATH = "app/ml_models/logistic_model.pkl"
 
 
 def calculate_effective_interest_rate_lender(loan_amount, administrative_fees, loan_term, monthly_payment):
@@ -56,6 +58,82 @@ def calculate_effective_interest_rate_lender(loan_amount, administrative_fees, l
         return None  # Handle potential errors
 
 
+def calculate_effective_interest_rates(loan_amounts, loan_terms, monthly_payments, max_iterations=100, tolerance=1e-6):
+    """
+    Vectorized version of calculate_effective_interest_rate_lender for many loans at once.
+    Solves the same Newton IRR on the annuity cash flows [-loan_amount] + [monthly_payment] * loan_term
+    using the closed-form present value, so the cost is independent of the loan term.
+
+    Args:
+        loan_amounts: Array-like of original loan amounts.
+        loan_terms: Array-like of loan terms in months.
+        monthly_payments: Array-like of monthly payment amounts.
+
+    Returns:
+        np.ndarray: Effective annual interest rates as percentages, NaN where the calculation fails.
+    """
+    import numpy as np
+
+    principal = np.asarray(loan_amounts, dtype=float)
+    term = np.asarray(loan_terms, dtype=float)
+    payment = np.asarray(monthly_payments, dtype=float)
+
+    rates = np.full(principal.shape, 0.1)
+    monthly_rates = np.full(principal.shape, np.nan)
+    active = np.isfinite(principal) & np.isfinite(term) & np.isfinite(payment) & (term > 0)
+
+    with np.errstate(all="ignore"):
+        for _ in range(max_iterations):
+            idx = np.flatnonzero(active)
+            if idx.size == 0:
+                break
+
+            r = rates[idx]
+            n = term[idx]
+            discount = (1 + r) ** -n
+            near_zero = np.abs(r) < 1e-12
+
+            # Present value of the installments and its derivative with respect to the rate
+            annuity = np.where(near_zero, n, (1 - discount) / r)
+            annuity_derivative = np.where(
+                near_zero,
+                -n * (n + 1) / 2,
+                (n * discount / (1 + r) * r - (1 - discount)) / r**2,
+            )
+            npv = payment[idx] * annuity - principal[idx]
+            derivative = payment[idx] * annuity_derivative
+
+            new_r = r - npv / derivative
+            failed = ~np.isfinite(new_r) | (derivative == 0)
+            converged = ~failed & (np.abs(npv) < tolerance)
+
+            rates[idx] = new_r
+            monthly_rates[idx[converged]] = new_r[converged]
+            active[idx[converged | failed]] = False
+
+    return monthly_rates * 12 * 100  # Return as percentage
+
+
+def get_effective_interest_rate(loan):
+    """
+    Return the loan's effective annual interest rate (percentage).
+    Uses the value stored at ingestion and only solves the IRR for loans without one.
+    """
+    stored_rate = getattr(loan, "effective_interest_rate", None)
+    if stored_rate is not None:
+        return stored_rate
+
+    try:
+        return calculate_effective_interest_rate_lender(
+            loan_amount=float(loan.loan_amount),
+            administrative_fees=float(loan.administrative_fees or 0),
+            loan_term=int(loan.loan_term),
+            monthly_payment=float(loan.monthly_installment),
+        )
+    except (TypeError, ValueError):
+        return None
+
+
 def calculate_loss_given_default(
     loan: Union[Dict[str, Any], Any],
     client_securities: List[Union[Dict[str, Any], Any]],
@@ -250,6 +328,61 @@ def is_in_range(value: int, range_tuple: Tuple[int, Optional[int]]) -> bool:
 
 
 
+@lru_cache(maxsize=1)
+def load_pd_model():
+    """
+    Load the pre-trained logistic regression PD model.
+    The model is unpickled once per process and reused by every caller.
+    """
+    import pickle
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning,
+                              message="Trying to unpickle estimator")
+        with open(PD_MODEL_PATH, "rb") as file:
+            return pickle.load(file)
+
+
+@lru_cache(maxsize=1)
+def pd_model_version() -> str:
+    """Hash of the PD model file, so values predicted by an older model can be told apart."""
+    with open(PD_MODEL_PATH, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+
+def predict_probability_of_default(years_of_birth: Iterable[int]) -> Dict[int, float]:
+    """
+    Predict Probability of Default for a set of birth years in one model call.
+
+    Parameters:
+    - years_of_birth: Birth years to score (duplicates are scored once)
+
+    Returns:
+    - dict: Year of birth mapped to probability of default as a percentage (0-100)
+    """
+    import pandas as pd
+
+    years = sorted(set(years_of_birth))
+    if not years:
+        return {}
+
+    model = load_pd_model()
+
+    # Get feature name from the model if available
+    if hasattr(model, 'feature_names_in_'):
+        feature_name = model.feature_names_in_[0]  # Assuming only one feature
+    else:
+        feature_name = 'year_of_birth'  # Default name if not found
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=UserWarning,
+                              message="X does not have valid feature names")
+        X_new = pd.DataFrame({feature_name: years})
+        probabilities = model.predict_proba(X_new)[:, 1]
+
+    return {year: float(probability) * 100 for year, probability in zip(years, probabilities)}
+
+
 def calculate_probability_of_default(loan, db):
     """
     Calculate Probability of Default using the machine learning model based on customer age
@@ -275,8 +408,7 @@ def calculate_probability_of_default(loan, db):
                                   message="Trying to unpickle estimator")
         
             # Load the pre-trained logistic regression model
-            with open("app/ml_models/logistic_model.pkl", "rb") as file:
-                model = pickle.load(file)
+            model = load_pd_model()
                 
             # Get client associated with this loan's employee_id
             client = db.query(Client).filter(
@@ -1,6 +1,6 @@
 import re
 from decimal import Decimal
-from typing import List, Dict, Optional, Union, Tuple
+from typing import TYPE_CHECKING, List, Dict, Optional, Union, Tuple
 from app.models import Loan
 from app.schemas import (
     ImpairmentConfig,
@@ -11,6 +11,9 @@ from app.schemas import (
 )
 from datetime import date
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
 def parse_days_range(days_range: str) -> Tuple[int, Optional[int]]:
     """
@@ -50,6 +53,90 @@ def calculate_days_past_due(loan) -> int:
         return 0
 
 
+# Category order for the columnar functions; -1 marks a loan in no category
+CATEGORIES = ("current", "olem", "substandard", "doubtful", "loss")
+
+
+def parse_category_ranges(config: ImpairmentConfig) -> List[Tuple[int, Optional[int]]]:
+    """(min_days, max_days) for each category, in CATEGORIES order"""
+    return [parse_days_range(getattr(config, name).days_range) for name in CATEGORIES]
+
+
+def _category_for_days(days_past_due, ranges: List[Tuple[int, Optional[int]]]) -> int:
+    """
+    Category index for one days past due value. The first matching range
+    wins, and loss has no upper limit.
+    """
+    for index, (min_days, max_days) in enumerate(ranges[:-1]):
+        if min_days <= days_past_due <= (max_days or float("inf")):
+            return index
+    if ranges[-1][0] <= days_past_due:
+        return len(ranges) - 1
+    return -1
+
+
+def categorize_days_past_due(days_past_due: "np.ndarray", config: ImpairmentConfig) -> "np.ndarray":
+    """
+    Category index (see CATEGORIES) for each days past due value, or -1.
+
+    The range bounds split the number line into segments (each bound on its
+    own, and the open intervals between them) within which no category rule
+    changes, so each segment is classified once and the values are mapped
+    to their segment with np.searchsorted.
+    """
+    import numpy as np
+
+    ranges = parse_category_ranges(config)
+    bounds = np.array(sorted({bound for days_range in ranges for bound in days_range if bound is not None}), dtype=float)
+
+    # Segment 2i is the interval below bounds[i], 2i + 1 is bounds[i] itself
+    representatives = []
+    for i, bound in enumerate(bounds):
+        lower = bounds[i - 1] if i else bound - 1
+        representatives += [(lower + bound) / 2, bound]
+    representatives.append(bounds[-1] + 1)
+    segment_categories = np.array([_category_for_days(value, ranges) for value in representatives], dtype=np.int8)
+
+    days_past_due = np.asarray(days_past_due, dtype=float)
+    index = np.searchsorted(bounds, days_past_due, side="left")
+    on_bound = bounds[np.minimum(index, len(bounds) - 1)] == days_past_due
+    return segment_categories[2 * index + on_bound]
+
+
+def impairment_columns(loans) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Days past due and outstanding balance in cents for each loan. Works on
+    Loan objects or rows of (ndia, accumulated_arrears, monthly_installment,
+    outstanding_loan_balance).
+
+    Balances are stored with two decimal places, so they sum exactly as
+    integer cents.
+    """
+    import numpy as np
+
+    days_past_due = np.array([loan.ndia for loan in loans], dtype=float)
+    # Loans without ndia estimate it from arrears with Decimal arithmetic
+    for i in np.flatnonzero(np.isnan(days_past_due)):
+        days_past_due[i] = calculate_days_past_due(loans[i])
+
+    balances = np.array([loan.outstanding_loan_balance for loan in loans], dtype=float)
+    balance_cents = np.rint(np.nan_to_num(balances) * 100).astype(np.int64)
+    return days_past_due, balance_cents
+
+
+def calculate_category_totals(
+    days_past_due: "np.ndarray", balance_cents: "np.ndarray", config: ImpairmentConfig
+) -> List[Decimal]:
+    """Total outstanding balance of each category, in CATEGORIES order"""
+    import numpy as np
+
+    categories = categorize_days_past_due(days_past_due, config)
+    categorized = categories >= 0
+    totals = np.zeros(len(CATEGORIES), dtype=np.int64)
+    np.add.at(totals, categories[categorized], balance_cents[categorized])
+    return [Decimal(int(total)) / 100 for total in totals]
+
+
 def calculate_loan_impairment(
     loans: List[Loan], config: ImpairmentConfig
 ) -> Tuple[List[Loan], List[Loan], List[Loan], List[Loan], List[Loan]]:
@@ -57,44 +144,21 @@ def calculate_loan_impairment(
     Categorize loans based on days past due according to the provided configuration
     Returns categorized loan lists: (current, olem, substandard, doubtful, loss)
     """
-    # Parse day ranges from the configuration
-    current_min, current_max = parse_days_range(config.current.days_range)
-    olem_min, olem_max = parse_days_range(config.olem.days_range)
-    substandard_min, substandard_max = parse_days_range(config.substandard.days_range)
-    doubtful_min, doubtful_max = parse_days_range(config.doubtful.days_range)
-    loss_min, loss_max = parse_days_range(config.loss.days_range)
-
-    # Initialize category lists
-    current_loans = []
-    olem_loans = []
-    substandard_loans = []
-    doubtful_loans = []
-    loss_loans = []
-
-    # Categorize loans based on days past due
-    for loan in loans:
-        days_past_due = calculate_days_past_due(loan)
-
-        # Categorize the loan based on frontend-provided config
-        if current_min <= days_past_due <= (current_max or float("inf")):
-            current_loans.append(loan)
-        elif olem_min <= days_past_due <= (olem_max or float("inf")):
-            olem_loans.append(loan)
-        elif substandard_min <= days_past_due <= (substandard_max or float("inf")):
-            substandard_loans.append(loan)
-        elif doubtful_min <= days_past_due <= (doubtful_max or float("inf")):
-            doubtful_loans.append(loan)
-        elif loss_min <= days_past_due:
-            loss_loans.append(loan)
-
-    return current_loans, olem_loans, substandard_loans, doubtful_loans, loss_loans
+    import numpy as np
+
+    loans = list(loans)
+    days_past_due, _ = impairment_columns(loans)
+    categories = categorize_days_past_due(days_past_due, config)
+    return tuple(
+        [loans[i] for i in np.flatnonzero(categories == index)]
+        for index in range(len(CATEGORIES))
+    )
 
 
-def calculate_category_data(
-    loans: List[Loan], category_config: ImpairmentCategory
+def category_data_from_total(
+    total_value, category_config: ImpairmentCategory
 ) -> ImpairmentCategoryData:
-    """Calculate impairment data for a loan category"""
-    total_value = sum(loan.outstanding_loan_balance or 0 for loan in loans)
+    """Impairment data for a category with the given total outstanding balance"""
     provision = Decimal(total_value) * Decimal(category_config.rate / 100)
 
     return ImpairmentCategoryData(
@@ -105,6 +169,14 @@ def calculate_category_data(
     )
 
 
+def calculate_category_data(
+    loans: List[Loan], category_config: ImpairmentCategory
+) -> ImpairmentCategoryData:
+    """Calculate impairment data for a loan category"""
+    total_value = sum(loan.outstanding_loan_balance or 0 for loan in loans)
+    return category_data_from_total(total_value, category_config)
+
+
 def calculate_impairment_summary(
     portfolio_id: int, loans: List[Loan], config: ImpairmentConfig, reporting_date: date
 ) -> LocalImpairmentSummary:
@@ -120,17 +192,34 @@ def calculate_impairment_summary(
     Returns:
         Complete impairment summary with category data and totals
     """
-    # Categorize loans
-    current_loans, olem_loans, substandard_loans, doubtful_loans, loss_loans = (
-        calculate_loan_impairment(loans, config)
+    days_past_due, balance_cents = impairment_columns(list(loans))
+    return calculate_impairment_summary_from_columns(
+        portfolio_id, days_past_due, balance_cents, config, reporting_date
+    )
+
+
+def calculate_impairment_summary_from_columns(
+    portfolio_id: int,
+    days_past_due: "np.ndarray",
+    balance_cents: "np.ndarray",
+    config: ImpairmentConfig,
+    reporting_date: date,
+) -> LocalImpairmentSummary:
+    """
+    calculate_impairment_summary over columns from impairment_columns, so
+    callers can load them straight from a query.
+    """
+    # Bin loans and total each category in one pass
+    current_total, olem_total, substandard_total, doubtful_total, loss_total = (
+        calculate_category_totals(days_past_due, balance_cents, config)
     )
 
     # Calculate data for each category
-    current_data = calculate_category_data(current_loans, config.current)
-    olem_data = calculate_category_data(olem_loans, config.olem)
-    substandard_data = calculate_category_data(substandard_loans, config.substandard)
-    doubtful_data = calculate_category_data(doubtful_loans, config.doubtful)
-    loss_data = calculate_category_data(loss_loans, config.loss)
+    current_data = category_data_from_total(current_total, config.current)
+    olem_data = category_data_from_total(olem_total, config.olem)
+    substandard_data = category_data_from_total(substandard_total, config.substandard)
+    doubtful_data = category_data_from_total(doubtful_total, config.doubtful)
+    loss_data = category_data_from_total(loss_total, config.loss)
 
     # Calculate summary metrics
     total_loan_value = (
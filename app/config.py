@@ -1,6 +1,6 @@
 from dotenv import load_dotenv
 import os
-from app.utils.db import convert_libpq_to_sqlalchemy
+from app.utils.db import convert_libpq_to_sqlalchemy, normalize_postgres_url, to_asyncpg_url
 
 load_dotenv()  # Load environment variables from .env
 
@@ -10,6 +10,53 @@ class Settings:
     INVITATION_EXPIRE_HOURS: int = int(os.getenv("INVITATION_EXPIRE_HOURS", "24"))
     ACCESS_TOKEN_EXPIRE_HOURS: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_HOURS", "24"))
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Argon2 password hashing cost (passlib's defaults). Hashes made with
+    # other parameters are rehashed on the user's next login
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", "2"))
+    ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", "102400"))  # KiB
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", "8"))
+    # Authenticated users cached per worker; USER_CACHE_TTL_SECONDS=0 disables
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+    # Connection pools. Background jobs use a separate pool from API requests
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no timeout
+    BACKGROUND_DB_POOL_SIZE: int = int(os.getenv("BACKGROUND_DB_POOL_SIZE", "4"))
+    BACKGROUND_DB_MAX_OVERFLOW: int = int(os.getenv("BACKGROUND_DB_MAX_OVERFLOW", "4"))
+    # Ingestion and calculations run long statements, so no timeout by default
+    BACKGROUND_DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("BACKGROUND_DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = no timeout
+    # Async engine for read-heavy endpoints; used when asyncpg is installed
+    DB_ASYNC_ENABLED: bool = os.getenv("DB_ASYNC_ENABLED", "true").lower() == "true"
+    ASYNC_DB_POOL_SIZE: int = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+    ASYNC_DB_MAX_OVERFLOW: int = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+    # "memory" keeps task state per process; "database" shares it between workers
+    TASK_REGISTRY_BACKEND: str = os.getenv("TASK_REGISTRY_BACKEND", "memory")
+    TASK_PUBLISH_INTERVAL_SECONDS: float = float(os.getenv("TASK_PUBLISH_INTERVAL_SECONDS", "1.0"))
+    TASK_PROGRESS_MAX_UPDATES_PER_SECOND: float = float(os.getenv("TASK_PROGRESS_MAX_UPDATES_PER_SECOND", "4"))
+    WS_HEARTBEAT_SECONDS: float = float(os.getenv("WS_HEARTBEAT_SECONDS", "30"))
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+    # Periodic maintenance; MAINTENANCE_INTERVAL_MINUTES=0 disables the scheduler
+    MAINTENANCE_INTERVAL_MINUTES: int = int(os.getenv("MAINTENANCE_INTERVAL_MINUTES", "60"))
+    MAINTENANCE_BATCH_SIZE: int = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+    TASK_RETENTION_HOURS: int = int(os.getenv("TASK_RETENTION_HOURS", "24"))
+    # Staging and calculation results kept per portfolio and type
+    RESULT_RETENTION_KEEP_LAST: int = int(os.getenv("RESULT_RETENTION_KEEP_LAST", "10"))
+    # Background job executor. Keep JOB_IO_WORKERS at or below the task
+    # manager's max_concurrent_tasks (5)
+    JOB_IO_WORKERS: int = int(os.getenv("JOB_IO_WORKERS", "4"))
+    JOB_CPU_WORKERS: int = int(os.getenv("JOB_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+    JOB_INGESTION_MAX_CONCURRENT: int = int(os.getenv("JOB_INGESTION_MAX_CONCURRENT", "2"))
+    JOB_CALCULATION_MAX_CONCURRENT: int = int(os.getenv("JOB_CALCULATION_MAX_CONCURRENT", "2"))
+    JOB_MAX_QUEUED: int = int(os.getenv("JOB_MAX_QUEUED", "20"))
+    # Retry-After sent with the 503 when a job type's queue is full
+    JOB_QUEUE_RETRY_AFTER_SECONDS: int = int(os.getenv("JOB_QUEUE_RETRY_AFTER_SECONDS", "30"))
+    # Longest acceptable `import main` in a fresh interpreter (benchmark.py
+    # startup and tests/test_startup.py)
+    STARTUP_IMPORT_BUDGET_MS: float = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
     
     @property
     def SQLALCHEMY_DATABASE_URL(self) -> str:
@@ -21,8 +68,18 @@ class Settings:
             # Fallback to the original env var if DATABASE_URL is not set
             db_url = os.getenv("SQLALCHEMY_DATABASE_URL")
             
-        if db_url and (db_url.startswith("dbname=") or not db_url.startswith("postgresql://")):
+        if db_url and (db_url.startswith("dbname=") or "://" not in db_url):
             return convert_libpq_to_sqlalchemy(db_url)
-        return db_url
+        return normalize_postgres_url(db_url)
+
+    @property
+    def ASYNC_SQLALCHEMY_DATABASE_URL(self) -> str:
+        """
+        The database URL for the asyncpg driver, which takes ssl= instead of sslmode=.
+        """
+        db_url = self.SQLALCHEMY_DATABASE_URL
+        if not db_url:
+            return db_url
+        return to_asyncpg_url(db_url)
 
 settings = Settings()
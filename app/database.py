@@ -1,11 +1,103 @@
+from contextlib import contextmanager
+
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.utils.db_metrics import InstrumentedQueuePool, PoolMetrics
+
+
+def _create_engine(pool_size: int, max_overflow: int, statement_timeout_ms: int):
+    connect_args = {}
+    if statement_timeout_ms > 0:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    return create_engine(
+        settings.SQLALCHEMY_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
 
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL)
+# API requests
+engine = _create_engine(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_STATEMENT_TIMEOUT_MS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessions behind ThreadedSession. Like AsyncSessionLocal they don't expire
+# objects on commit, so endpoints can read attributes after committing
+# without a lazy load outside the threadpool.
+ThreadedSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
+
+# Background jobs get their own pool so long-running work can't starve requests
+background_engine = _create_engine(
+    settings.BACKGROUND_DB_POOL_SIZE, settings.BACKGROUND_DB_MAX_OVERFLOW, settings.BACKGROUND_DB_STATEMENT_TIMEOUT_MS
+)
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+
+pool_metrics = {
+    "api": PoolMetrics("api", engine),
+    "background": PoolMetrics("background", background_engine),
+}
+
+
+def _create_async_engine():
+    if not settings.DB_ASYNC_ENABLED:
+        return None
+    try:
+        import asyncpg  # noqa: F401
+    except ImportError:
+        return None
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+
+    return create_async_engine(
+        settings.ASYNC_SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.ASYNC_DB_POOL_SIZE,
+        max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+# Read-heavy endpoints; None when asyncpg isn't installed or DB_ASYNC_ENABLED is false
+async_engine = _create_async_engine()
+AsyncSessionLocal = None
+if async_engine is not None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    pool_metrics["async"] = PoolMetrics("async", async_engine.sync_engine)
+
+
+class ThreadedSession:
+    """
+    Stand-in for AsyncSession when no async engine is configured: runs a
+    regular Session in the threadpool so async endpoints still don't block
+    the event loop. Covers the AsyncSession methods the endpoints use.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, statement, params=None):
+        return await run_in_threadpool(self.session.execute, statement, params)
+
+    async def scalar(self, statement, params=None):
+        return await run_in_threadpool(self.session.scalar, statement, params)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
 
 Base = declarative_base()
 
@@ -18,6 +110,39 @@ def get_db():
         db.close()
 
 
+@contextmanager
+def background_session(request_db=None):
+    """
+    Session on the background pool for long-running work (ingestion,
+    calculations, exports). Pass the request's session as request_db to
+    close it first, so the work doesn't hold an API connection as well;
+    objects it loaded stay readable but detached.
+    """
+    if request_db is not None:
+        request_db.close()
+    db = BackgroundSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """
+    Session dependency for async endpoints. Yields an AsyncSession, or a
+    ThreadedSession when the async engine is unavailable.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadedSessionLocal()
+        try:
+            yield ThreadedSession(db)
+        finally:
+            await run_in_threadpool(db.close)
+
+
 # Initialize the database
 def init_db():
     # Import models here to avoid circular imports
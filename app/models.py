@@ -1,4 +1,5 @@
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
@@ -11,7 +12,9 @@ from sqlalchemy import (
     Float,
     JSON,
     Table,
-    UniqueConstraint
+    UniqueConstraint,
+    Index,
+    text,
 )
 from sqlalchemy.sql import func
 from enum import Enum as PyEnum
@@ -157,7 +160,11 @@ class Title(str, PyEnum):
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        Index("ix_clients_portfolio_id_employee_id", "portfolio_id", "employee_id"),
+    )
 
+    # Indexed but not a database primary key once partitioned (see partition_tables.py)
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
     employee_id = Column(String, nullable=True)
@@ -204,7 +211,13 @@ class DeductionStatus(str, PyEnum):
 
 class Loan(Base):
     __tablename__ = "loans"
+    __table_args__ = (
+        Index("ix_loans_portfolio_id_employee_id", "portfolio_id", "employee_id"),
+        Index("ix_loans_portfolio_id_ndia", "portfolio_id", "ndia"),
+        Index("ix_loans_portfolio_id_loan_no", "portfolio_id", "loan_no"),
+    )
 
+    # Indexed but not a database primary key once partitioned (see partition_tables.py)
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
     loan_no = Column(String, index=True, nullable=True) 
@@ -246,12 +259,17 @@ class Loan(Base):
     admin_charge = Column(Numeric(precision=18, scale=2), default=0)
     recovery_rate = Column(Float, default=0)
     deduction_status = Column(String, default=DeductionStatus.PENDING)
+    effective_interest_rate = Column(Float, nullable=True)  # Annual %, computed at ingestion
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     portfolio = relationship("Portfolio", back_populates="loans")
 
 class Guarantee(Base):
     __tablename__ = "guarantees"
+    __table_args__ = (
+        Index("ix_guarantees_portfolio_id", "portfolio_id"),
+    )
+    # Indexed but not a database primary key once partitioned (see partition_tables.py)
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=True)
     guarantor = Column(String, nullable=False)
@@ -276,8 +294,12 @@ class SecurityType(str, PyEnum):
 
 class Security(Base):
     __tablename__ = "securities"
+    __table_args__ = (
+        Index("ix_securities_client_id", "client_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    # No database foreign key once clients is partitioned (see partition_tables.py)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
     collateral_description = Column(Text, nullable=True)
     collateral_value = Column(Numeric(precision=18, scale=2), nullable=False)
@@ -311,6 +333,7 @@ class OtherLoans(Base):
     __tablename__ = "other_loans"
 
     id = Column(Integer, primary_key=True, index=True)
+    # No database foreign key once clients is partitioned (see partition_tables.py)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
     loan_amount = Column(Numeric(precision=18, scale=2), nullable=False)
     extending_party = Column(String, default=ExtendingParty.BANK)
@@ -333,6 +356,10 @@ class MacroEcos(Base):
 
 class QualityIssue(Base):
     __tablename__ = "quality_issues"
+    __table_args__ = (
+        Index("ix_quality_issues_portfolio_id_status", "portfolio_id", "status"),
+        Index("ix_quality_issues_portfolio_id_severity_created_at_id", "portfolio_id", "severity", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"))
@@ -367,6 +394,9 @@ class QualityIssueComment(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_portfolio_id_created_at", "portfolio_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(
@@ -461,6 +491,9 @@ class StagingResult(Base):
     Stores the results of loan staging operations, either for local impairment or ECL.
     """
     __tablename__ = "staging_results"
+    __table_args__ = (
+        Index("ix_staging_results_portfolio_id_type_created_at", "portfolio_id", "staging_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"))
@@ -478,6 +511,9 @@ class CalculationResult(Base):
     Stores the results of calculation operations, either for local impairment or ECL.
     """
     __tablename__ = "calculation_results"
+    __table_args__ = (
+        Index("ix_calculation_results_portfolio_id_type_created_at", "portfolio_id", "calculation_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"))
@@ -493,3 +529,97 @@ class CalculationResult(Base):
     portfolio = relationship("Portfolio", back_populates="calculation_results")
 
 
+class CalculationLoanResult(Base):
+    """
+    One loan's line in a calculation: its ECL stage or impairment category and
+    the values computed for it, so a calculation's loans can be filtered,
+    sorted and paged without recomputing it. Each sortable value has an
+    index led by calculation_id, with id as the tie-breaker for cursors. The
+    values only ECL calculations fill in are indexed for ECL rows alone.
+    """
+    __tablename__ = "calculation_loan_results"
+    __table_args__ = (
+        Index("ix_calculation_loan_results_calculation_id_id", "calculation_id", "id"),
+        Index("ix_calculation_loan_results_calculation_id_stage_id", "calculation_id", "stage", "id"),
+        Index("ix_calculation_loan_results_calculation_id_balance_id", "calculation_id", "outstanding_loan_balance", "id"),
+        Index(
+            "ix_calculation_loan_results_calculation_id_ead_value_id", "calculation_id", "ead_value", "id",
+            postgresql_where=text("calculation_type = 'ecl'"),
+        ),
+        Index(
+            "ix_calculation_loan_results_calculation_id_pd_id", "calculation_id", "pd", "id",
+            postgresql_where=text("calculation_type = 'ecl'"),
+        ),
+        Index(
+            "ix_calculation_loan_results_calculation_id_lgd_id", "calculation_id", "lgd", "id",
+            postgresql_where=text("calculation_type = 'ecl'"),
+        ),
+        Index(
+            "ix_calculation_loan_results_calculation_id_ecl_id", "calculation_id", "ecl", "id",
+            postgresql_where=text("calculation_type = 'ecl'"),
+        ),
+        Index("ix_calculation_loan_results_calculation_id_provision_id", "calculation_id", "provision", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    calculation_id = Column(Integer, ForeignKey("calculation_results.id", ondelete="CASCADE"), nullable=False)
+    calculation_type = Column(String, nullable=False)  # The calculation's type, for the partial indexes
+    loan_id = Column(Integer, nullable=False)
+    loan_no = Column(String, nullable=True)
+    employee_id = Column(String, nullable=True)
+    branch = Column(String, nullable=True)  # The loan's location_code
+    stage = Column(String, nullable=False)  # "Stage 1".."Stage 3", or "Current".."Loss"
+    outstanding_loan_balance = Column(Numeric(precision=18, scale=2), nullable=False)
+    ead_value = Column(Numeric(precision=18, scale=2), nullable=True)  # ECL calculations only
+    pd = Column(Float, nullable=True)  # ECL calculations only
+    lgd = Column(Float, nullable=True)  # ECL calculations only
+    ecl = Column(Numeric(precision=18, scale=2), nullable=True)  # Loan-level ECL, ECL calculations only
+    provision = Column(Numeric(precision=18, scale=2), nullable=False)  # Balance at the stage's provision rate
+
+
+
+
+class BackgroundTask(Base):
+    """
+    Shared state of background tasks, so every worker process can report
+    progress for tasks started on another worker.
+    """
+    __tablename__ = "background_tasks"
+
+    id = Column(String, primary_key=True)  # Task UUID
+    task_type = Column(String, nullable=False)
+    status = Column(String, nullable=False, index=True)
+    state = Column(JSON, nullable=False)  # Serialized task info
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class IngestionWatermark(Base):
+    """
+    Version of a portfolio's rows in one table, bumped each time they are
+    reloaded, and the version the quality checks last ran against, so a
+    recheck only reruns the checks whose tables changed.
+    """
+    __tablename__ = "ingestion_watermarks"
+
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), primary_key=True)
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    checked_version = Column(Integer, nullable=False, default=0)
+    ingested_at = Column(DateTime, nullable=True)
+    checked_at = Column(DateTime, nullable=True)
+
+
+class LoanRiskParameter(Base):
+    """
+    Last computed value of one risk parameter (eir, pd, lgd or ead) for a
+    loan, with a fingerprint of the inputs it was computed from. ECL runs
+    reuse the value while the fingerprint matches.
+    """
+    __tablename__ = "loan_risk_parameters"
+
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), primary_key=True)
+    loan_no = Column(String, primary_key=True)
+    parameter = Column(String(10), primary_key=True)
+    fingerprint = Column(String(32), nullable=False)
+    value = Column(String, nullable=False)  # Exact text of the float, Decimal or string value
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,10 +1,12 @@
-import csv
-import io
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session, joinedload, selectinload
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from app.database import get_db
+from app.auth.user_cache import user_cache
+from app.utils.pagination import TOTAL_COUNT_HEADER
+from app.utils.streaming_export import export_response
 from app.models import AccessRequest, User, Feedback, Help
 from app.schemas import (
     AccessRequestSubmit,
@@ -18,7 +20,7 @@ from app.schemas import (
     HelpUpdate,
     HelpStatusUpdate,
 )
-from typing import List
+from typing import List, Optional
 from app.auth.email import (
     send_verification_email,
     send_admin_notification,
@@ -48,11 +50,15 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 # Handle access requests
 @router.get("/requests", response_model=List[AccessRequestResponse], operation_id="list_all_access_requests")
 async def get_access_requests(
-    db: Session = Depends(get_db), current_user: User = Depends(is_admin)
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every access request"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(is_admin),
 ):
-    access_requests = (
-        db.query(AccessRequest).filter(AccessRequest.is_email_verified == True).all()
-    )
+    query = db.query(AccessRequest).filter(AccessRequest.is_email_verified == True)
+    response.headers[TOTAL_COUNT_HEADER] = str(query.count())
+    access_requests = query.order_by(AccessRequest.id).offset(skip).limit(limit).all()
 
     return access_requests
 
@@ -122,71 +128,58 @@ async def delete_access_request(
 # Handle user management
 @router.get("/users", response_model=List[UserResponse])
 async def get_users(
-    db: Session = Depends(get_db), current_user: User = Depends(is_admin)
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every user"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(is_admin),
 ):
-    users = db.query(User).all()
+    """
+    List users, a page at a time when limit is given. The total number of
+    users is returned in the X-Total-Count header.
+    """
+    response.headers[TOTAL_COUNT_HEADER] = str(db.query(User).count())
+    users = db.query(User).order_by(User.id).offset(skip).limit(limit).all()
 
     return users
 
+# Columns of the user export
+USER_EXPORT_COLUMNS = [
+    ("ID", lambda user: user.id),
+    ("First Name", lambda user: user.first_name),
+    ("Last Name", lambda user: user.last_name),
+    ("Email", lambda user: user.email),
+    ("Recovery Email", lambda user: user.recovery_email),
+    ("Role", lambda user: user.role),
+    ("Is Active", lambda user: user.is_active),
+    ("Last Login", lambda user: user.last_login),
+    ("Created At", lambda user: user.created_at),
+    ("Updated At", lambda user: user.updated_at),
+]
+
+
 @router.get("/users/export", response_class=StreamingResponse)
 async def export_users_csv(
-    db: Session = Depends(get_db), 
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
     current_user: User = Depends(is_admin)
 ):
     """
-    Export all users as a CSV file.
+    Export all users as a CSV file, or NDJSON with format=ndjson.
     Only accessible to admin users.
+
+    Rows are streamed as they are read from the database.
     """
-    # Query all users
-    users = db.query(User).all()
-    
-    # Create a StringIO object to write CSV data
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header row
-    writer.writerow([
-        "ID", 
-        "First Name",
-        "Last Name",
-        "Email", 
-        "Recovery Email",
-        "Role", 
-        "Is Active", 
-        "Last Login",
-        "Created At",
-        "Updated At"
-    ])
-    
-    # Write user data
-    for user in users:
-        writer.writerow([
-            user.id,
-            user.first_name or "",
-            user.last_name or "",
-            user.email,
-            user.recovery_email or "",
-            user.role,
-            user.is_active,
-            user.last_login.strftime("%Y-%m-%d %H:%M:%S") if user.last_login else "",
-            user.created_at.strftime("%Y-%m-%d %H:%M:%S") if user.created_at else "",
-            user.updated_at.strftime("%Y-%m-%d %H:%M:%S") if user.updated_at else ""
-        ])
-    
-    # Prepare the output
-    output.seek(0)
-    
     # Generate filename with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"users_export_{timestamp}.csv"
-    
-    # Return the CSV as a streaming response
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+
+    return export_response(
+        lambda db: db.query(User).order_by(User.id),
+        USER_EXPORT_COLUMNS,
+        file_format,
+        f"users_export_{timestamp}",
     )
 
+
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int, db: Session = Depends(get_db), current_user: User = Depends(is_admin)
@@ -255,8 +248,10 @@ async def delete_user(
         )
 
     # Delete the user
+    email = user.email
     db.delete(user)
     db.commit()
+    user_cache.invalidate(email)
 
     return None  #
 
@@ -282,24 +277,42 @@ async def update_user(
     if "role" in update_data and update_data["role"]:
         update_data["role"] = update_data["role"].value
 
+    previous_email = user.email
     for key, value in update_data.items():
         setattr(user, key, value)
 
     db.commit()
     db.refresh(user)
+
+    # Role, active flag or email may have changed
+    user_cache.invalidate(previous_email)
+    user_cache.invalidate(user.email)
     return user
 
 
 # Feedback routes
 @router.get("/feedback", response_model=List[FeedbackResponse])
 async def admin_get_all_feedback(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every feedback entry"),
     db: Session = Depends(get_db),
     current_user: User = Depends(is_admin),
 ):
     """
-    Admin endpoint to get all feedback entries
+    Admin endpoint to get all feedback entries, a page at a time when limit
+    is given. The total number of entries is returned in the X-Total-Count
+    header.
     """
-    feedback_list = db.query(Feedback).all()
+    response.headers[TOTAL_COUNT_HEADER] = str(db.query(Feedback).count())
+    feedback_list = (
+        db.query(Feedback)
+        .options(joinedload(Feedback.user), selectinload(Feedback.liked_by))
+        .order_by(Feedback.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     
     # Prepare response with manual mapping
     response_data = []
@@ -434,13 +447,26 @@ async def admin_delete_feedback(
 # Help routes for admin
 @router.get("/help", response_model=List[HelpResponse])
 async def admin_get_all_help(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every help entry"),
     db: Session = Depends(get_db),
     current_user: User = Depends(is_admin),
 ):
     """
-    Admin endpoint to get all help entries
+    Admin endpoint to get all help entries, a page at a time when limit is
+    given. The total number of entries is returned in the X-Total-Count
+    header.
     """
-    help_list = db.query(Help).all()
+    response.headers[TOTAL_COUNT_HEADER] = str(db.query(Help).count())
+    help_list = (
+        db.query(Help)
+        .options(joinedload(Help.user))
+        .order_by(Help.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     
     # Prepare response with manual mapping
     response_data = []
@@ -565,3 +591,50 @@ async def admin_delete_help(
     
     # Return no content for successful deletion
     return None
+
+@router.get("/job-metrics")
+async def get_job_metrics(current_user: User = Depends(is_admin)):
+    """
+    Admin endpoint reporting background job queue depth and worker utilisation
+    for this worker process
+    """
+    from app.utils.job_executor import get_job_executor
+
+    return get_job_executor().metrics()
+
+@router.post("/maintenance/run")
+async def run_maintenance_now(current_user: User = Depends(is_admin)):
+    """
+    Admin endpoint to run task eviction and result retention immediately.
+    Returns the rows and bytes reclaimed.
+    """
+    from app.utils.maintenance import run_maintenance_with_session
+
+    return await run_in_threadpool(run_maintenance_with_session)
+
+@router.get("/maintenance")
+async def get_last_maintenance_report(current_user: User = Depends(is_admin)):
+    """
+    Admin endpoint returning the last maintenance report from this worker process
+    """
+    from app.utils import maintenance
+
+    return maintenance.last_maintenance_report or {}
+
+@router.get("/user-cache-metrics")
+async def get_user_cache_metrics(current_user: User = Depends(is_admin)):
+    """
+    Admin endpoint reporting the authenticated-user cache's size, hits,
+    misses and hit rate for this worker process
+    """
+    return user_cache.snapshot()
+
+@router.get("/db-metrics")
+async def get_db_metrics(current_user: User = Depends(is_admin)):
+    """
+    Admin endpoint reporting connection pool usage, checkout wait times and
+    held-connection durations for this worker process
+    """
+    from app.database import pool_metrics
+
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, Body
 from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.database import get_db
@@ -18,12 +19,13 @@ from app.auth.utils import (
     create_email_verification_token,
     create_invitation_token,
     get_password_hash,
-    verify_password,
+    verify_and_update_password,
     create_access_token,
     get_current_active_user,
     is_admin,
     decode_token,
 )
+from app.auth.user_cache import user_cache
 from app.auth.email import (
     send_verification_email,
     send_admin_notification,
@@ -263,15 +265,17 @@ async def set_password(
         existing_user = (
             db.query(User).filter(User.email == access_request.email).first()
         )
+        # Hash off the event loop
+        hashed_password = await run_in_threadpool(get_password_hash, password)
         if existing_user:
             # Update existing user's password instead of creating new user
-            existing_user.hashed_password = get_password_hash(password)
+            existing_user.hashed_password = hashed_password
             # You might want to update other fields as needed
         else:
             # Create the user
             new_user = User(
                 email=access_request.email,
-                hashed_password=get_password_hash(password),
+                hashed_password=hashed_password,
                 role=access_request.role,
             )
             db.add(new_user)
@@ -280,6 +284,7 @@ async def set_password(
         access_request.status = RequestStatus.APPROVED
 
         db.commit()
+        user_cache.invalidate(access_request.email)
 
         # Generate access token
         access_token = create_access_token(
@@ -307,13 +312,23 @@ async def set_password(
 async def login(request: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == request.email).first()
 
-    if not user or not verify_password(request.password, user.hashed_password):
+    # Verify off the event loop, so a burst of logins doesn't stall other requests
+    valid, new_hash = (False, None)
+    if user and user.hashed_password:
+        valid, new_hash = await run_in_threadpool(
+            verify_and_update_password, request.password, user.hashed_password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Rehash with the configured argon2 parameters if they changed
+    if new_hash:
+        user.hashed_password = new_hash
+
     # Set last login
     user.last_login = datetime.utcnow()
     db.commit()
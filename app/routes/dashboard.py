@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, select
 from typing import List, Dict, Any
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Portfolio, User, Loan, Client, Report, QualityIssue, CalculationResult
 from app.auth.utils import get_current_active_user
 from app.calculators.ecl import (
@@ -23,8 +23,8 @@ router = APIRouter(tags=["dashboard"])
 
 
 @router.get("/dashboard")
-def get_dashboard(
-    db: Session = Depends(get_db),
+async def get_dashboard(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
@@ -34,7 +34,9 @@ def get_dashboard(
     - Portfolio list
     """
     # Get all portfolios for current user
-    portfolios = db.query(Portfolio).filter(Portfolio.user_id == current_user.id).all()
+    portfolios = (
+        await db.execute(select(Portfolio).where(Portfolio.user_id == current_user.id))
+    ).scalars().all()
 
     if not portfolios:
         return {
@@ -61,15 +63,16 @@ def get_dashboard(
     # --- OPTIMIZATION: Use a single query to get loan counts and values by portfolio ---
     loan_stats_by_portfolio = {}
     loan_stats = (
-        db.query(
-            Loan.portfolio_id,
-            func.count(Loan.id).label("loan_count"),
-            func.sum(Loan.outstanding_loan_balance).label("loan_value")
+        await db.execute(
+            select(
+                Loan.portfolio_id,
+                func.count(Loan.id).label("loan_count"),
+                func.sum(Loan.outstanding_loan_balance).label("loan_value")
+            )
+            .where(Loan.portfolio_id.in_(portfolio_ids))
+            .group_by(Loan.portfolio_id)
         )
-        .filter(Loan.portfolio_id.in_(portfolio_ids))
-        .group_by(Loan.portfolio_id)
-        .all()
-    )
+    ).all()
     
     for stats in loan_stats:
         loan_stats_by_portfolio[stats.portfolio_id] = {
@@ -80,14 +83,15 @@ def get_dashboard(
     # --- OPTIMIZATION: Use a single query to get customer counts by portfolio ---
     customer_stats_by_portfolio = {}
     customer_stats = (
-        db.query(
-            Client.portfolio_id,
-            func.count(Client.id).label("customer_count")
+        await db.execute(
+            select(
+                Client.portfolio_id,
+                func.count(Client.id).label("customer_count")
+            )
+            .where(Client.portfolio_id.in_(portfolio_ids))
+            .group_by(Client.portfolio_id)
         )
-        .filter(Client.portfolio_id.in_(portfolio_ids))
-        .group_by(Client.portfolio_id)
-        .all()
-    )
+    ).all()
     
     for stats in customer_stats:
         customer_stats_by_portfolio[stats.portfolio_id] = {
@@ -97,11 +101,11 @@ def get_dashboard(
     # --- OPTIMIZATION: Get all latest ECL calculations in a single query ---
     latest_ecl_calculations = {}
     ecl_subquery = (
-        db.query(
+        select(
             CalculationResult.portfolio_id,
             func.max(CalculationResult.created_at).label("max_date")
         )
-        .filter(
+        .where(
             CalculationResult.portfolio_id.in_(portfolio_ids),
             CalculationResult.calculation_type == "ecl"
         )
@@ -110,15 +114,16 @@ def get_dashboard(
     )
     
     ecl_results = (
-        db.query(CalculationResult)
-        .join(
-            ecl_subquery,
-            (CalculationResult.portfolio_id == ecl_subquery.c.portfolio_id) &
-            (CalculationResult.created_at == ecl_subquery.c.max_date) &
-            (CalculationResult.calculation_type == "ecl")
+        await db.execute(
+            select(CalculationResult)
+            .join(
+                ecl_subquery,
+                (CalculationResult.portfolio_id == ecl_subquery.c.portfolio_id) &
+                (CalculationResult.created_at == ecl_subquery.c.max_date) &
+                (CalculationResult.calculation_type == "ecl")
+            )
         )
-        .all()
-    )
+    ).scalars().all()
     
     for result in ecl_results:
         latest_ecl_calculations[result.portfolio_id] = result
@@ -126,11 +131,11 @@ def get_dashboard(
     # --- OPTIMIZATION: Get all latest local impairment calculations in a single query ---
     latest_local_impairments = {}
     local_subquery = (
-        db.query(
+        select(
             CalculationResult.portfolio_id,
             func.max(CalculationResult.created_at).label("max_date")
         )
-        .filter(
+        .where(
             CalculationResult.portfolio_id.in_(portfolio_ids),
             CalculationResult.calculation_type == "local_impairment"
         )
@@ -139,15 +144,16 @@ def get_dashboard(
     )
     
     local_results = (
-        db.query(CalculationResult)
-        .join(
-            local_subquery,
-            (CalculationResult.portfolio_id == local_subquery.c.portfolio_id) &
-            (CalculationResult.created_at == local_subquery.c.max_date) &
-            (CalculationResult.calculation_type == "local_impairment")
+        await db.execute(
+            select(CalculationResult)
+            .join(
+                local_subquery,
+                (CalculationResult.portfolio_id == local_subquery.c.portfolio_id) &
+                (CalculationResult.created_at == local_subquery.c.max_date) &
+                (CalculationResult.calculation_type == "local_impairment")
+            )
         )
-        .all()
-    )
+    ).scalars().all()
     
     for result in local_results:
         latest_local_impairments[result.portfolio_id] = result
@@ -160,22 +166,23 @@ def get_dashboard(
     }
     
     customer_type_stats = (
-        db.query(
-            Client.client_type,
-            func.count(Client.id).label("count")
+        await db.execute(
+            select(
+                Client.client_type,
+                func.count(Client.id).label("client_count")
+            )
+            .where(Client.portfolio_id.in_(portfolio_ids))
+            .group_by(Client.client_type)
         )
-        .filter(Client.portfolio_id.in_(portfolio_ids))
-        .group_by(Client.client_type)
-        .all()
-    )
+    ).all()
     
     for stats in customer_type_stats:
         if stats.client_type == "institution":
-            customer_type_counts["institutional"] = stats.count
+            customer_type_counts["institutional"] = stats.client_count
         elif stats.client_type == "consumer":
-            customer_type_counts["individual"] = stats.count
+            customer_type_counts["individual"] = stats.client_count
         
-        customer_type_counts["total"] += stats.count
+        customer_type_counts["total"] += stats.client_count
     
     # --- Process portfolio data ---
     total_ecl_amount = 0
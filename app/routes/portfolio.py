@@ -10,19 +10,20 @@ from fastapi import (
     Form,
     Body,
     BackgroundTasks,
+    Query,
+    Response,
 )
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import text, func, case, cast, String
-import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, func, case, cast, String, select, exists
 import math
 from decimal import Decimal
 from datetime import datetime, timedelta, date
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Union
-import pandas as pd
 import io
-from app.database import get_db
+from app.database import background_session, get_db, get_async_db
 from app.models import Portfolio, User
 from app.auth.utils import get_current_active_user
 from app.calculators.ecl import (
@@ -87,17 +88,26 @@ from app.schemas import (
     OverviewModel,
     CustomerSummaryModel,
     PortfolioLatestResults,
+    CalculationLoanResultsPage,
 
 
 )
 from app.auth.utils import get_current_active_user
-from app.utils.quality_checks import create_quality_issues_if_needed
+from app.utils.quality_checks import RESOLVED_ISSUE_STATUSES, create_quality_issues_if_needed
 from app.utils.background_processors import process_loan_details_with_progress as process_loan_details, process_client_data_with_progress as process_client_data
 from app.utils.background_ingestion import (
     start_background_ingestion,
     process_portfolio_ingestion_sync
 )
 from app.utils.staging import parse_days_range
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, next_cursor
+from app.utils.calculation_loan_results import (
+    ECL_ONLY_SORTS,
+    LOAN_RESULT_SORTS,
+    loan_result_totals,
+    page_loan_results,
+)
+from app.utils.partitions import ensure_portfolio_partitions, drop_portfolio_partitions
 from app.utils.background_calculations import (
     start_background_ecl_calculation,
     start_background_local_impairment_calculation,
@@ -134,6 +144,8 @@ def create_portfolio(
     )
 
     db.add(new_portfolio)
+    db.flush()
+    ensure_portfolio_partitions(db, new_portfolio.id)
     db.commit()
     db.refresh(new_portfolio)
     return new_portfolio
@@ -141,64 +153,68 @@ def create_portfolio(
 
 
 @router.get("/", response_model=PortfolioList)
-def get_portfolios(
+async def get_portfolios(
     skip: int = 0,
     limit: int = 100,
     asset_type: Optional[str] = None,
     customer_type: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     Retrieve all portfolios belonging to the current user.
     Optional filtering by asset_type and customer_type.
     """
-    query = db.query(Portfolio).filter(Portfolio.user_id == current_user.id)
+    filters = [Portfolio.user_id == current_user.id]
 
     # Apply filters if provided
     if asset_type:
-        query = query.filter(Portfolio.asset_type == asset_type)
+        filters.append(Portfolio.asset_type == asset_type)
     if customer_type:
-        query = query.filter(Portfolio.customer_type == customer_type)
+        filters.append(Portfolio.customer_type == customer_type)
 
     # Get total count for pagination
-    total = query.count()
+    total = await db.scalar(select(func.count(Portfolio.id)).where(*filters))
 
-    # Apply pagination and get portfolios
-    portfolios = query.offset(skip).limit(limit).all()
+    # Fetch the page with every flag as an EXISTS column, so the list
+    # costs one query however many portfolios it holds
+    has_data = exists().where(Loan.portfolio_id == Portfolio.id)
+    has_calculated_ecl = exists().where(
+        CalculationResult.portfolio_id == Portfolio.id,
+        CalculationResult.calculation_type == "ecl"
+    )
+    has_calculated_local_impairment = exists().where(
+        CalculationResult.portfolio_id == Portfolio.id,
+        CalculationResult.calculation_type == "local_impairment"
+    )
+    has_issues = exists().where(QualityIssue.portfolio_id == Portfolio.id)
+    has_open_issues = exists().where(
+        QualityIssue.portfolio_id == Portfolio.id,
+        QualityIssue.status.notin_(RESOLVED_ISSUE_STATUSES)
+    )
+    rows = (
+        await db.execute(
+            select(
+                Portfolio,
+                has_data.label("has_data"),
+                has_calculated_ecl.label("has_calculated_ecl"),
+                has_calculated_local_impairment.label("has_calculated_local_impairment"),
+                has_issues.label("has_issues"),
+                has_open_issues.label("has_open_issues"),
+            )
+            .where(*filters)
+            .offset(skip)
+            .limit(limit)
+        )
+    ).all()
     
     # Convert to response objects
     response_items = []
-    for portfolio in portfolios:
-        # Check if portfolio has loans
-        has_data = db.query(Loan).filter(Loan.portfolio_id == portfolio.id).limit(1).count() > 0
-        
-        # Check if ECL calculation exists
-        has_calculated_ecl = db.query(CalculationResult).filter(
-            CalculationResult.portfolio_id == portfolio.id,
-            CalculationResult.calculation_type == "ecl"
-        ).limit(1).count() > 0
-        
-        # Check if local impairment calculation exists
-        has_calculated_local_impairment = db.query(CalculationResult).filter(
-            CalculationResult.portfolio_id == portfolio.id,
-            CalculationResult.calculation_type == "local_impairment"
-        ).limit(1).count() > 0
-
-    
-        # Check if portfolio has quality issues at all
-        has_issues = db.query(QualityIssue).filter(
-            QualityIssue.portfolio_id == portfolio.id
-        ).first() is not None
+    for row in rows:
+        portfolio = row.Portfolio
 
-        # Only check approval status if there are issues
-        has_all_issues_approved = None
-        if has_issues:
-            has_open_issues = db.query(QualityIssue).filter(
-                QualityIssue.portfolio_id == portfolio.id,
-                QualityIssue.status != "approved"
-            ).first() is not None
-            has_all_issues_approved = not has_open_issues
+        # Only report approval status if there are issues
+        has_all_issues_approved = not row.has_open_issues if row.has_issues else None
             
         # Convert to PortfolioResponse and set flags
         portfolio_dict = portfolio.__dict__.copy()
@@ -208,9 +224,9 @@ def get_portfolios(
         # Create response object with all flags
         portfolio_response = PortfolioResponse(
             **portfolio_dict, 
-            has_ingested_data=has_data,
-            has_calculated_ecl=has_calculated_ecl,
-            has_calculated_local_impairment=has_calculated_local_impairment,
+            has_ingested_data=row.has_data,
+            has_calculated_ecl=row.has_calculated_ecl,
+            has_calculated_local_impairment=row.has_calculated_local_impairment,
             has_all_issues_approved=has_all_issues_approved
         )
         response_items.append(portfolio_response)
@@ -218,9 +234,9 @@ def get_portfolios(
     return {"items": response_items, "total": total}
 
 @router.get("/{portfolio_id}", response_model=PortfolioWithSummaryResponse)
-def get_portfolio(
+async def get_portfolio(
     portfolio_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
@@ -229,62 +245,74 @@ def get_portfolio(
     """
     try:
         # Verify portfolio exists and user has access
-        portfolio = db.query(Portfolio).filter(
-            Portfolio.id == portfolio_id, 
-            Portfolio.user_id == current_user.id
-        ).first()
+        portfolio = (
+            await db.execute(
+                select(Portfolio).where(
+                    Portfolio.id == portfolio_id, 
+                    Portfolio.user_id == current_user.id
+                )
+            )
+        ).scalars().first()
         
         if not portfolio:
             raise HTTPException(status_code=404, detail="Portfolio not found")
         
-        # Basic loan statistics
-        loan_count = db.query(func.count(Loan.id)).filter(Loan.portfolio_id == portfolio_id).scalar() or 0
-        has_ingested_data = loan_count > 0
-        
-        # Check flags
-        has_calculated_ecl = db.query(CalculationResult).filter(
-            CalculationResult.portfolio_id == portfolio_id,
-            CalculationResult.calculation_type == "ecl"
-        ).limit(1).count() > 0
-        
-        has_calculated_local_impairment = db.query(CalculationResult).filter(
-            CalculationResult.portfolio_id == portfolio_id,
-            CalculationResult.calculation_type == "local_impairment"
-        ).limit(1).count() > 0
-        
-        # Check quality issues
-        has_issues = db.query(QualityIssue).filter(
-            QualityIssue.portfolio_id == portfolio_id
-        ).first() is not None
+        # Check flags in one round trip
+        flags = (
+            await db.execute(
+                select(
+                    exists().where(
+                        CalculationResult.portfolio_id == portfolio_id,
+                        CalculationResult.calculation_type == "ecl"
+                    ).label("has_calculated_ecl"),
+                    exists().where(
+                        CalculationResult.portfolio_id == portfolio_id,
+                        CalculationResult.calculation_type == "local_impairment"
+                    ).label("has_calculated_local_impairment"),
+                    exists().where(
+                        QualityIssue.portfolio_id == portfolio_id
+                    ).label("has_issues"),
+                    exists().where(
+                        QualityIssue.portfolio_id == portfolio_id,
+                        QualityIssue.status.notin_(RESOLVED_ISSUE_STATUSES)
+                    ).label("has_open_issues"),
+                )
+            )
+        ).first()
+        has_calculated_ecl = flags.has_calculated_ecl
+        has_calculated_local_impairment = flags.has_calculated_local_impairment
 
         # Only check approval status if there are issues
-        has_all_issues_approved = None
-        if has_issues:
-            has_open_issues = db.query(QualityIssue).filter(
-                QualityIssue.portfolio_id == portfolio_id,
-                QualityIssue.status != "approved"
-            ).first() is not None
-            has_all_issues_approved = not has_open_issues
+        has_all_issues_approved = not flags.has_open_issues if flags.has_issues else None
         
         # Get aggregate statistics in one query
-        loan_stats = db.query(
-            func.count(Loan.id).label("total_loans"),
-            func.sum(Loan.outstanding_loan_balance).label("total_loan_value"),
-            func.avg(Loan.loan_amount).label("average_loan_amount")
-        ).filter(Loan.portfolio_id == portfolio_id).first()
+        loan_stats = (
+            await db.execute(
+                select(
+                    func.count(Loan.id).label("total_loans"),
+                    func.sum(Loan.outstanding_loan_balance).label("total_loan_value"),
+                    func.avg(Loan.loan_amount).label("average_loan_amount")
+                ).where(Loan.portfolio_id == portfolio_id)
+            )
+        ).first()
         
         total_loans = loan_stats.total_loans or 0
+        has_ingested_data = total_loans > 0
         total_loan_value = float(loan_stats.total_loan_value or 0)
         average_loan_amount = float(loan_stats.average_loan_amount or 0)
 
         # Customer statistics - use the same values as in CustomerType enum
         # CustomerType values: "individuals", "institution", "mixed"
-        customer_stats = db.query(
-            func.count(Client.id).label("total_customers"),
-            func.sum(case((Client.client_type == "individuals", 1), else_=0)).label("individual_customers"),
-            func.sum(case((Client.client_type == "institution", 1), else_=0)).label("institutions"),
-            func.sum(case((Client.client_type == "mixed", 1), else_=0)).label("mixed")
-        ).filter(Client.portfolio_id == portfolio_id).first()
+        customer_stats = (
+            await db.execute(
+                select(
+                    func.count(Client.id).label("total_customers"),
+                    func.sum(case((Client.client_type == "individuals", 1), else_=0)).label("individual_customers"),
+                    func.sum(case((Client.client_type == "institution", 1), else_=0)).label("institutions"),
+                    func.sum(case((Client.client_type == "mixed", 1), else_=0)).label("mixed")
+                ).where(Client.portfolio_id == portfolio_id)
+            )
+        ).first()
         
         total_customers = customer_stats.total_customers or 0
         individual_customers = customer_stats.individual_customers or 0
@@ -292,22 +320,24 @@ def get_portfolio(
         mixed = customer_stats.mixed or 0
         
         # Active customers
-        active_loans = db.query(Loan.employee_id).filter(
-            Loan.portfolio_id == portfolio_id,
-            Loan.paid == False
-        ).distinct().subquery()
-        
-        active_customers = db.query(Client).filter(
-            Client.portfolio_id == portfolio_id,
-            Client.employee_id.in_(active_loans)
-        ).count()
+        active_loans = (
+            select(Loan.employee_id)
+            .where(
+                Loan.portfolio_id == portfolio_id,
+                Loan.paid == False
+            )
+            .distinct()
+        )
         
-        # Get the portfolio's customer type to distribute active customers
-        portfolio_customer_type = db.query(Portfolio.customer_type).filter(
-            Portfolio.id == portfolio_id
-        ).scalar()
+        active_customers = await db.scalar(
+            select(func.count(Client.id)).where(
+                Client.portfolio_id == portfolio_id,
+                Client.employee_id.in_(active_loans)
+            )
+        )
         
         # Distribute active customers based on portfolio customer type
+        portfolio_customer_type = portfolio.customer_type
         if portfolio_customer_type == "individuals":
             individual_customers = active_customers
         elif portfolio_customer_type == "institution":
@@ -319,7 +349,7 @@ def get_portfolio(
             individual_customers = active_customers
         
         # Get quality checks
-        quality_counts = create_quality_issues_if_needed(db, portfolio_id)
+        quality_counts = await db.run_sync(create_quality_issues_if_needed, portfolio_id)
         
         quality_check_summary = QualityCheckSummary(
             duplicate_customer_ids=quality_counts["duplicate_customer_ids"],
@@ -334,54 +364,38 @@ def get_portfolio(
             open_issues=quality_counts["open_issues"],
         )
         
-        # Fetch report history (most recent 10)
+        # Fetch report history (most recent 10), without report_data
         report_history = (
-            db.query(Report)
-            .filter(Report.portfolio_id == portfolio_id)
-            .order_by(Report.created_at.desc())
-            .limit(10)
-            .all()
-        )
-        
-        # Get latest staging and calculation results
-        latest_ecl_staging = (
-            db.query(StagingResult)
-            .filter(
-                StagingResult.portfolio_id == portfolio_id,
-                StagingResult.staging_type == "ecl"
-            )
-            .order_by(StagingResult.created_at.desc())
-            .first()
-        )
-        
-        latest_local_impairment_staging = (
-            db.query(StagingResult)
-            .filter(
-                StagingResult.portfolio_id == portfolio_id,
-                StagingResult.staging_type == "local_impairment"
-            )
-            .order_by(StagingResult.created_at.desc())
-            .first()
-        )
-        
-        latest_ecl_calculation = (
-            db.query(CalculationResult)
-            .filter(
-                CalculationResult.portfolio_id == portfolio_id,
-                CalculationResult.calculation_type == "ecl"
+            await db.execute(
+                select(
+                    Report.id,
+                    Report.report_type,
+                    Report.report_date,
+                    Report.report_name,
+                    Report.created_at,
+                )
+                .where(Report.portfolio_id == portfolio_id)
+                .order_by(Report.created_at.desc())
+                .limit(10)
             )
-            .order_by(CalculationResult.created_at.desc())
-            .first()
-        )
+        ).all()
         
-        latest_local_impairment_calculation = (
-            db.query(CalculationResult)
-            .filter(
-                CalculationResult.portfolio_id == portfolio_id,
-                CalculationResult.calculation_type == "local_impairment"
-            )
-            .order_by(CalculationResult.created_at.desc())
-            .first()
+        # Get latest staging and calculation results
+        async def latest(model, type_column, result_type):
+            return (
+                await db.execute(
+                    select(model)
+                    .where(model.portfolio_id == portfolio_id, type_column == result_type)
+                    .order_by(model.created_at.desc())
+                    .limit(1)
+                )
+            ).scalars().first()
+
+        latest_ecl_staging = await latest(StagingResult, StagingResult.staging_type, "ecl")
+        latest_local_impairment_staging = await latest(StagingResult, StagingResult.staging_type, "local_impairment")
+        latest_ecl_calculation = await latest(CalculationResult, CalculationResult.calculation_type, "ecl")
+        latest_local_impairment_calculation = await latest(
+            CalculationResult, CalculationResult.calculation_type, "local_impairment"
         )
         
         # Process staging results
@@ -855,6 +869,7 @@ def delete_portfolio(
             status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
         )
 
+    drop_portfolio_partitions(db, portfolio_id)
     db.delete(portfolio)
     db.commit()
 
@@ -906,15 +921,16 @@ def ingest_portfolio_data(
             detail=f"Missing required files: {', '.join(missing_files)}. Both loan_details and client_data files are required for portfolio ingestion.",
         )
     
-    # Process files synchronously
-    result = process_portfolio_ingestion_sync(
-        portfolio_id=portfolio_id,
-        loan_details_content=loan_details.file.read(),
-        client_data_content=client_data.file.read(),
-        loan_guarantee_data_content=loan_guarantee_data.file.read() if loan_guarantee_data else None,
-        loan_collateral_data_content=loan_collateral_data.file.read() if loan_collateral_data else None,
-        db=db
-    )
+    # Process files synchronously, on the background pool
+    with background_session(db) as work_db:
+        result = process_portfolio_ingestion_sync(
+            portfolio_id=portfolio_id,
+            loan_details_content=loan_details.file.read(),
+            client_data_content=client_data.file.read(),
+            loan_guarantee_data_content=loan_guarantee_data.file.read() if loan_guarantee_data else None,
+            loan_collateral_data_content=loan_collateral_data.file.read() if loan_collateral_data else None,
+            db=work_db
+        )
     
     # Check for errors in any component of the result
     if "details" in result:
@@ -1022,12 +1038,13 @@ def calculate_ecl_provision(
     
     # Start the background task for ECL calculation
     try:
-        return process_ecl_calculation_sync(
-            portfolio_id=portfolio_id,
-            reporting_date=reporting_date,
-            staging_result=latest_staging,
-            db=db
-        )
+        with background_session(db) as work_db:
+            return process_ecl_calculation_sync(
+                portfolio_id=portfolio_id,
+                reporting_date=reporting_date,
+                staging_result=work_db.merge(latest_staging, load=False),
+                db=work_db
+            )
     except Exception as e:
         logger.error(f"ECL calculation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1501,16 +1518,114 @@ def calculate_local_provision(
     
     # Start the background task for local impairment calculation
     try:
-        return process_local_impairment_calculation_sync(
-            portfolio_id=portfolio_id,
-            reporting_date=reporting_date,
-            staging_result=latest_staging,
-            db=db
-        )
+        with background_session(db) as work_db:
+            return process_local_impairment_calculation_sync(
+                portfolio_id=portfolio_id,
+                reporting_date=reporting_date,
+                staging_result=work_db.merge(latest_staging, load=False),
+                db=work_db
+            )
     except Exception as e:
         logger.error(f"Local impairment calculation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get(
+    "/{portfolio_id}/calculations/{calculation_id}/loans",
+    response_model=CalculationLoanResultsPage,
+)
+def get_calculation_loans(
+    portfolio_id: int,
+    calculation_id: int,
+    response: Response,
+    stage: Optional[List[str]] = Query(None, description="ECL stages, e.g. Stage 2"),
+    category: Optional[List[str]] = Query(None, description="Local impairment categories, e.g. OLEM"),
+    branch: Optional[List[str]] = Query(None, description="Loan location codes"),
+    min_balance: Optional[Decimal] = Query(None, description="Lowest outstanding loan balance"),
+    max_balance: Optional[Decimal] = Query(None, description="Highest outstanding loan balance"),
+    sort: str = Query("id", pattern=f"^(id|{'|'.join(LOAN_RESULT_SORTS)})$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description=f"{NEXT_CURSOR_HEADER} header from the previous page"),
+    include_totals: Optional[bool] = Query(
+        None, description="Include totals over every loan matching the filters; by default only on the first page"
+    ),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Page through the per-loan results stored with an ECL or local impairment
+    calculation, filtered and sorted in the database.
+
+    Loans are ordered by sort (then loan result id); the cursor for the next
+    page is returned in the X-Next-Cursor header. totals don't depend on the
+    cursor, so they're only computed for the first page unless include_totals
+    says otherwise.
+    Loans without a value for the ECL-only sort (PD and LGD aren't filled in
+    by the fixed-rate calculate-ecl route) are left out of pages sorted by
+    it, though the totals still count them.
+    """
+    # Verify the calculation exists and its portfolio belongs to current user
+    calculation = (
+        db.query(CalculationResult.id, CalculationResult.calculation_type, CalculationResult.reporting_date)
+        .join(Portfolio, CalculationResult.portfolio_id == Portfolio.id)
+        .filter(
+            CalculationResult.id == calculation_id,
+            CalculationResult.portfolio_id == portfolio_id,
+            Portfolio.user_id == current_user.id,
+        )
+        .first()
+    )
+    if not calculation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Calculation not found"
+        )
+
+    if sort in ECL_ONLY_SORTS and calculation.calculation_type != "ecl":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Sorting by {sort} is only available for ECL calculations",
+        )
+
+    if include_totals is None:
+        include_totals = cursor is None
+
+    key_attributes = ("id",) if sort == "id" else (sort, "id")
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, len(key_attributes))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    filters = {
+        "stages": (stage or []) + (category or []),
+        "branches": branch,
+        "min_balance": min_balance,
+        "max_balance": max_balance,
+    }
+    rows = page_loan_results(
+        db,
+        calculation_id,
+        sort=sort,
+        descending=order == "desc",
+        after=after,
+        limit=limit,
+        **filters,
+    )
+
+    cursor = next_cursor(rows, limit, *key_attributes)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+    return {
+        "calculation_id": calculation.id,
+        "calculation_type": calculation.calculation_type,
+        "reporting_date": calculation.reporting_date,
+        "loans": [dict(row._mapping) for row in rows],
+        "totals": loan_result_totals(db, calculation_id, **filters) if include_totals else None,
+    }
+
 # Fixed optimized ECL staging implementation
 async def stage_loans_ecl_optimized(portfolio_id: int, config: ECLStagingConfig, db: Session):
     """
@@ -5,26 +5,41 @@ from fastapi import (
     status,
     Body,
     Query,
+    Response,
 )
 from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func, insert, literal, select, text, tuple_
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 from io import BytesIO
-import pandas as pd
 import logging
+import tempfile
 
-from app.database import get_db
+from app.database import background_session, get_db
 from app.models import Portfolio, User, QualityIssue, QualityIssueComment
 from app.auth.utils import get_current_active_user
 from app.schemas import (
     QualityIssueResponse,
+    QualityIssueListItem,
+    QualityIssueRecordsPage,
     QualityIssueUpdate,
     QualityIssueCommentCreate,
     QualityIssueCommentModel,
-    QualityCheckSummary,
+    QualityRecheckSummary,
+)
+from app.utils.quality_checks import (
+    create_quality_issues_if_needed,
+    recheck_quality_issues as recheck_issues,
+)
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, next_cursor
+from app.utils.quality_issue_export import (
+    iter_file,
+    quality_issue_summary,
+    stream_affected_records_csv,
+    write_affected_records_parquet,
+    write_quality_issues_xlsx,
 )
-from app.utils.quality_checks import create_quality_issues_if_needed
 
 # Create a separate router for quality issues
 router = APIRouter(prefix="/portfolios", tags=["quality-issues"])
@@ -51,17 +66,38 @@ def transform_affected_records(quality_issues: List[QualityIssue]) -> List[Quali
     return quality_issues
 
 
-@router.get("/{portfolio_id}/quality-issues", response_model=List[QualityIssueResponse])
+def affected_records_count():
+    """Number of affected records, counted in the database. Older rows store a single dictionary."""
+    return case(
+        (
+            func.json_typeof(QualityIssue.affected_records) == "array",
+            func.json_array_length(QualityIssue.affected_records),
+        ),
+        else_=1,
+    )
+
+
+@router.get("/{portfolio_id}/quality-issues", response_model=List[QualityIssueListItem])
 def get_quality_issues(
     portfolio_id: int,
+    response: Response,
     status_type: Optional[str] = None,
     issue_type: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every issue"),
+    cursor: Optional[str] = Query(None, description=f"{NEXT_CURSOR_HEADER} header from the previous page"),
+    include_records: bool = Query(True, description="Include each issue's affected_records"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     Retrieve quality issues for a specific portfolio.
     Optional filtering by status and issue type.
+
+    Issues are ordered by severity, then newest first. Pass limit to page
+    through them; the cursor for the next page is returned in the
+    X-Next-Cursor header. List views should set include_records=false,
+    which returns affected_records_count without reading the records, and
+    page through an issue's records with /quality-issues/{issue_id}/records.
     """
     # Verify portfolio exists and belongs to current user
     portfolio = (
@@ -75,8 +111,22 @@ def get_quality_issues(
             status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
         )
 
+    columns = [
+        QualityIssue.id,
+        QualityIssue.portfolio_id,
+        QualityIssue.issue_type,
+        QualityIssue.description,
+        QualityIssue.severity,
+        QualityIssue.status,
+        QualityIssue.created_at,
+        QualityIssue.updated_at,
+        affected_records_count().label("affected_records_count"),
+    ]
+    if include_records:
+        columns.append(QualityIssue.affected_records)
+
     # Build query for quality issues
-    query = db.query(QualityIssue).filter(QualityIssue.portfolio_id == portfolio_id)
+    query = db.query(*columns).filter(QualityIssue.portfolio_id == portfolio_id)
     
     # Apply filters if provided
     if status_type:
@@ -84,34 +134,134 @@ def get_quality_issues(
     if issue_type:
         query = query.filter(QualityIssue.issue_type == issue_type)
 
+    # Continue after the last issue of the previous page
+    if cursor:
+        try:
+            severity, created_at, issue_id = decode_cursor(cursor, 3)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        query = query.filter(
+            tuple_(QualityIssue.severity, QualityIssue.created_at, QualityIssue.id)
+            < tuple_(severity, created_at, issue_id)
+        )
+
     # Order by severity (most severe first) and then by created date (newest first)
-    quality_issues = query.order_by(
-        QualityIssue.severity.desc(), QualityIssue.created_at.desc()
-    ).all()
+    query = query.order_by(
+        QualityIssue.severity.desc(), QualityIssue.created_at.desc(), QualityIssue.id.desc()
+    )
+    if limit:
+        query = query.limit(limit)
+    rows = query.all()
 
-    if not quality_issues:
+    if not rows and not cursor:
         raise HTTPException(
             status_code=status.HTTP_200_OK, detail="No quality issues found"
         )
 
-    # Transform affected_records from dictionary to list format if needed
-    quality_issues = transform_affected_records(quality_issues)
+    cursor = next_cursor(rows, limit, "severity", "created_at", "id")
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+    quality_issues = []
+    for row in rows:
+        issue = dict(row._mapping)
+        # Older records store affected_records as a single dictionary
+        if isinstance(issue.get("affected_records"), dict):
+            issue["affected_records"] = [issue["affected_records"]]
+        quality_issues.append(issue)
 
     return quality_issues
 
 
+@router.get(
+    "/{portfolio_id}/quality-issues/{issue_id}/records",
+    response_model=QualityIssueRecordsPage,
+)
+def get_quality_issue_records(
+    portfolio_id: int,
+    issue_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Page through a quality issue's affected records. The page is cut out of
+    the JSON array in the database, so large issues aren't sent whole.
+    """
+    # Verify portfolio exists and belongs to current user
+    portfolio = (
+        db.query(Portfolio)
+        .filter(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id)
+        .first()
+    )
+
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
+        )
+
+    total = (
+        db.query(affected_records_count())
+        .filter(QualityIssue.id == issue_id, QualityIssue.portfolio_id == portfolio_id)
+        .scalar()
+    )
+    if total is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Quality issue not found"
+        )
+
+    records = db.execute(
+        text(
+            """
+            SELECT record.value
+            FROM quality_issues,
+                json_array_elements(
+                    CASE WHEN json_typeof(affected_records) = 'array'
+                        THEN affected_records
+                        ELSE json_build_array(affected_records)
+                    END
+                ) WITH ORDINALITY AS record(value, position)
+            WHERE quality_issues.id = :issue_id
+            ORDER BY record.position
+            OFFSET :offset
+            LIMIT :limit
+            """
+        ),
+        {"issue_id": issue_id, "offset": offset, "limit": limit},
+    ).scalars().all()
+
+    return {
+        "issue_id": issue_id,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "records": records,
+    }
+
+
 @router.get("/{portfolio_id}/quality-issues/download", status_code=status.HTTP_200_OK)
-async def download_all_quality_issues_excel(
+def download_all_quality_issues_excel(
     portfolio_id: int,
     status_type: Optional[str] = None,
     issue_type: Optional[str] = None,
     include_comments: bool = Query(False, description="Include comments in the download"),
+    file_format: str = Query(
+        "xlsx",
+        alias="format",
+        pattern="^(xlsx|csv|parquet)$",
+        description="xlsx workbook, or csv/parquet with one row per affected record",
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     Download all quality issues for a portfolio as Excel.
     Optional filtering by status and issue type.
+
+    format=csv or format=parquet returns a flat file with one row per
+    affected record instead. Exports are streamed, so memory use doesn't
+    grow with the number of issues.
     """
     # Verify portfolio exists and belongs to current user
     portfolio = (
@@ -125,111 +275,49 @@ async def download_all_quality_issues_excel(
             status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
         )
 
-    # Build query for quality issues
-    query = db.query(QualityIssue).filter(QualityIssue.portfolio_id == portfolio_id)
-    
-    # Apply filters if provided
-    if status_type:
-        query = query.filter(QualityIssue.status == status_type)
-    if issue_type:
-        query = query.filter(QualityIssue.issue_type == issue_type)
-
-    # Order by severity (most severe first) and then by created date (newest first)
-    quality_issues = query.order_by(
-        QualityIssue.severity.desc(), QualityIssue.created_at.desc()
-    ).all()
-
-    if not quality_issues:
+    summary = quality_issue_summary(db, portfolio_id, status_type, issue_type)
+    if not summary["Total Issues"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No quality issues found"
         )
 
-    # Transform affected_records from dictionary to list format if needed
-    quality_issues = transform_affected_records(quality_issues)
-
     # Create filename with appropriate filters indicated
     status_suffix = f"_{status_type}" if status_type else ""
     type_suffix = f"_{issue_type}" if issue_type else ""
-    filename = f"quality_issues_{portfolio.name.replace(' ', '_')}{status_suffix}{type_suffix}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+    filename = f"quality_issues_{portfolio.name.replace(' ', '_')}{status_suffix}{type_suffix}_{datetime.now().strftime('%Y%m%d')}.{file_format}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+
+    if file_format == "csv":
+        return StreamingResponse(
+            stream_affected_records_csv(portfolio_id, status_type, issue_type),
+            media_type="text/csv",
+            headers=headers,
+        )
 
-    # Create DataFrame for all issues
-    issues_df = pd.DataFrame([{
-        "ID": issue.id,
-        "Issue Type": issue.issue_type,
-        "Description": issue.description,
-        "Severity": issue.severity,
-        "Status": issue.status,
-        "Created": issue.created_at,
-        "Updated": issue.updated_at,
-    } for issue in quality_issues])
-    
-    # Create Excel writer
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer) as writer:
-        issues_df.to_excel(writer, sheet_name="All Issues", index=False)
-        
-        # Add a summary sheet
-        summary_data = {
-            "Type": "Count",
-            "Total Issues": len(quality_issues),
-            "High Severity": sum(1 for issue in quality_issues if issue.severity == "high"),
-            "Medium Severity": sum(1 for issue in quality_issues if issue.severity == "medium"),
-            "Low Severity": sum(1 for issue in quality_issues if issue.severity == "low"),
-            "Open": sum(1 for issue in quality_issues if issue.status == "open"),
-            "Approved": sum(1 for issue in quality_issues if issue.status == "approved"),
-            "Other Status": sum(1 for issue in quality_issues if issue.status not in ["open", "approved"]),
-        }
-        
-        summary_df = pd.DataFrame([summary_data])
-        summary_df.to_excel(writer, sheet_name="Summary", index=False)
-        
-        # If comments are included, add a sheet for each issue's comments
-        if include_comments:
-            for issue in quality_issues:
-                comments = (
-                    db.query(QualityIssueComment)
-                    .filter(QualityIssueComment.quality_issue_id == issue.id)
-                    .order_by(QualityIssueComment.created_at)
-                    .all()
+    # xlsx and parquet need their footer written last, so build them in a
+    # temporary file and stream that
+    output = tempfile.TemporaryFile()
+    try:
+        with background_session(db) as export_db:
+            if file_format == "parquet":
+                write_affected_records_parquet(export_db, portfolio_id, status_type, issue_type, output)
+                media_type = "application/vnd.apache.parquet"
+            else:
+                write_quality_issues_xlsx(
+                    export_db, portfolio_id, status_type, issue_type, include_comments, summary, output
                 )
-                
-                if comments:
-                    comments_df = pd.DataFrame([{
-                        "Comment ID": comment.id,
-                        "User ID": comment.user_id,
-                        "User Email": db.query(User.email).filter(User.id == comment.user_id).scalar(),
-                        "Comment": comment.comment,
-                        "Created": comment.created_at,
-                    } for comment in comments])
-                    
-                    sheet_name = f"Issue {issue.id} Comments"
-                    # Excel sheet names must be <= 31 chars
-                    if len(sheet_name) > 31:
-                        sheet_name = sheet_name[:31]
-                    
-                    comments_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        
-        # Add affected records for each issue if possible
-        for issue in quality_issues:
-            if issue.affected_records:
-                try:
-                    if isinstance(issue.affected_records, list) and len(issue.affected_records) > 0:
-                        records_df = pd.DataFrame(issue.affected_records)
-                        sheet_name = f"Issue {issue.id} Records"
-                        # Excel sheet names must be <= 31 chars
-                        if len(sheet_name) > 31:
-                            sheet_name = sheet_name[:31]
-                        records_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                except Exception:
-                    # Skip if conversion fails for an issue
-                    pass
-    
-    buffer.seek(0)
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
-    )
+                media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    except ImportError:
+        output.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parquet export is not available on this server",
+        )
+    except Exception:
+        output.close()
+        raise
+
+    return StreamingResponse(iter_file(output), media_type=media_type, headers=headers)
 
 
 @router.get("/{portfolio_id}/quality-issues/{issue_id}", response_model=QualityIssueResponse)
@@ -562,37 +650,37 @@ def approve_all_quality_issues(
             status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
         )
 
-    # Get all open quality issues
-    open_issues = (
-        db.query(QualityIssue)
-        .filter(
-            QualityIssue.portfolio_id == portfolio_id, QualityIssue.status == "open"
+    open_issues = (QualityIssue.portfolio_id == portfolio_id, QualityIssue.status == "open")
+
+    # Add the comment to every open issue, then approve them, without loading
+    # the issues
+    if comment:
+        db.execute(
+            insert(QualityIssueComment).from_select(
+                ["quality_issue_id", "user_id", "comment"],
+                select(
+                    QualityIssue.id,
+                    literal(current_user.id),
+                    literal(f"Batch approval: {comment}"),
+                ).where(*open_issues),
+            )
         )
-        .all()
+    approved = (
+        db.query(QualityIssue)
+        .filter(*open_issues)
+        .update({"status": "approved"}, synchronize_session=False)
     )
 
-    if not open_issues:
+    if not approved:
+        db.rollback()
         return {"message": "No open quality issues to approve", "count": 0}
 
-    # Update all issues to approved
-    for issue in open_issues:
-        issue.status = "approved"
-
-        # Add comment if provided
-        if comment:
-            new_comment = QualityIssueComment(
-                quality_issue_id=issue.id,
-                user_id=current_user.id,
-                comment=f"Batch approval: {comment}",
-            )
-            db.add(new_comment)
-
     db.commit()
 
-    return {"message": "All quality issues approved", "count": len(open_issues)}
+    return {"message": "All quality issues approved", "count": approved}
 
 
-@router.post("/{portfolio_id}/recheck-quality", response_model=QualityCheckSummary)
+@router.post("/{portfolio_id}/recheck-quality", response_model=QualityRecheckSummary)
 def recheck_quality_issues(
     portfolio_id: int,
     db: Session = Depends(get_db),
@@ -600,6 +688,10 @@ def recheck_quality_issues(
 ):
     """
     Run quality checks again to find any new issues.
+
+    Only the checks reading loans or clients reloaded since the last run are
+    rerun. Their issues are updated in place, and the issues opened and
+    closed are returned alongside the counts.
     """
     # Verify portfolio exists and belongs to current user
     portfolio = (
@@ -613,10 +705,11 @@ def recheck_quality_issues(
             status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
         )
 
-    # Run quality checks and create issues if necessary
+    # Rerun the checks whose data changed, then count the issues
+    changes = recheck_issues(db, portfolio_id)
     quality_counts = create_quality_issues_if_needed(db, portfolio_id)
 
-    return QualityCheckSummary(
+    return QualityRecheckSummary(
         duplicate_customer_ids=quality_counts["duplicate_customer_ids"],
         duplicate_addresses=quality_counts["duplicate_addresses"],
         duplicate_dob=quality_counts["duplicate_dob"],
@@ -627,6 +720,7 @@ def recheck_quality_issues(
         total_issues=quality_counts["total_issues"],
         high_severity_issues=quality_counts["high_severity_issues"],
         open_issues=quality_counts["open_issues"],
+        **changes,
     )
 
 
@@ -642,6 +736,8 @@ async def download_quality_issue_excel(
     Download a specific quality issue as Excel.
     Optionally include comments.
     """
+    import pandas as pd
+
     # Verify portfolio exists and belongs to current user
     portfolio = (
         db.query(Portfolio)
@@ -703,7 +799,8 @@ async def download_quality_issue_excel(
         # Add comments to a separate sheet if included
         if include_comments:
             comments = (
-                db.query(QualityIssueComment)
+                db.query(QualityIssueComment, User.email)
+                .outerjoin(User, User.id == QualityIssueComment.user_id)
                 .filter(QualityIssueComment.quality_issue_id == issue_id)
                 .order_by(QualityIssueComment.created_at)
                 .all()
@@ -713,10 +810,10 @@ async def download_quality_issue_excel(
                 comments_df = pd.DataFrame([{
                     "ID": comment.id,
                     "User ID": comment.user_id,
-                    "User Email": db.query(User.email).filter(User.id == comment.user_id).scalar(),
+                    "User Email": email,
                     "Comment": comment.comment,
                     "Created": comment.created_at,
-                } for comment in comments])
+                } for comment, email in comments])
                 
                 comments_df.to_excel(writer, sheet_name="Comments", index=False)
     
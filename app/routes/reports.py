@@ -7,11 +7,13 @@ from fastapi import (
 )
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 from datetime import date, datetime
 from typing import List, Optional, Dict, Any
 import base64
 from io import BytesIO
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models import Portfolio, User, Report
 from app.auth.utils import get_current_active_user
 from app.utils.report_generators import (
@@ -234,7 +236,7 @@ async def get_report_history(
     end_date: Optional[date] = None,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
@@ -242,35 +244,49 @@ async def get_report_history(
     Optional filtering by report type and date range.
     """
     # Verify portfolio exists and belongs to current user
-    portfolio = (
-        db.query(Portfolio)
-        .filter(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id)
-        .first()
+    portfolio_exists = await db.scalar(
+        select(Portfolio.id).where(
+            Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id
+        )
     )
 
-    if not portfolio:
+    if portfolio_exists is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found"
         )
 
-    # Build query for reports
-    query = db.query(Report).filter(Report.portfolio_id == portfolio_id)
+    # Build filters for reports
+    filters = [Report.portfolio_id == portfolio_id]
 
     # Apply filters if provided
     if report_type:
-        query = query.filter(Report.report_type == report_type)
+        filters.append(Report.report_type == report_type)
 
     if start_date:
-        query = query.filter(Report.report_date >= start_date)
+        filters.append(Report.report_date >= start_date)
 
     if end_date:
-        query = query.filter(Report.report_date <= end_date)
+        filters.append(Report.report_date <= end_date)
 
     # Get total count for pagination
-    total = query.count()
-
-    # Apply pagination and order
-    reports = query.order_by(Report.created_at.desc()).offset(skip).limit(limit).all()
+    total = await db.scalar(select(func.count(Report.id)).where(*filters))
+
+    # Apply pagination and order; only the listed columns, not report_data
+    reports = (
+        await db.execute(
+            select(
+                Report.id,
+                Report.report_type,
+                Report.report_date,
+                Report.report_name,
+                Report.created_at,
+            )
+            .where(*filters)
+            .order_by(Report.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+    ).all()
 
     return {"items": reports, "total": total}
 
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, List, Any, Optional
-from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import SessionLocal
 from app.auth.utils import verify_token, get_current_active_user_ws, get_token_from_query_param
 from app.utils.background_tasks import get_task_manager
+from app.utils.task_broadcaster import get_task_broadcaster
 from app.models import User
 from jose import jwt, JWTError
+import asyncio
 import json
 import logging
 from datetime import datetime
@@ -21,18 +23,34 @@ class JSONEncoder(json.JSONEncoder):
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
-# Store active websocket connections
-active_connections: Dict[str, List[WebSocket]] = {}
-
 async def notify_client(websocket: WebSocket, data: Dict[str, Any]) -> None:
     await websocket.send_json(data)
 
+def is_active_user(user_id: int) -> bool:
+    """
+    Look the user up on a session of its own, so the connection goes back to
+    the pool before the socket starts streaming progress.
+    """
+    db = SessionLocal()
+    try:
+        user = db.query(User.is_active).filter(User.id == user_id).first()
+        return bool(user and user.is_active)
+    finally:
+        db.close()
+
+async def receive_until_disconnect(websocket: WebSocket) -> None:
+    """Read and discard client messages (like pings) until the client goes away."""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
 @router.websocket("/tasks/{task_id}")
 async def websocket_task_progress(
     websocket: WebSocket, 
     task_id: str,
     token: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
 ):
     """
     WebSocket endpoint for task progress updates
@@ -56,8 +74,7 @@ async def websocket_task_progress(
                 return
                 
             # Get user from database
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user or not user.is_active:
+            if not await run_in_threadpool(is_active_user, user_id):
                 await websocket.close(code=1008, reason="User not found or inactive")
                 return
         except JWTError as e:
@@ -76,37 +93,31 @@ async def websocket_task_progress(
             await websocket.close()
             return
         
-        # Add connection to active connections
-        if task_id not in active_connections:
-            active_connections[task_id] = []
-        active_connections[task_id].append(websocket)
-        
-        # Define callback for task updates
-        async def on_task_update(task_data: Dict[str, Any]) -> None:
-            await notify_client(websocket, task_data)
-        
-        # Subscribe to task updates
-        task_manager.subscribe(task_id, on_task_update)
+        # Register with the broadcaster, which holds one task subscription
+        # for all connections watching this task
+        broadcaster = get_task_broadcaster()
+        watcher = broadcaster.add(websocket, task_id)
         
         # Send initial task state
         await notify_client(websocket, task)
         
+        sender = asyncio.create_task(broadcaster.stream(watcher))
+        receiver = asyncio.create_task(receive_until_disconnect(websocket))
         try:
-            # Keep the connection open and handle incoming messages
-            while True:
-                # Wait for any message from the client (like a ping)
-                await websocket.receive_text()
-        except WebSocketDisconnect:
-            # Client disconnected
-            logger.info(f"Client disconnected from task {task_id}")
-            # Remove connection when client disconnects
-            if task_id in active_connections and websocket in active_connections[task_id]:
-                active_connections[task_id].remove(websocket)
-                if not active_connections[task_id]:
-                    del active_connections[task_id]
+            # Run until the client disconnects or stops accepting messages
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if sender in done and sender.exception() is not None:
+                logger.info(f"Dropping WebSocket for task {task_id}: {sender.exception()!r}")
+                try:
+                    await websocket.close()
+                except Exception:
+                    pass
+            else:
+                logger.info(f"Client disconnected from task {task_id}")
         finally:
-            # Unsubscribe from task updates
-            task_manager.unsubscribe(task_id, on_task_update)
+            sender.cancel()
+            receiver.cancel()
+            broadcaster.remove(watcher)
     
     except Exception as e:
         logger.exception(f"Error in WebSocket connection: {str(e)}")
@@ -189,6 +189,28 @@ class QualityIssueResponse(BaseModel):
         from_attributes = True
 
 
+class QualityIssueListItem(BaseModel):
+    """A quality issue in a list. affected_records is left out unless requested."""
+    id: int
+    portfolio_id: int
+    issue_type: str
+    description: str
+    affected_records: Optional[List[Dict]] = None
+    affected_records_count: int
+    severity: str
+    status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class QualityIssueRecordsPage(BaseModel):
+    issue_id: int
+    total: int
+    offset: int
+    limit: int
+    records: List[Dict]
+
+
 class QualityIssueCommentModel(BaseModel):  
     id: int
     quality_issue_id: int
@@ -216,6 +238,19 @@ class QualityCheckSummary(BaseModel):
     total_issues: int = 0
     high_severity_issues: int = 0
     open_issues: int = 0
+
+
+class QualityIssueChange(BaseModel):
+    id: int
+    issue_type: str
+    description: str
+
+
+class QualityRecheckSummary(QualityCheckSummary):
+    """Issue counts after a recheck, with the issue types rerun and the issues it opened and closed."""
+    rechecked: List[str] = []
+    opened: List[QualityIssueChange] = []
+    closed: List[QualityIssueChange] = []
 # ==================== FEEDBACK MODELS ====================
 
 class FeedbackStatusEnum(str, Enum):
@@ -462,6 +497,38 @@ class CalculationResultResponse(CalculationResultBase):
         from_attributes = True
 
 
+class CalculationLoanResultItem(BaseModel):
+    loan_id: int
+    loan_no: Optional[str] = None
+    employee_id: Optional[str] = None
+    branch: Optional[str] = None
+    stage: str
+    outstanding_loan_balance: float
+    ead_value: Optional[float] = None
+    pd: Optional[float] = None
+    lgd: Optional[float] = None
+    ecl: Optional[float] = None
+    provision: float
+
+
+class CalculationLoanResultTotals(BaseModel):
+    num_loans: int
+    outstanding_loan_balance: float
+    ead_value: Optional[float] = None
+    ecl: Optional[float] = None
+    provision: float
+    average_pd: Optional[float] = None
+    average_lgd: Optional[float] = None
+
+
+class CalculationLoanResultsPage(BaseModel):
+    calculation_id: int
+    calculation_type: str
+    reporting_date: date
+    loans: List[CalculationLoanResultItem]
+    totals: Optional[CalculationLoanResultTotals] = None
+
+
 class PortfolioLatestResults(BaseModel):
     latest_local_impairment_staging: Optional[StagingResultResponse] = None
     latest_ecl_staging: Optional[StagingResultResponse] = None
@@ -1,23 +1,25 @@
-import asyncio
 import logging
-import threading
 import random
 from typing import Optional, Dict, Any
 from datetime import date, datetime
 from decimal import Decimal
 from sqlalchemy.orm import Session
-import pickle
-from app.database import SessionLocal
 from app.models import (
     Portfolio, Loan, Client, Security, StagingResult, CalculationResult
 )
-from app.utils.background_tasks import get_task_manager, run_background_task
+from app.utils.background_tasks import get_task_manager
+from app.utils.job_executor import submit_background_task
 from app.utils.ecl_calculator import (
-    calculate_loss_given_default, calculate_probability_of_default,
+    calculate_loss_given_default,
     calculate_exposure_at_default_percentage, calculate_marginal_ecl, is_in_range,
     get_amortization_schedule, get_ecl_by_stage, calculate_effective_interest_rate_lender
 )
 from app.utils.staging import parse_days_range
+from app.utils.risk_parameter_memo import (
+    RiskParameterMemo, ead_fingerprint, eir_fingerprint, lgd_fingerprint, pd_fingerprint
+)
+from app.calculators.ecl import pd_model_version, predict_probability_of_default
+from app.utils.calculation_loan_results import loan_result_row, save_loan_results, staged_loans
 from sqlalchemy import func
 
 logger = logging.getLogger(__name__)
@@ -38,7 +40,6 @@ async def process_ecl_calculation(
             progress=5,
             status_message=f"Starting ECL calculation for portfolio {portfolio_id}"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Verify portfolio exists
         portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
@@ -53,7 +54,6 @@ async def process_ecl_calculation(
             progress=10,
             status_message="Retrieving latest ECL staging data"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get the latest ECL staging result
         latest_staging = (
@@ -88,7 +88,6 @@ async def process_ecl_calculation(
             progress=20,
             status_message="Processing loan staging data"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get the loan staging data from the result_summary
         staging_data = []
@@ -118,7 +117,6 @@ async def process_ecl_calculation(
                 progress=30,
                 status_message=f"Re-staging {len(loans)} loans based on configuration"
             )
-            await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
             
             # Re-stage them
             for loan in loans:
@@ -169,7 +167,6 @@ async def process_ecl_calculation(
             progress=40,
             status_message="Retrieving loan and client data"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get all loans in the portfolio
         loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
@@ -198,40 +195,65 @@ async def process_ecl_calculation(
         total_ead_value = 0
         total_loans = 0
 
+        # (loan, stage, EAD, PD, LGD, loan-level ECL) for the calculation's per-loan results
+        loan_results = []
+
         get_task_manager().update_progress(
             task_id,
             progress=50,
             status_message=f"Retrieving client securities data for {len(staging_data)} loans"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get all client IDs to fetch securities
         client_ids = {loan.employee_id for loan in loans if loan.employee_id}
 
-        # Get securities for all clients
+        # Get securities for all clients, grouped by client employee_id
         client_securities = {}
+        # Birth year of each client, the PD model's only input
+        birth_years = {}
         if client_ids:
             securities = (
-                db.query(Security)
+                db.query(Client.employee_id, Security)
                 .join(Client, Security.client_id == Client.id)
                 .filter(Client.employee_id.in_(client_ids))
                 .all()
             )
+            for employee_id, security in securities:
+                client_securities.setdefault(employee_id, []).append(security)
 
-            # Group securities by client employee_id
-            for security in securities:
-                client = db.query(Client).filter(Client.id == security.client_id).first()
-                if client and client.employee_id:
-                    if client.employee_id not in client_securities:
-                        client_securities[client.employee_id] = []
-                    client_securities[client.employee_id].append(security)
+            for employee_id, date_of_birth in (
+                db.query(Client.employee_id, Client.date_of_birth)
+                .filter(Client.employee_id.in_(client_ids))
+                .all()
+            ):
+                birth_years.setdefault(employee_id, date_of_birth.year if date_of_birth else None)
+
+        # Reuse EIR, PD, LGD and EAD from earlier runs for loans whose inputs haven't changed
+        memo = RiskParameterMemo(db, portfolio_id).load()
+        try:
+            model_version = pd_model_version()
+        except OSError:
+            model_version = "unavailable"
+
+        pd_by_year = {}
+
+        def probability_of_default(year_of_birth):
+            """PD as a percentage; 5% when the birth year is unknown or the model fails."""
+            if year_of_birth is None:
+                return 5.0
+            if year_of_birth not in pd_by_year:
+                try:
+                    pd_by_year[year_of_birth] = predict_probability_of_default([year_of_birth])[year_of_birth]
+                except Exception as e:
+                    logger.error(f"Error calculating probability of default: {str(e)}")
+                    pd_by_year[year_of_birth] = 5.0
+            return pd_by_year[year_of_birth]
 
         get_task_manager().update_progress(
             task_id,
             progress=60,
             status_message=f"Calculating ECL for {len(staging_data)} loans"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Process loans using staging data
         total_items = len(staging_data)
@@ -245,7 +267,6 @@ async def process_ecl_calculation(
                     total_items=total_items,
                     status_message=f"Calculating ECL: Processed {i}/{total_items} loans ({round(i/total_items*100, 1)}%)"
                 )
-                await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
                 
             loan_id = stage_info.get("loan_id")
             stage = stage_info.get("stage")
@@ -266,13 +287,20 @@ async def process_ecl_calculation(
 
             # Calculate ECL components for the loan
             try:
-                lgd = calculate_loss_given_default(loan, client_securities_list)
+                lgd = memo.get(
+                    loan.loan_no, "lgd", lgd_fingerprint(loan, client_securities_list),
+                    lambda: calculate_loss_given_default(loan, client_securities_list),
+                )
             except Exception as e:
                 logger.warning(f"LGD calculation failed for loan {loan.id}: {str(e)}")
                 lgd = 0.65  # Default to 65% if calculation fails
             
             try:
-                pd = calculate_probability_of_default(loan, db)
+                year_of_birth = birth_years.get(loan.employee_id) if loan.employee_id else None
+                pd = memo.get(
+                    loan.loan_no, "pd", pd_fingerprint(year_of_birth, model_version),
+                    lambda: probability_of_default(year_of_birth),
+                )
             except Exception as e:
                 logger.warning(f"PD calculation failed for loan {loan.id}: {str(e)}")
                 pd = 0.05  # Default to 5% if calculation fails
@@ -282,7 +310,10 @@ async def process_ecl_calculation(
                     raise ValueError("Loan issue date is None")
                 if reporting_date is None:
                     raise ValueError("Reporting date is None")
-                ead_percentage = calculate_exposure_at_default_percentage(loan, reporting_date)
+                ead_percentage = memo.get(
+                    loan.loan_no, "ead", ead_fingerprint(loan, reporting_date),
+                    lambda: calculate_exposure_at_default_percentage(loan, reporting_date),
+                )
                 ead_value = Decimal(str(loan.outstanding_loan_balance)) * (Decimal(str(ead_percentage)) / Decimal('100'))
             except (TypeError, ValueError, AttributeError) as e:
                 logger.warning(f"EAD calculation failed for loan {loan.id}: {str(e)}")
@@ -307,11 +338,16 @@ async def process_ecl_calculation(
             # Get monthly installment
             monthly_installment = float(loan.monthly_installment) if loan.monthly_installment else 0
             
-            # Calculate effective interest rate
-            admin_fees = float(loan.administrative_fees) if loan.administrative_fees else 0
-            effective_interest_rate = calculate_effective_interest_rate_lender(
-                loan_amount, admin_fees, loan_term, monthly_installment
-            )
+            # Read effective interest rate stored at ingestion
+            effective_interest_rate = loan.effective_interest_rate
+            if effective_interest_rate is None:
+                admin_fees = float(loan.administrative_fees) if loan.administrative_fees else 0
+                effective_interest_rate = memo.get(
+                    loan.loan_no, "eir", eir_fingerprint(loan),
+                    lambda: calculate_effective_interest_rate_lender(
+                        loan_amount, admin_fees, loan_term, monthly_installment
+                    ),
+                )
             
             # Default to 24% if calculation fails
             if effective_interest_rate is None:
@@ -366,6 +402,11 @@ async def process_ecl_calculation(
                 raise ValueError(error_msg) from e
             """
             # Update stage totals based on the assigned stage
+            if stage not in ("Stage 1", "Stage 2", "Stage 3"):
+                # Default to Stage 3 if stage is something unexpected
+                logger.warning(f"Unexpected stage '{stage}' for loan {loan_id}, treating as Stage 3")
+                stage = "Stage 3"
+            loan_results.append((loan, stage, ead_value, pd, lgd, provision_amount))
             if stage == "Stage 1":
                 stage_1_loans.append(loan)
                 stage_1_total += outstanding_loan_balance
@@ -374,13 +415,7 @@ async def process_ecl_calculation(
                 stage_2_loans.append(loan)
                 stage_2_total += outstanding_loan_balance
                 stage_2_provision += provision_amount
-            elif stage == "Stage 3":
-                stage_3_loans.append(loan)
-                stage_3_total += outstanding_loan_balance
-                stage_3_provision += provision_amount
             else:
-                # Default to Stage 3 if stage is something unexpected
-                logger.warning(f"Unexpected stage '{stage}' for loan {loan_id}, treating as Stage 3")
                 stage_3_loans.append(loan)
                 stage_3_total += outstanding_loan_balance
                 stage_3_provision += provision_amount
@@ -396,7 +431,16 @@ async def process_ecl_calculation(
             progress=90,
             status_message="Finalizing ECL calculation results"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
+        
+        # Store the parameters computed in this run for the next one
+        memo_stats = memo.stats()
+        try:
+            memo_stats["saved"] = memo.save()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error saving risk parameters: {str(e)}")
+        logger.info(f"Risk parameter reuse for portfolio {portfolio_id}: {memo_stats}")
         
         # Calculate averages for summary metrics
         avg_lgd = total_lgd / total_loans if total_loans > 0 else 0
@@ -432,7 +476,6 @@ async def process_ecl_calculation(
             progress=95,
             status_message="Saving calculation results to database"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Create a new CalculationResult record
         calculation_result = CalculationResult(
@@ -461,13 +504,30 @@ async def process_ecl_calculation(
                     "provision_amount": float(stage_3_provision),
                     "provision_rate": float(stage_3_rate),
                 },
-                "total_loans": total_loans
+                "total_loans": total_loans,
+                "risk_parameter_memo": memo_stats,
             },
             total_provision=float(total_provision),
             provision_percentage=float(provision_percentage),
             reporting_date=reporting_date
         )
         db.add(calculation_result)
+        db.flush()
+
+        # Keep each loan's result so it can be drilled into without recomputing
+        stage_rates = {"Stage 1": stage_1_rate, "Stage 2": stage_2_rate, "Stage 3": stage_3_rate}
+        save_loan_results(db, calculation_result, (
+            loan_result_row(
+                loan,
+                stage,
+                provision=Decimal(str(loan.outstanding_loan_balance)) * stage_rates[stage],
+                ead_value=ead_value,
+                pd=pd,
+                lgd=lgd,
+                ecl=ecl,
+            )
+            for loan, stage, ead_value, pd, lgd, ecl in loan_results
+        ))
         db.commit()
 
         get_task_manager().update_progress(
@@ -475,7 +535,6 @@ async def process_ecl_calculation(
             progress=100,
             status_message="ECL calculation completed successfully"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Return the calculation result ID
         return {
@@ -483,7 +542,8 @@ async def process_ecl_calculation(
             "portfolio_id": portfolio_id,
             "total_provision": float(total_provision),
             "provision_percentage": float(provision_percentage),
-            "total_loans": total_loans
+            "total_loans": total_loans,
+            "risk_parameter_memo": memo_stats,
         }
         
     except Exception as e:
@@ -510,7 +570,6 @@ async def process_local_impairment_calculation(
             progress=5,
             status_message=f"Starting local impairment calculation for portfolio {portfolio_id}"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Verify portfolio exists
         portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
@@ -522,7 +581,6 @@ async def process_local_impairment_calculation(
             progress=10,
             status_message="Retrieving latest local impairment staging data"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get the latest local impairment staging result
         latest_staging = (
@@ -548,7 +606,6 @@ async def process_local_impairment_calculation(
             progress=20,
             status_message="Processing loan staging data"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get the loan staging data from the result_summary
         staging_data = []
@@ -580,7 +637,6 @@ async def process_local_impairment_calculation(
                 progress=30,
                 status_message=f"Re-staging {len(loans)} loans based on configuration"
             )
-            await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
             
             # Re-stage them
             for loan in loans:
@@ -620,7 +676,6 @@ async def process_local_impairment_calculation(
             progress=40,
             status_message="Retrieving loan data"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Get all loans in the portfolio
         loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
@@ -642,6 +697,9 @@ async def process_local_impairment_calculation(
         doubtful_total = 0
         loss_total = 0
 
+        # (loan, category) for the calculation's per-loan results
+        loan_results = []
+
         # Get provision rates from config
         try:
             # Check if we have a provision_config object
@@ -690,7 +748,6 @@ async def process_local_impairment_calculation(
             progress=60,
             status_message=f"Calculating local impairment for {len(staging_data)} loans"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Process loans using staging data
         total_items = len(staging_data)
@@ -704,7 +761,6 @@ async def process_local_impairment_calculation(
                     total_items=total_items,
                     status_message=f"Calculating local impairment: Processed {i}/{total_items} loans ({round(i/total_items*100, 1)}%)"
                 )
-                await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
                 
             loan_id = stage_info.get("loan_id")
             stage = stage_info.get("stage")
@@ -721,6 +777,11 @@ async def process_local_impairment_calculation(
             outstanding_loan_balance = loan.outstanding_loan_balance
             
             # Update category totals based on the assigned stage
+            if stage not in ("Current", "OLEM", "Substandard", "Doubtful", "Loss"):
+                # Default to Loss if stage is something unexpected
+                logger.warning(f"Unexpected stage '{stage}' for loan {loan_id}, treating as Loss")
+                stage = "Loss"
+            loan_results.append((loan, stage))
             if stage == "Current":
                 current_loans.append(loan)
                 current_total += outstanding_loan_balance
@@ -733,12 +794,7 @@ async def process_local_impairment_calculation(
             elif stage == "Doubtful":
                 doubtful_loans.append(loan)
                 doubtful_total += outstanding_loan_balance
-            elif stage == "Loss":
-                loss_loans.append(loan)
-                loss_total += outstanding_loan_balance
             else:
-                # Default to Loss if stage is something unexpected
-                logger.warning(f"Unexpected stage '{stage}' for loan {loan_id}, treating as Loss")
                 loss_loans.append(loan)
                 loss_total += outstanding_loan_balance
 
@@ -747,7 +803,6 @@ async def process_local_impairment_calculation(
             progress=90,
             status_message="Finalizing local impairment calculation results",
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Calculate provisions for each category
         current_provision = current_total * current_rate
@@ -822,6 +877,24 @@ async def process_local_impairment_calculation(
             reporting_date=reporting_date
         )
         db.add(calculation_result)
+        db.flush()
+
+        # Keep each loan's result so it can be drilled into without recomputing
+        category_rates = {
+            "Current": current_rate,
+            "OLEM": olem_rate,
+            "Substandard": substandard_rate,
+            "Doubtful": doubtful_rate,
+            "Loss": loss_rate,
+        }
+        save_loan_results(db, calculation_result, (
+            loan_result_row(
+                loan,
+                category,
+                provision=Decimal(str(loan.outstanding_loan_balance)) * category_rates[category],
+            )
+            for loan, category in loan_results
+        ))
         db.commit()
 
         get_task_manager().update_progress(
@@ -829,14 +902,12 @@ async def process_local_impairment_calculation(
             progress=95,
             status_message="Saving local impairment calculation results to database"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         get_task_manager().update_progress(
             task_id,
             progress=100,
             status_message="Local impairment calculation completed successfully"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         # Return the calculation result ID
         return {
@@ -872,44 +943,14 @@ async def start_background_ecl_calculation(
         description=f"Calculating ECL for portfolio {portfolio_id}"
     )
     
-    # Define a function to run the background task in a separate thread
-    def run_task_in_thread():
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Create a new database session for this thread
-        thread_db = SessionLocal()
-        
-        try:
-            # Run the background task in this thread's event loop
-            loop.run_until_complete(
-                run_background_task(
-                    task_id,
-                    process_ecl_calculation,
-                    portfolio_id=portfolio_id,
-                    reporting_date=reporting_date,
-                    db=thread_db
-                )
-            )
-            
-            # Properly await any pending notifications before closing the loop
-            pending = asyncio.all_tasks(loop)
-            if pending:
-                loop.run_until_complete(asyncio.gather(*pending))
-                
-        except Exception as e:
-            logger.exception(f"Error in background task thread: {e}")
-            get_task_manager().mark_as_failed(task_id, str(e))
-        finally:
-            # Close the database session
-            thread_db.close()
-            loop.close()
-    
-    # Start the task in a separate thread
-    thread = threading.Thread(target=run_task_in_thread)
-    thread.daemon = True  # Allow the thread to be terminated when the main program exits
-    thread.start()
+    # Run on the job executor's I/O pool, bounded per job type
+    submit_background_task(
+        "ecl_calculation",
+        task_id,
+        process_ecl_calculation,
+        portfolio_id=portfolio_id,
+        reporting_date=reporting_date
+    )
     
     return task_id
 
@@ -929,44 +970,14 @@ async def start_background_local_impairment_calculation(
         description=f"Calculating local impairment for portfolio {portfolio_id}"
     )
     
-    # Define a function to run the background task in a separate thread
-    def run_task_in_thread():
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Create a new database session for this thread
-        thread_db = SessionLocal()
-        
-        try:
-            # Run the background task in this thread's event loop
-            loop.run_until_complete(
-                run_background_task(
-                    task_id,
-                    process_local_impairment_calculation,
-                    portfolio_id=portfolio_id,
-                    reporting_date=reporting_date,
-                    db=thread_db
-                )
-            )
-            
-            # Properly await any pending notifications before closing the loop
-            pending = asyncio.all_tasks(loop)
-            if pending:
-                loop.run_until_complete(asyncio.gather(*pending))
-                
-        except Exception as e:
-            logger.exception(f"Error in background task thread: {e}")
-            get_task_manager().mark_as_failed(task_id, str(e))
-        finally:
-            # Close the database session
-            thread_db.close()
-            loop.close()
-    
-    # Start the task in a separate thread
-    thread = threading.Thread(target=run_task_in_thread)
-    thread.daemon = True  # Allow the thread to be terminated when the main program exits
-    thread.start()
+    # Run on the job executor's I/O pool, bounded per job type
+    submit_background_task(
+        "local_impairment_calculation",
+        task_id,
+        process_local_impairment_calculation,
+        portfolio_id=portfolio_id,
+        reporting_date=reporting_date
+    )
     
     return task_id
 
@@ -1159,9 +1170,25 @@ def process_ecl_calculation_sync(
     )
     
     db.add(calculation_result)
+    db.flush()
+
+    # Keep each loan's result for the drill-down. Exposure is the outstanding
+    # balance and the ECL is the provision at the stage's rate; PD and LGD
+    # aren't modelled here and stay empty.
+    stage_rates = {"Stage 1": stage_1_rate, "Stage 2": stage_2_rate, "Stage 3": stage_3_rate}
+
+    def loan_rows():
+        for loan in staged_loans(db, portfolio_id, Loan.stage):
+            if loan.stage not in stage_rates:
+                continue
+            balance = Decimal(str(loan.outstanding_loan_balance or 0))
+            provision = balance * stage_rates[loan.stage]
+            yield loan_result_row(loan, loan.stage, provision=provision, ead_value=balance, ecl=provision)
+
+    saved = save_loan_results(db, calculation_result, loan_rows())
     db.commit()
     
-    logger.info(f"ECL calculation completed for portfolio {portfolio_id}")
+    logger.info(f"ECL calculation completed for portfolio {portfolio_id}, {saved} loan results saved")
     
     return {
         "status": "success",
@@ -1280,9 +1307,28 @@ def process_local_impairment_calculation_sync(
     )
     
     db.add(calculation_result)
+    db.flush()
+
+    # Keep each loan's result for the drill-down
+    category_rates = {
+        "Current": current_rate,
+        "OLEM": olem_rate,
+        "Substandard": substandard_rate,
+        "Doubtful": doubtful_rate,
+        "Loss": loss_rate,
+    }
+    saved = save_loan_results(db, calculation_result, (
+        loan_result_row(
+            loan,
+            loan.stage,
+            provision=Decimal(str(loan.outstanding_loan_balance or 0)) * category_rates[loan.stage],
+        )
+        for loan in staged_loans(db, portfolio_id, Loan.impairment_category)
+        if loan.stage in category_rates
+    ))
     db.commit()
     
-    logger.info(f"Local impairment calculation completed for portfolio {portfolio_id}")
+    logger.info(f"Local impairment calculation completed for portfolio {portfolio_id}, {saved} loan results saved")
     
     return {
         "status": "success",
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from typing import Optional, Dict, Any, List
 from fastapi import UploadFile
@@ -18,7 +17,8 @@ from app.models import (
     CalculationResult,
     QualityIssue
 )
-from app.utils.background_tasks import get_task_manager, run_background_task
+from app.utils.background_tasks import get_task_manager
+from app.utils.job_executor import submit_background_task
 from app.utils.background_processors import (
     process_loan_details_with_progress,
     process_client_data_with_progress
@@ -26,14 +26,14 @@ from app.utils.background_processors import (
 from app.utils.sync_processors import (
     process_loan_details_sync,
     process_client_data_sync,
+    process_loan_guarantees_sync,
+    process_collateral_data_sync,
     run_quality_checks_sync,
-    
 )
 from app.utils.background_calculations import (
     process_ecl_calculation_sync,
     process_local_impairment_calculation_sync
 )
-from app.database import SessionLocal
 from app.schemas import ECLStagingConfig, LocalImpairmentConfig, DaysRangeConfig
 from app.utils.staging import (
     stage_loans_ecl_orm, 
@@ -41,7 +41,9 @@ from app.utils.staging import (
     stage_loans_ecl_orm_sync,
     stage_loans_local_impairment_orm_sync
 )
-from app.utils.quality_checks import create_quality_issues_if_needed, create_and_save_quality_issues
+from app.utils.quality_checks import create_quality_issues_if_needed, refresh_quality_issues
+from app.utils.partitions import clear_portfolio_rows
+from app.utils.portfolio_reload import PortfolioReload
 
 logger = logging.getLogger(__name__)
 
@@ -86,13 +88,14 @@ async def process_portfolio_ingestion(
             staging_count = db.query(StagingResult).filter(StagingResult.portfolio_id == portfolio_id).delete()
             calculation_count = db.query(CalculationResult).filter(CalculationResult.portfolio_id == portfolio_id).delete()
             
-            # Delete quality issues
-            quality_count = db.query(QualityIssue).filter(QualityIssue.portfolio_id == portfolio_id).delete()
+            # Quality issues are kept: the recheck after loading closes the ones
+            # the new data no longer has and keeps the status of the rest
             
-            # Delete loans, guarantees, and clients
-            loan_count = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).delete()
-            guarantee_count = db.query(Guarantee).filter(Guarantee.portfolio_id == portfolio_id).delete()
-            client_count = db.query(Client).filter(Client.portfolio_id == portfolio_id).delete()
+            # Clear loans, guarantees, and clients (truncates their partitions when partitioned)
+            cleared = clear_portfolio_rows(db, portfolio_id)
+            loan_count = cleared["loans"]
+            guarantee_count = cleared["guarantees"]
+            client_count = cleared["clients"]
             
             # Commit the deletions
             db.commit()
@@ -101,7 +104,7 @@ async def process_portfolio_ingestion(
             
             # Log the deletion results but don't add to response
             logger.info(f"Data cleared: loans={loan_count}, clients={client_count}, guarantees={guarantee_count}, " +
-                       f"quality_issues={quality_count}, staging_results={staging_count}, calculation_results={calculation_count}")
+                       f"staging_results={staging_count}, calculation_results={calculation_count}")
             
         except Exception as e:
             logger.error(f"Error clearing existing data: {str(e)}")
@@ -574,10 +577,9 @@ async def process_portfolio_ingestion(
                 progress=99,
                 status_message="Checking data quality"
             )
-            await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
             
-            # Create quality issues
-            quality_result = create_and_save_quality_issues(db, portfolio_id, task_id)
+            # Recheck quality issues against the new data
+            quality_result = refresh_quality_issues(db, portfolio_id)
             results["quality_checks"] = quality_result
             db.commit()
             
@@ -595,7 +597,6 @@ async def process_portfolio_ingestion(
             progress=100,
             status_message=f"Completed processing {results['files_processed']} files"
         )
-        await asyncio.sleep(0.1)  # Small delay to ensure WebSocket message is sent
         
         return results
         
@@ -633,35 +634,18 @@ def process_portfolio_ingestion_sync(
             "details": {}
         }
         
-        # Check for and delete existing data for this portfolio
+        # Load into shadow tables; the existing data keeps serving reads until the swap
+        reload = PortfolioReload(db, portfolio_id)
         try:
-            logger.info(f"Checking for existing data in portfolio {portfolio_id}")
-            
-            # Delete existing data in reverse order of dependencies
-            # First delete staging results and calculation results
-            staging_count = db.query(StagingResult).filter(StagingResult.portfolio_id == portfolio_id).delete()
-            calculation_count = db.query(CalculationResult).filter(CalculationResult.portfolio_id == portfolio_id).delete()
-            
-            # Delete quality issues
-            quality_count = db.query(QualityIssue).filter(QualityIssue.portfolio_id == portfolio_id).delete()
-            
-            # Delete loans, guarantees, and clients
-            loan_count = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).delete()
-            guarantee_count = db.query(Guarantee).filter(Guarantee.portfolio_id == portfolio_id).delete()
-            client_count = db.query(Client).filter(Client.portfolio_id == portfolio_id).delete()
-            
-            # Commit the deletions
-            db.commit()
-            
-            logger.info(f"Cleared existing data: {loan_count} loans, {client_count} clients, {guarantee_count} guarantees")
-            
-            # Log the deletion results but don't add to response
-            logger.info(f"Data cleared: loans={loan_count}, clients={client_count}, guarantees={guarantee_count}, " +
-                       f"quality_issues={quality_count}, staging_results={staging_count}, calculation_results={calculation_count}")
-            
+            reload.prepare()
         except Exception as e:
-            logger.error(f"Error clearing existing data: {str(e)}")
-            results["errors"] = results.get("errors", []) + [f"Error clearing existing data: {str(e)}"]
+            reload.discard()
+            logger.error(f"Error preparing shadow tables: {str(e)}")
+            return {
+                "status": "error",
+                "error": f"Error preparing data load: {str(e)}",
+                "portfolio_id": portfolio_id
+            }
         
         # Count files to process
         files_to_process = 0
@@ -685,7 +669,7 @@ def process_portfolio_ingestion_sync(
                 loan_details_io = io.BytesIO(loan_details_content)
                 
                 # Process the loan details
-                loan_results = process_loan_details_sync(loan_details_io, portfolio_id, db)
+                loan_results = process_loan_details_sync(loan_details_io, portfolio_id, db, target_table=reload.shadow("loans"))
                 
                 # Add results to the overall results
                 results["details"]["loan_details"] = loan_results
@@ -707,7 +691,7 @@ def process_portfolio_ingestion_sync(
                 client_data_io = io.BytesIO(client_data_content)
                 
                 # Process the client data
-                client_results = process_client_data_sync(client_data_io, portfolio_id, db)
+                client_results = process_client_data_sync(client_data_io, portfolio_id, db, target_table=reload.shadow("clients"))
                 
                 # Add results to the overall results
                 results["details"]["client_data"] = client_results
@@ -720,6 +704,31 @@ def process_portfolio_ingestion_sync(
                 results["details"]["client_data"] = {"error": str(e)}
                 results["errors"] = results.get("errors", []) + [f"Error processing client data: {str(e)}"]
         
+        # Swap the new data in only if loans and clients loaded and the shadow tables check out
+        if any("error" in detail for detail in results["details"].values()):
+            reload.discard()
+            results["status"] = "error"
+            logger.info(f"Portfolio {portfolio_id} ingestion failed, existing data left in place")
+            return results
+        
+        try:
+            expected = {}
+            if "loan_details" in results["details"]:
+                expected["loans"] = results["details"]["loan_details"].get("processed", 0)
+            if "client_data" in results["details"]:
+                expected["clients"] = results["details"]["client_data"].get("processed", 0)
+            reload.swap(expected)
+        except Exception as e:
+            reload.discard()
+            logger.error(f"Error swapping in new data: {str(e)}")
+            results["status"] = "error"
+            results["error"] = f"Error swapping in new data: {str(e)}"
+            return results
+        
+        # Guarantees and collateral are loaded into the live tables once the new
+        # clients are in, so collateral links to them. A failure here is reported
+        # with the file but doesn't undo the loans and clients swap.
+        
         # Process loan guarantee data if provided
         if loan_guarantee_data_content:
             try:
@@ -734,6 +743,8 @@ def process_portfolio_ingestion_sync(
                 # Add results to the overall results
                 results["details"]["loan_guarantee_data"] = guarantee_results
                 results["files_processed"] += 1
+                if "error" in guarantee_results:
+                    results["errors"] = results.get("errors", []) + [f"Error processing loan guarantee data: {guarantee_results['error']}"]
                 
                 logger.info(f"Processed {guarantee_results.get('processed', 0)} guarantee records")
                 
@@ -756,6 +767,8 @@ def process_portfolio_ingestion_sync(
                 # Add results to the overall results
                 results["details"]["loan_collateral_data"] = collateral_results
                 results["files_processed"] += 1
+                if "error" in collateral_results:
+                    results["errors"] = results.get("errors", []) + [f"Error processing loan collateral data: {collateral_results['error']}"]
                 
                 logger.info(f"Processed {collateral_results.get('processed', 0)} collateral records")
                 
@@ -954,50 +967,20 @@ async def start_background_ingestion(
         loan_collateral_data_content = await loan_collateral_data.read()
         loan_collateral_data_filename = loan_collateral_data.filename
     
-    # Define a function to run the background task in a separate thread
-    def run_task_in_thread():
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Create a new database session for this thread
-        thread_db = SessionLocal()
-        
-        try:
-            # Run the background task in this thread's event loop
-            loop.run_until_complete(
-                run_background_task(
-                    task_id,
-                    process_portfolio_ingestion,
-                    portfolio_id=portfolio_id,
-                    loan_details_content=loan_details_content,
-                    loan_details_filename=loan_details_filename,
-                    client_data_content=client_data_content,
-                    client_data_filename=client_data_filename,
-                    loan_guarantee_data_content=loan_guarantee_data_content,
-                    loan_guarantee_data_filename=loan_guarantee_data_filename,
-                    loan_collateral_data_content=loan_collateral_data_content,
-                    loan_collateral_data_filename=loan_collateral_data_filename,
-                    db=thread_db
-                )
-            )
-            
-            # Properly await any pending notifications before closing the loop
-            pending = asyncio.all_tasks(loop)
-            if pending:
-                loop.run_until_complete(asyncio.gather(*pending))
-                
-        except Exception as e:
-            logger.exception(f"Error in background task thread: {e}")
-            get_task_manager().mark_as_failed(task_id, str(e))
-        finally:
-            # Close the database session
-            thread_db.close()
-            loop.close()
-    
-    # Start the task in a separate thread
-    thread = threading.Thread(target=run_task_in_thread)
-    thread.daemon = True  # Allow the thread to be terminated when the main program exits
-    thread.start()
+    # Run on the job executor's I/O pool, bounded per job type
+    submit_background_task(
+        "portfolio_ingestion",
+        task_id,
+        process_portfolio_ingestion,
+        portfolio_id=portfolio_id,
+        loan_details_content=loan_details_content,
+        loan_details_filename=loan_details_filename,
+        client_data_content=client_data_content,
+        client_data_filename=client_data_filename,
+        loan_guarantee_data_content=loan_guarantee_data_content,
+        loan_guarantee_data_filename=loan_guarantee_data_filename,
+        loan_collateral_data_content=loan_collateral_data_content,
+        loan_collateral_data_filename=loan_collateral_data_filename
+    )
     
     return task_id
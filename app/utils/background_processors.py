@@ -1,9 +1,7 @@
 import io
-import polars as pl
 from datetime import datetime
 import logging
-import asyncio
-from typing import Optional, Dict, Any, List, Callable
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Callable
 from sqlalchemy import text
 
 from app.models import (
@@ -14,9 +12,21 @@ from app.models import (
     Portfolio
 )
 from app.utils.background_tasks import get_task_manager
+from app.utils.sync_processors import with_effective_interest_rate, EIR_INPUT_COLUMNS
+from app.utils.job_executor import get_job_executor
+
+if TYPE_CHECKING:
+    import polars as pl
 
 logger = logging.getLogger(__name__)
 
+def read_excel_bytes(file_content: bytes) -> "pl.DataFrame":
+    """Parse an uploaded Excel file. Runs in a worker process, so it must stay picklable."""
+    import polars as pl
+
+    return pl.read_excel(io.BytesIO(file_content))
+
+
 async def process_loan_details_with_progress(
     task_id: str, 
     file_content: bytes, 
@@ -25,6 +35,8 @@ async def process_loan_details_with_progress(
     progress_callback: Optional[Callable] = None
 ):
     """Function to process loan details with progress reporting."""
+    import polars as pl
+
     try:
         # Get task manager
         task_manager = get_task_manager()
@@ -91,11 +103,8 @@ async def process_loan_details_with_progress(
         # Update task status
         task_manager.update_task(task_id, status_message="Reading Excel file")
         
-        # Create a BytesIO object from the file content
-        excel_buffer = io.BytesIO(file_content)
-        
-        # Read the Excel file with Polars
-        df_excel = pl.read_excel(excel_buffer)
+        # Parse the Excel file in the job executor's process pool
+        df_excel = await get_job_executor().run_cpu(read_excel_bytes, file_content)
         
         # Get total rows
         total_rows = df_excel.height
@@ -270,6 +279,9 @@ async def process_loan_details_with_progress(
             # Add portfolio_id to all records
             df_chunk = df_chunk.with_columns(pl.lit(portfolio_id).alias("portfolio_id"))
             
+            # Solve the effective interest rate for the whole chunk at once
+            df_chunk = with_effective_interest_rate(df_chunk)
+            
             # Check if loan_no column exists after mapping
             if "loan_no" not in df_chunk.columns:
                 # If loan_no doesn't exist, use the first column as loan_no
@@ -309,11 +321,21 @@ async def process_loan_details_with_progress(
                             if col not in ["id", "portfolio_id", "loan_no"] and row[col] is not None:
                                 update_values[col] = row[col]
                         
+                        # Only replace the stored EIR when one of its inputs changed
+                        effective_interest_rate = update_values.pop("effective_interest_rate", None)
+                        
                         if update_values and row["loan_no"] in existing_loan_nos:
                             loan = db.query(Loan).filter(Loan.id == existing_loan_nos[row["loan_no"]]).first()
                             if loan:
+                                eir_inputs_changed = any(
+                                    getattr(loan, key) is None or float(getattr(loan, key)) != float(value)
+                                    for key, value in update_values.items()
+                                    if key in EIR_INPUT_COLUMNS
+                                )
                                 for key, value in update_values.items():
                                     setattr(loan, key, value)
+                                if eir_inputs_changed or loan.effective_interest_rate is None:
+                                    loan.effective_interest_rate = effective_interest_rate
                                 chunk_updated += 1
                     
                     # Commit batch
@@ -353,7 +375,8 @@ async def process_loan_details_with_progress(
                                "total_paid2", "paid", "cancelled", "outstanding_loan_balance", 
                                "accumulated_arrears", "ndia", "prevailing_posted_repayment", 
                                "prevailing_due_payment", "current_missed_deduction", 
-                               "admin_charge", "recovery_rate", "deduction_status"]:
+                               "admin_charge", "recovery_rate", "deduction_status",
+                               "effective_interest_rate"]:
                         if col in df_insert.columns:
                             if col in date_columns and row[col] is not None:
                                 values.append(str(row[col]))
@@ -411,7 +434,8 @@ async def process_loan_details_with_progress(
                                 "total_paid2", "paid", "cancelled", "outstanding_loan_balance", 
                                 "accumulated_arrears", "ndia", "prevailing_posted_repayment", 
                                 "prevailing_due_payment", "current_missed_deduction", 
-                                "admin_charge", "recovery_rate", "deduction_status"
+                                "admin_charge", "recovery_rate", "deduction_status",
+                                "effective_interest_rate"
                             ],
                             sep="\t",
                             null=""
@@ -466,9 +490,6 @@ async def process_loan_details_with_progress(
                     processed_items=(chunk_idx + 1) * chunk_size,
                     status_message=f"Processed chunk {chunk_idx + 1}/{num_chunks}: {chunk_inserted} inserted, {chunk_updated} updated"
                 )
-            
-            # Add a small delay to ensure WebSocket message is sent before continuing
-            await asyncio.sleep(0.1)
         
         # Final commit and progress update
         db.commit()
@@ -507,6 +528,8 @@ async def process_client_data_with_progress(
     progress_callback: Optional[Callable] = None
 ):
     """Process client data file with progress reporting."""
+    import polars as pl
+
     try:
         # Get task manager
         task_manager = get_task_manager()
@@ -553,11 +576,8 @@ async def process_client_data_with_progress(
         # Update task status
         task_manager.update_task(task_id, status_message="Reading Excel file")
         
-        # Create a BytesIO object from the file content
-        excel_buffer = io.BytesIO(file_content)
-        
-        # Read the Excel file with Polars
-        df_excel = pl.read_excel(excel_buffer)
+        # Parse the Excel file in the job executor's process pool
+        df_excel = await get_job_executor().run_cpu(read_excel_bytes, file_content)
         
         # Get total rows
         total_rows = df_excel.height
@@ -867,9 +887,6 @@ async def process_client_data_with_progress(
                     processed_items=(chunk_idx + 1) * chunk_size,
                     status_message=f"Processed chunk {chunk_idx + 1}/{num_chunks}: {chunk_inserted} inserted, {chunk_updated} updated"
                 )
-            
-            # Add a small delay to ensure WebSocket message is sent before continuing
-            await asyncio.sleep(0.1)
         
         # Final commit and progress update
         db.commit()
@@ -7,6 +7,8 @@ from datetime import datetime
 import json
 import threading
 from collections import deque
+from app.config import settings
+from app.utils.task_registry import InMemoryTaskRegistry, TERMINAL_STATUSES, create_task_registry
 
 logger = logging.getLogger(__name__)
 
@@ -36,67 +38,115 @@ def serialize_task_info(task_info: Dict[str, Any]) -> Dict[str, Any]:
             serialized[key] = value
     return serialized
 
+class ProgressThrottle:
+    """
+    Rate-limits progress notifications per task.
+
+    At most max_per_second deliveries happen for a task. A submit that
+    arrives too soon is deferred with call_later, and since delivery reads
+    the latest task state, the last value is always delivered. call_later
+    returns False when nothing can run the deferred delivery, in which
+    case the update is delivered straight away.
+    """
+    def __init__(
+        self,
+        deliver: Callable[[str], None],
+        max_per_second: float,
+        call_later: Callable[..., bool],
+    ):
+        self.deliver = deliver
+        self.call_later = call_later
+        self.interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._last_delivered: Dict[str, float] = {}
+        # Token of each task's scheduled delivery; a delivery whose token was
+        # replaced or removed since it was scheduled does nothing
+        self._pending: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, task_id: str, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            wait = self._last_delivered.get(task_id, 0) + self.interval - now
+            if not force and wait > 0:
+                if task_id in self._pending:
+                    return
+                token = self._pending[task_id] = object()
+                if self.call_later(wait, self._deliver_deferred, task_id, token):
+                    return
+            self._pending.pop(task_id, None)
+            self._last_delivered[task_id] = now
+        self.deliver(task_id)
+
+    def _deliver_deferred(self, task_id: str, token: object) -> None:
+        with self._lock:
+            if self._pending.get(task_id) is not token:
+                return
+            del self._pending[task_id]
+            self._last_delivered[task_id] = time.monotonic()
+        self.deliver(task_id)
+
+    def forget(self, task_id: str) -> None:
+        with self._lock:
+            self._last_delivered.pop(task_id, None)
+            self._pending.pop(task_id, None)
+
 class BackgroundTaskManager:
     """
     Manages background tasks and their progress tracking.
+    Task state lives in a registry, which may be shared between worker processes.
+
+    Updates can be published from any thread, but subscribers are always
+    notified on the server's event loop, bound at startup (or by the first
+    subscribe), since that's the loop their WebSockets belong to.
     """
-    def __init__(self, max_concurrent_tasks=5):
-        self.tasks: Dict[str, Dict[str, Any]] = {}
-        self._loop = None
+    def __init__(self, max_concurrent_tasks=5, registry: Optional[InMemoryTaskRegistry] = None):
+        self.registry = registry or create_task_registry()
+        self.subscribers: Dict[str, set] = {}
+        self._subscribers_lock = threading.Lock()
+        self._watchers: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.max_concurrent_tasks = max_concurrent_tasks
         self.running_tasks = 0
+        self._running_lock = threading.Lock()
+        self.progress_throttle = ProgressThrottle(
+            self._deliver_update, settings.TASK_PROGRESS_MAX_UPDATES_PER_SECOND, self._call_later
+        )
         self.task_queue = deque()
         self.task_semaphore = asyncio.Semaphore(max_concurrent_tasks)
-        
-    def _ensure_loop(self):
-        """Ensure we have an event loop for the current thread"""
-        try:
-            self._loop = asyncio.get_event_loop()
-        except RuntimeError:
-            # If there's no event loop in this thread, create one
-            self._loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self._loop)
-        return self._loop
-    
-    def _run_coroutine(self, coro):
-        """Run a coroutine in the appropriate way depending on context"""
-        loop = self._ensure_loop()
-        
-        # Check if we're in an async context
+
+    def bind_loop(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Notify subscribers on loop, by default the running one."""
+        self._loop = loop or asyncio.get_running_loop()
+
+    def _bound_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return None
+        return loop
+
+    def _on_bound_loop(self, loop: asyncio.AbstractEventLoop) -> bool:
         try:
-            # If we're in an async context, we can just create a task
-            if asyncio.get_running_loop() == loop:
-                return asyncio.create_task(coro)
+            return asyncio.get_running_loop() is loop
         except RuntimeError:
-            # We're not in an async context, run the coroutine to completion
-            if threading.current_thread() is threading.main_thread():
-                # In the main thread, we can use run_until_complete
-                return loop.run_until_complete(coro)
-            else:
-                # In a background thread, we need to run the coroutine in a way
-                # that doesn't block the thread
-                try:
-                    # Get the current event loop in this thread
-                    thread_loop = asyncio.get_event_loop()
-                    # If we have a valid loop, run the coroutine in it
-                    if thread_loop.is_running():
-                        # Create a task in the current loop
-                        return thread_loop.create_task(coro)
-                    else:
-                        # Run the coroutine to completion
-                        return thread_loop.run_until_complete(coro)
-                except RuntimeError:
-                    # No event loop in this thread, use run_coroutine_threadsafe
-                    future = asyncio.run_coroutine_threadsafe(coro, loop)
-                    # We don't wait for the result, this is fire-and-forget
-                    return None
-        
+            return False
+
+    def _call_later(self, delay: float, callback: Callable, *args) -> bool:
+        """Run callback on the bound loop after delay seconds. Safe to call from any thread."""
+        loop = self._bound_loop()
+        if loop is None:
+            return False
+        if self._on_bound_loop(loop):
+            loop.call_later(delay, callback, *args)
+        else:
+            loop.call_soon_threadsafe(loop.call_later, delay, callback, *args)
+        return True
+
     def create_task(self, task_type: str, description: str) -> str:
         """
         Create a new background task and return its ID.
         """
         task_id = str(uuid.uuid4())
-        self.tasks[task_id] = {
+        self.registry.create({
             "id": task_id,
             "type": task_type,
             "description": description,
@@ -109,29 +159,45 @@ class BackgroundTaskManager:
             "result": None,
             "total_items": 0,
             "processed_items": 0,
-            "subscribers": set()
-        }
+        })
         return task_id
     
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
         Get task information by ID.
         """
-        if task_id in self.tasks:
-            task_info = self.tasks[task_id].copy()
-            # Remove the subscribers set from the returned info
-            task_info.pop("subscribers", None)
+        task_info = self.registry.get(task_id)
+        if task_info is not None:
             return serialize_task_info(task_info)
         return None
     
+    def _apply(self, task_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Apply updates through the registry and notify local subscribers.
+        Status changes are sent immediately, everything else is rate-limited.
+        """
+        if self.registry.update(task_id, updates) is None:
+            return
+        with self._subscribers_lock:
+            if not self.subscribers.get(task_id):
+                return
+        self.progress_throttle.submit(task_id, force="status" in updates)
+
+    def _deliver_update(self, task_id: str) -> None:
+        loop = self._bound_loop()
+        if loop is None:
+            logger.warning(f"No event loop to notify subscribers of task {task_id} on")
+            return
+        if self._on_bound_loop(loop):
+            loop.create_task(self._notify_subscribers(task_id))
+        else:
+            asyncio.run_coroutine_threadsafe(self._notify_subscribers(task_id), loop)
+
     def update_task(self, task_id: str, **kwargs) -> None:
         """
         Update task information.
         """
-        if task_id in self.tasks:
-            self.tasks[task_id].update(kwargs)
-            # Notify subscribers about the update
-            self._run_coroutine(self._notify_subscribers(task_id))
+        self._apply(task_id, kwargs)
     
     def update_progress(self, task_id: str, progress: float, 
                         processed_items: Optional[int] = None,
@@ -140,110 +206,157 @@ class BackgroundTaskManager:
         """
         Update the progress of a task.
         """
-        if task_id in self.tasks:
-            updates = {"progress": progress}
+        updates = {"progress": progress}
+        
+        if processed_items is not None:
+            updates["processed_items"] = processed_items
+            
+        if total_items is not None:
+            updates["total_items"] = total_items
             
-            if processed_items is not None:
-                updates["processed_items"] = processed_items
-                
-            if total_items is not None:
-                updates["total_items"] = total_items
-                
-            if status_message is not None:
-                updates["status_message"] = status_message
-                
-            self.tasks[task_id].update(updates)
+        if status_message is not None:
+            updates["status_message"] = status_message
             
-            # Notify subscribers about the progress update
-            self._run_coroutine(self._notify_subscribers(task_id))
+        self._apply(task_id, updates)
     
     def mark_as_started(self, task_id: str) -> None:
         """
         Mark a task as started.
         """
-        if task_id in self.tasks:
-            self.tasks[task_id].update({
-                "status": "running",
-                "started_at": datetime.utcnow()
-            })
-            self._run_coroutine(self._notify_subscribers(task_id))
+        self._apply(task_id, {
+            "status": "running",
+            "started_at": datetime.utcnow()
+        })
     
     def mark_as_completed(self, task_id: str, result: Any = None) -> None:
         """
         Mark a task as completed.
         """
-        if task_id in self.tasks:
-            self.tasks[task_id].update({
-                "status": "completed",
-                "progress": 100,
-                "completed_at": datetime.utcnow(),
-                "result": result
-            })
-            self._run_coroutine(self._notify_subscribers(task_id))
+        self._apply(task_id, {
+            "status": "completed",
+            "progress": 100,
+            "completed_at": datetime.utcnow(),
+            "result": result
+        })
     
     def mark_as_failed(self, task_id: str, error: str) -> None:
         """
         Mark a task as failed.
         """
-        if task_id in self.tasks:
-            self.tasks[task_id].update({
-                "status": "failed",
-                "error": error,
-                "completed_at": datetime.utcnow()
-            })
-            self._run_coroutine(self._notify_subscribers(task_id))
+        self._apply(task_id, {
+            "status": "failed",
+            "error": error,
+            "completed_at": datetime.utcnow()
+        })
     
     def subscribe(self, task_id: str, callback: Callable[[Dict[str, Any]], Awaitable[None]]) -> bool:
         """
         Subscribe to task updates.
+        Tasks running on another worker are watched through the shared registry.
         """
-        if task_id in self.tasks:
-            self.tasks[task_id]["subscribers"].add(callback)
-            return True
-        return False
+        if self.registry.get(task_id) is None:
+            return False
+        if self._bound_loop() is None:
+            try:
+                self.bind_loop()
+            except RuntimeError:
+                pass
+        with self._subscribers_lock:
+            self.subscribers.setdefault(task_id, set()).add(callback)
+        if not self.registry.is_local(task_id):
+            self._watch_remote_task(task_id)
+        return True
     
     def unsubscribe(self, task_id: str, callback: Callable[[Dict[str, Any]], Awaitable[None]]) -> bool:
         """
         Unsubscribe from task updates.
         """
-        if task_id in self.tasks and callback in self.tasks[task_id]["subscribers"]:
-            self.tasks[task_id]["subscribers"].remove(callback)
-            return True
-        return False
+        with self._subscribers_lock:
+            callbacks = self.subscribers.get(task_id)
+            if not callbacks or callback not in callbacks:
+                return False
+            callbacks.remove(callback)
+            if not callbacks:
+                del self.subscribers[task_id]
+        return True
     
-    async def _notify_subscribers(self, task_id: str) -> None:
+    def _watch_remote_task(self, task_id: str) -> None:
+        """Start polling a task owned by another worker, once per task."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        with self._subscribers_lock:
+            if task_id in self._watchers:
+                return
+            self._watchers[task_id] = loop.create_task(self._poll_remote_task(task_id))
+
+    async def _poll_remote_task(self, task_id: str) -> None:
+        """
+        Forward changes of a remote task to local subscribers until it finishes
+        or nobody is listening.
+        """
+        last_state = None
+        try:
+            while True:
+                with self._subscribers_lock:
+                    if not self.subscribers.get(task_id):
+                        return
+                task_info = await asyncio.to_thread(self.registry.get, task_id)
+                if task_info is None:
+                    return
+                if task_info != last_state:
+                    last_state = task_info
+                    await self._notify_subscribers(task_id, task_info)
+                if task_info.get("status") in TERMINAL_STATUSES:
+                    return
+                await asyncio.sleep(settings.TASK_PUBLISH_INTERVAL_SECONDS)
+        finally:
+            with self._subscribers_lock:
+                self._watchers.pop(task_id, None)
+
+    async def _notify_subscribers(self, task_id: str, task_info: Optional[Dict[str, Any]] = None) -> None:
         """
         Notify all subscribers about a task update.
         """
-        if task_id in self.tasks:
-            task_info = self.tasks[task_id].copy()
-            # Remove the subscribers set from the info sent to subscribers
-            subscribers = task_info.pop("subscribers", set())
-            
-            # Serialize task info to ensure it's JSON-compatible
-            serialized_info = serialize_task_info(task_info)
+        with self._subscribers_lock:
+            subscribers = list(self.subscribers.get(task_id, ()))
+        if not subscribers:
+            return
+
+        if task_info is None:
+            task_info = self.registry.get(task_id)
+            if task_info is None:
+                return
             
-            for callback in subscribers:
-                try:
-                    await callback(serialized_info)
-                except Exception as e:
-                    logger.error(f"Error notifying subscriber for task {task_id}: {e}")
+        # Serialize task info to ensure it's JSON-compatible
+        serialized_info = serialize_task_info(task_info)
+        
+        for callback in subscribers:
+            try:
+                await callback(serialized_info)
+            except Exception as e:
+                logger.error(f"Error notifying subscriber for task {task_id}: {e}")
     
-    def clean_old_tasks(self, max_age_hours: int = 24) -> None:
+    def clean_old_tasks(self, max_age_hours: int = 24) -> List[str]:
         """
-        Remove old completed or failed tasks.
+        Remove old completed or failed tasks and return their IDs.
         """
-        now = datetime.utcnow()
-        to_remove = []
-        
-        for task_id, task in self.tasks.items():
-            if task["status"] in ["completed", "failed"]:
-                completed_at = task.get("completed_at")
-                if completed_at and (now - completed_at).total_seconds() > max_age_hours * 3600:
-                    to_remove.append(task_id)
-        
-        for task_id in to_remove:
-            del self.tasks[task_id]
+        removed = self.registry.remove_old(max_age_hours)
+        with self._subscribers_lock:
+            for task_id in removed:
+                self.subscribers.pop(task_id, None)
+        for task_id in removed:
+            self.progress_throttle.forget(task_id)
+        return removed
+
+    def task_started(self) -> None:
+        with self._running_lock:
+            self.running_tasks += 1
+
+    def task_finished(self) -> None:
+        with self._running_lock:
+            self.running_tasks -= 1
 
 # Use a lazy-loaded singleton pattern instead
 _task_manager_instance = None
@@ -276,7 +389,7 @@ async def run_background_task(task_id: str, func, *args, **kwargs):
         
         # Acquire semaphore to limit concurrent tasks
         async with task_manager.task_semaphore:
-            task_manager.running_tasks += 1
+            task_manager.task_started()
             task_manager.mark_as_started(task_id)
             
             try:
@@ -284,7 +397,7 @@ async def run_background_task(task_id: str, func, *args, **kwargs):
                 task_manager.mark_as_completed(task_id, result)
                 return result
             finally:
-                task_manager.running_tasks -= 1
+                task_manager.task_finished()
     except Exception as e:
         logger.exception(f"Background task {task_id} failed: {e}")
         task_manager.mark_as_failed(task_id, str(e))
@@ -0,0 +1,173 @@
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import CalculationLoanResult, CalculationResult, Loan
+
+# Rows inserted per statement when saving
+SAVE_BATCH_SIZE = 5000
+
+# Values a calculation's loans can be sorted by. Each has an index led by calculation_id.
+LOAN_RESULT_SORTS = {
+    "outstanding_loan_balance": CalculationLoanResult.outstanding_loan_balance,
+    "provision": CalculationLoanResult.provision,
+    "ead_value": CalculationLoanResult.ead_value,
+    "pd": CalculationLoanResult.pd,
+    "lgd": CalculationLoanResult.lgd,
+    "ecl": CalculationLoanResult.ecl,
+}
+
+# Sorts that are only filled in for ECL calculations, and NULL otherwise.
+# Their indexes only cover rows with calculation_type 'ecl'.
+ECL_ONLY_SORTS = {"ead_value", "pd", "lgd", "ecl"}
+
+LOAN_RESULT_COLUMNS = [
+    CalculationLoanResult.id,
+    CalculationLoanResult.loan_id,
+    CalculationLoanResult.loan_no,
+    CalculationLoanResult.employee_id,
+    CalculationLoanResult.branch,
+    CalculationLoanResult.stage,
+    CalculationLoanResult.outstanding_loan_balance,
+    CalculationLoanResult.ead_value,
+    CalculationLoanResult.pd,
+    CalculationLoanResult.lgd,
+    CalculationLoanResult.ecl,
+    CalculationLoanResult.provision,
+]
+
+
+def loan_result_row(
+    loan,
+    stage: str,
+    provision: Any,
+    ead_value: Any = None,
+    pd: Optional[float] = None,
+    lgd: Optional[float] = None,
+    ecl: Any = None,
+) -> Dict[str, Any]:
+    """A calculation_loan_results row for a loan, without its calculation_id."""
+    return {
+        "loan_id": loan.id,
+        "loan_no": loan.loan_no,
+        "employee_id": loan.employee_id,
+        "branch": loan.location_code,
+        "stage": stage,
+        "outstanding_loan_balance": Decimal(str(loan.outstanding_loan_balance or 0)),
+        "ead_value": ead_value,
+        "pd": float(pd) if pd is not None else None,
+        "lgd": float(lgd) if lgd is not None else None,
+        "ecl": ecl,
+        "provision": provision,
+    }
+
+
+def staged_loans(db: Session, portfolio_id: int, stage_column):
+    """
+    The portfolio's loans that staging put in a stage or category, with the
+    columns loan_result_row reads and stage_column as stage. Streamed in
+    batches of SAVE_BATCH_SIZE rather than loaded at once.
+    """
+    return (
+        db.query(
+            Loan.id,
+            Loan.loan_no,
+            Loan.employee_id,
+            Loan.location_code,
+            Loan.outstanding_loan_balance,
+            stage_column.label("stage"),
+        )
+        .filter(Loan.portfolio_id == portfolio_id, stage_column.isnot(None))
+        .yield_per(SAVE_BATCH_SIZE)
+    )
+
+
+def save_loan_results(db: Session, calculation: CalculationResult, rows: Iterable[Dict[str, Any]]) -> int:
+    """Insert the loan rows of a flushed calculation in batches. The caller commits."""
+    table = CalculationLoanResult.__table__
+    batch: List[Dict[str, Any]] = []
+    saved = 0
+    for row in rows:
+        batch.append({**row, "calculation_id": calculation.id, "calculation_type": calculation.calculation_type})
+        if len(batch) == SAVE_BATCH_SIZE:
+            db.execute(insert(table), batch)
+            saved += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+        saved += len(batch)
+    return saved
+
+
+def filter_loan_results(
+    query,
+    stages: Optional[List[str]] = None,
+    branches: Optional[List[str]] = None,
+    min_balance: Optional[Decimal] = None,
+    max_balance: Optional[Decimal] = None,
+):
+    """Apply the drill-down filters to a query over CalculationLoanResult."""
+    if stages:
+        query = query.filter(CalculationLoanResult.stage.in_(stages))
+    if branches:
+        query = query.filter(CalculationLoanResult.branch.in_(branches))
+    if min_balance is not None:
+        query = query.filter(CalculationLoanResult.outstanding_loan_balance >= min_balance)
+    if max_balance is not None:
+        query = query.filter(CalculationLoanResult.outstanding_loan_balance <= max_balance)
+    return query
+
+
+def page_loan_results(
+    db: Session,
+    calculation_id: int,
+    sort: str = "id",
+    descending: bool = False,
+    after: Optional[List[Any]] = None,
+    limit: int = 100,
+    **filters: Any,
+) -> List[Any]:
+    """
+    One page of a calculation's loans, ordered by sort then id and starting
+    after the (value, id) or (id,) key in after. Keyset pagination keeps
+    every page an index range scan, however deep it is.
+
+    A row comparison never matches a NULL, so loans with no value for an
+    ECL-only sort (a PD or LGD the calculation didn't model) are left out
+    of pages sorted by it rather than dropped partway through. Totals
+    still count them.
+    """
+    query = filter_loan_results(
+        db.query(*LOAN_RESULT_COLUMNS).filter(CalculationLoanResult.calculation_id == calculation_id),
+        **filters,
+    )
+    if sort in ECL_ONLY_SORTS:
+        # Matches the partial index, which only covers ECL rows
+        query = query.filter(
+            CalculationLoanResult.calculation_type == "ecl",
+            LOAN_RESULT_SORTS[sort].isnot(None),
+        )
+    keys = [CalculationLoanResult.id] if sort == "id" else [LOAN_RESULT_SORTS[sort], CalculationLoanResult.id]
+    if after:
+        key, values = tuple_(*keys), tuple_(*after)
+        query = query.filter(key < values if descending else key > values)
+    return query.order_by(*[column.desc() if descending else column.asc() for column in keys]).limit(limit).all()
+
+
+def loan_result_totals(db: Session, calculation_id: int, **filters: Any) -> Dict[str, Any]:
+    """Count, sums and averages over every loan matching the filters."""
+    totals = filter_loan_results(
+        db.query(
+            func.count(CalculationLoanResult.id).label("num_loans"),
+            func.coalesce(func.sum(CalculationLoanResult.outstanding_loan_balance), 0).label("outstanding_loan_balance"),
+            func.sum(CalculationLoanResult.ead_value).label("ead_value"),
+            func.sum(CalculationLoanResult.ecl).label("ecl"),
+            func.coalesce(func.sum(CalculationLoanResult.provision), 0).label("provision"),
+            func.avg(CalculationLoanResult.pd).label("average_pd"),
+            func.avg(CalculationLoanResult.lgd).label("average_lgd"),
+        ).filter(CalculationLoanResult.calculation_id == calculation_id),
+        **filters,
+    ).one()
+    return dict(totals._mapping)
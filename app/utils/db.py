@@ -1,6 +1,8 @@
 import re
 from urllib.parse import quote_plus
 
+from sqlalchemy.engine import make_url
+
 def convert_libpq_to_sqlalchemy(libpq_conn_string):
     """
     Convert a libpq connection string (dbname=... format) to a SQLAlchemy connection URL.
@@ -43,3 +45,26 @@ def convert_libpq_to_sqlalchemy(libpq_conn_string):
     sqlalchemy_url = f"postgresql://{params['user']}:{password}@{params['host']}:{params['port']}/{params['dbname']}?sslmode={ssl_mode}"
     
     return sqlalchemy_url
+
+
+def normalize_postgres_url(db_url):
+    """
+    Spell the scheme of a postgres:// URL (as Heroku-style providers hand
+    out) as postgresql://, the only form SQLAlchemy accepts.
+    """
+    if db_url and db_url.startswith("postgres://"):
+        return "postgresql://" + db_url[len("postgres://"):]
+    return db_url
+
+
+def to_asyncpg_url(db_url):
+    """
+    The same database URL for the asyncpg driver, whichever postgres scheme
+    or driver it names (postgres://, postgresql://, postgresql+psycopg2://).
+    asyncpg takes ssl= instead of libpq's sslmode=.
+    """
+    url = make_url(normalize_postgres_url(db_url)).set(drivername="postgresql+asyncpg")
+    if "sslmode" in url.query:
+        sslmode = url.query["sslmode"]
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    return url.render_as_string(hide_password=False)
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Dict, Any, List
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds in milliseconds; the last bucket is everything above
+LATENCY_BUCKETS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000]
+
+
+class LatencyHistogram:
+    """Count, total, max and bucketed durations, safe to update from any thread."""
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, duration_ms: float) -> None:
+        index = len(self.buckets_ms)
+        for i, bound in enumerate(self.buckets_ms):
+            if duration_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+            return {
+                "count": self.count,
+                "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = LatencyHistogram()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_wait.observe((time.perf_counter() - start) * 1000)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_wait = self.checkout_wait
+        return pool
+
+
+class PoolMetrics:
+    """Checkout wait and held-connection durations for one engine's pool."""
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.held = LatencyHistogram()
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            self.held.observe((time.perf_counter() - checked_out_at) * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        snapshot = {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checked_in": pool.checkedin(),
+            "held": self.held.snapshot(),
+        }
+        if isinstance(pool, InstrumentedQueuePool):
+            snapshot["checkout_wait"] = pool.checkout_wait.snapshot()
+        return snapshot
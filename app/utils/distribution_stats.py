@@ -0,0 +1,57 @@
+import numpy as np
+from typing import Dict, List, Any, Sequence
+
+
+def to_array(values: Sequence[Any]) -> np.ndarray:
+    """Convert a column of numbers (Decimal, int, float or None) to a float array, None as 0."""
+    return np.array([float(value) if value is not None else 0.0 for value in values], dtype=float)
+
+
+def summary_stats(values: np.ndarray) -> Dict[str, float]:
+    """
+    Mean, min, max and median of a column. The median is the upper middle
+    value for an even count, as the reports have always shown it.
+    Returns zeros for an empty column.
+    """
+    if values.size == 0:
+        return {"mean": 0.0, "min": 0.0, "max": 0.0, "median": 0.0}
+
+    return {
+        "mean": float(np.mean(values)),
+        "min": float(np.min(values)),
+        "max": float(np.max(values)),
+        "median": float(np.sort(values)[len(values) // 2]),
+    }
+
+
+def bucket_counts(
+    values: np.ndarray, edges: Sequence[float], labels: List[str], right: bool = True
+) -> Dict[str, int]:
+    """
+    Count values into len(edges) + 1 buckets.
+
+    Args:
+        values: Column to bucket
+        edges: Ascending upper bounds of every bucket except the last
+        labels: Bucket names, one more than edges
+        right: Upper bounds are inclusive (value <= edge) when True,
+            exclusive (value < edge) when False
+
+    Returns:
+        Dict of label to count, in label order
+    """
+    # np.histogram bins are half-open [a, b), so searchsorted is used to
+    # support the inclusive upper bounds most reports use
+    side = "left" if right else "right"
+    bucket_index = np.searchsorted(np.asarray(edges, dtype=float), values, side=side)
+    counts = np.bincount(bucket_index, minlength=len(labels))
+    return {label: int(count) for label, count in zip(labels, counts)}
+
+
+def top_n_indices(values: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n largest values, largest first, without sorting the whole column."""
+    if values.size <= n:
+        return np.argsort(-values, kind="stable")
+
+    top = np.argpartition(-values, n - 1)[:n]
+    return top[np.argsort(-values[top], kind="stable")]
@@ -1,11 +1,8 @@
-import numpy as np
-import pickle
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional, Tuple, List, Union, Dict, Any
 from dateutil.relativedelta import relativedelta
 from calendar import monthrange
-import pickle 
 import logging
 
 logger = logging.getLogger(__name__)
@@ -280,8 +277,8 @@ def calculate_probability_of_default(loan, db):
         
             # Load the pre-trained logistic regression model
             try:
-                with open("app/ml_models/logistic_model.pkl", "rb") as file:
-                    model = pickle.load(file)
+                from app.calculators.ecl import load_pd_model
+                model = load_pd_model()
             except FileNotFoundError:
                 logger.warning("ML model file not found, using default PD value")
                 return 5.0
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Dict, Iterable, Set
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import IngestionWatermark
+
+
+def mark_ingested(db: Session, portfolio_id: int, tables: Iterable[str]) -> None:
+    """Bump the versions of tables whose rows for the portfolio were replaced. The caller commits."""
+    now = datetime.utcnow()
+    rows = [
+        {"portfolio_id": portfolio_id, "table_name": table, "version": 1, "checked_version": 0, "ingested_at": now}
+        for table in tables
+    ]
+    if not rows:
+        return
+    watermarks = IngestionWatermark.__table__
+    stmt = insert(watermarks).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["portfolio_id", "table_name"],
+        set_={"version": watermarks.c.version + 1, "ingested_at": stmt.excluded.ingested_at},
+    )
+    db.execute(stmt)
+
+
+def watermark_versions(db: Session, portfolio_id: int) -> Dict[str, int]:
+    """Current version of each of the portfolio's tables."""
+    return dict(
+        db.query(IngestionWatermark.table_name, IngestionWatermark.version)
+        .filter(IngestionWatermark.portfolio_id == portfolio_id)
+        .all()
+    )
+
+
+def stale_tables(db: Session, portfolio_id: int, tables: Iterable[str]) -> Set[str]:
+    """
+    Tables changed since the quality checks last ran over them. Tables with
+    no watermark yet count as changed.
+    """
+    checked = dict(
+        db.query(
+            IngestionWatermark.table_name,
+            IngestionWatermark.version == IngestionWatermark.checked_version,
+        )
+        .filter(IngestionWatermark.portfolio_id == portfolio_id)
+        .all()
+    )
+    return {table for table in tables if not checked.get(table)}
+
+
+def mark_checked(db: Session, portfolio_id: int, versions: Dict[str, int]) -> None:
+    """
+    Record the table versions the quality checks ran against, as read before
+    they started, so a reload during the checks still leaves the table stale.
+    The caller commits.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"portfolio_id": portfolio_id, "table_name": table, "version": version, "checked_version": version, "checked_at": now}
+        for table, version in versions.items()
+    ]
+    if not rows:
+        return
+    stmt = insert(IngestionWatermark.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["portfolio_id", "table_name"],
+        set_={"checked_version": stmt.excluded.checked_version, "checked_at": stmt.excluded.checked_at},
+    )
+    db.execute(stmt)
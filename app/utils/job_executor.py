@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import Dict, Any, Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job type already has max_queued jobs waiting."""
+
+
+class JobQueue:
+    """Concurrency limit and queue bound for one job type."""
+
+    def __init__(self, job_type: str, max_concurrent: int, max_queued: int):
+        self.job_type = job_type
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.pending = deque()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": len(self.pending),
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Worker threads keep one event loop each for the lifetime of the pool
+_worker_state = threading.local()
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_worker_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _worker_state.loop = loop
+    return loop
+
+
+def _run_on_worker_loop(coro) -> Any:
+    loop = _worker_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # Let progress notifications scheduled by the job finish before the
+        # loop goes back to idle
+        pending = asyncio.all_tasks(loop)
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+
+class JobExecutor:
+    """
+    Runs background jobs off the API event loop.
+
+    Task pipelines (database reads/writes, progress reporting) run on a
+    thread pool whose threads each reuse a single event loop. CPU-bound
+    kernels are sent to a process pool with run_cpu, so NumPy/Polars work
+    does not hold the API's GIL. Each job type has its own concurrency
+    limit and queue bound.
+    """
+
+    def __init__(
+        self,
+        io_workers: int,
+        cpu_workers: int,
+        job_limits: Dict[str, Dict[str, int]],
+        default_max_concurrent: int = 2,
+        default_max_queued: int = 10,
+    ):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="job-io")
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self.default_max_concurrent = default_max_concurrent
+        self.default_max_queued = default_max_queued
+        self.queues: Dict[str, JobQueue] = {
+            job_type: JobQueue(job_type, limits["max_concurrent"], limits["max_queued"])
+            for job_type, limits in job_limits.items()
+        }
+        self._lock = threading.Lock()
+        self._io_busy = 0
+        self._cpu_busy = 0
+
+    @property
+    def cpu_pool(self) -> ProcessPoolExecutor:
+        # Started on first use so API workers that never run a calculation
+        # don't start a pool. Workers don't fork the API process: a fork
+        # copies its threads' held locks, its event loop and its pooled
+        # database connections, none of which are safe to use in the child.
+        with self._lock:
+            if self._cpu_pool is None:
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._cpu_pool = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers, mp_context=multiprocessing.get_context(start_method)
+                )
+            return self._cpu_pool
+
+    def _queue(self, job_type: str) -> JobQueue:
+        with self._lock:
+            queue = self.queues.get(job_type)
+            if queue is None:
+                queue = self.queues[job_type] = JobQueue(
+                    job_type, self.default_max_concurrent, self.default_max_queued
+                )
+            return queue
+
+    def submit(self, job_type: str, func: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a job on the I/O pool. func may be a coroutine function, in
+        which case it runs on the worker thread's event loop.
+
+        Raises JobQueueFull if the job type's queue is at its limit.
+        """
+        queue = self._queue(job_type)
+        future = Future()
+
+        def run():
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    result = _run_on_worker_loop(func(*args, **kwargs))
+                else:
+                    result = func(*args, **kwargs)
+            except BaseException as e:
+                with self._lock:
+                    queue.failed += 1
+                future.set_exception(e)
+            else:
+                with self._lock:
+                    queue.completed += 1
+                future.set_result(result)
+            finally:
+                self._finish(queue)
+
+        with self._lock:
+            if queue.running < queue.max_concurrent:
+                self._start(queue, run)
+            elif len(queue.pending) < queue.max_queued:
+                # Queued jobs wait here rather than holding a pool thread
+                queue.pending.append(run)
+            else:
+                raise JobQueueFull(f"Too many queued {job_type} jobs ({len(queue.pending)})")
+        return future
+
+    def _start(self, queue: JobQueue, run: Callable) -> None:
+        # Called with self._lock held
+        queue.running += 1
+        self._io_busy += 1
+        self.io_pool.submit(run)
+
+    def _finish(self, queue: JobQueue) -> None:
+        with self._lock:
+            queue.running -= 1
+            self._io_busy -= 1
+            if queue.pending:
+                self._start(queue, queue.pending.popleft())
+
+    async def run_cpu(self, func: Callable, *args) -> Any:
+        """
+        Run a picklable CPU-bound function in the process pool and await it.
+        Arguments and result are pickled, so pass plain data, not ORM objects.
+        """
+        with self._lock:
+            self._cpu_busy += 1
+        try:
+            future = self.cpu_pool.submit(func, *args)
+            return await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self._cpu_busy -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "io_pool": {
+                    "workers": self.io_workers,
+                    "busy": min(self._io_busy, self.io_workers),
+                    "waiting_for_thread": max(0, self._io_busy - self.io_workers),
+                    "utilisation": round(min(self._io_busy, self.io_workers) / self.io_workers, 2),
+                },
+                "cpu_pool": {
+                    "workers": self.cpu_workers,
+                    "busy": self._cpu_busy,
+                    "utilisation": round(min(self._cpu_busy, self.cpu_workers) / self.cpu_workers, 2),
+                    "started": self._cpu_pool is not None,
+                },
+                "queues": {
+                    job_type: queue.metrics() for job_type, queue in self.queues.items()
+                },
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.io_pool.shutdown(wait=wait)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=wait)
+
+
+_executor_instance = None
+
+
+def get_job_executor() -> JobExecutor:
+    """Get or create the job executor for this process."""
+    global _executor_instance
+    if _executor_instance is None:
+        _executor_instance = JobExecutor(
+            io_workers=settings.JOB_IO_WORKERS,
+            cpu_workers=settings.JOB_CPU_WORKERS,
+            job_limits={
+                "portfolio_ingestion": {
+                    "max_concurrent": settings.JOB_INGESTION_MAX_CONCURRENT,
+                    "max_queued": settings.JOB_MAX_QUEUED,
+                },
+                "ecl_calculation": {
+                    "max_concurrent": settings.JOB_CALCULATION_MAX_CONCURRENT,
+                    "max_queued": settings.JOB_MAX_QUEUED,
+                },
+                "local_impairment_calculation": {
+                    "max_concurrent": settings.JOB_CALCULATION_MAX_CONCURRENT,
+                    "max_queued": settings.JOB_MAX_QUEUED,
+                },
+            },
+        )
+    return _executor_instance
+
+
+def submit_background_task(job_type: str, task_id: str, func: Callable, **kwargs) -> None:
+    """
+    Run a tracked background task (see run_background_task) on the job
+    executor with its own database session.
+
+    Raises JobQueueFull, after marking the task as failed, when the job
+    type's queue is full.
+    """
+    from app.database import BackgroundSessionLocal
+    from app.utils.background_tasks import get_task_manager, run_background_task
+
+    async def run():
+        db = BackgroundSessionLocal()
+        try:
+            await run_background_task(task_id, func, db=db, **kwargs)
+        except Exception as e:
+            # run_background_task has already marked the task as failed
+            logger.error(f"Background task {task_id} ({job_type}) failed: {e}")
+        finally:
+            db.close()
+
+    try:
+        get_job_executor().submit(job_type, run)
+    except JobQueueFull as e:
+        get_task_manager().mark_as_failed(task_id, str(e))
+        raise
+
+
+def shutdown_job_executor() -> None:
+    global _executor_instance
+    if _executor_instance is not None:
+        _executor_instance.shutdown(wait=False)
+        _executor_instance = None
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import background_engine
+from app.models import StagingResult, CalculationResult
+from app.utils.background_tasks import get_task_manager
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key so only one worker process runs maintenance at a time
+MAINTENANCE_LOCK_ID = 734021
+
+# Report of the most recent run in this process
+last_maintenance_report: Optional[Dict[str, Any]] = None
+
+
+def prune_results(db: Session, model, type_column, keep_last: int, batch_size: int) -> Dict[str, int]:
+    """
+    Delete all but the newest keep_last rows per (portfolio, type).
+
+    Each batch deletes up to batch_size expired rows picked by a subquery,
+    in its own transaction, so no single statement holds locks for long,
+    autovacuum can reclaim space as it goes, and the expired ids are never
+    loaded into memory.
+
+    Returns the number of rows deleted and the size of their JSON columns.
+    """
+    ranked = (
+        select(
+            model.id.label("id"),
+            func.row_number()
+            .over(
+                partition_by=(model.portfolio_id, type_column),
+                order_by=(model.created_at.desc(), model.id.desc()),
+            )
+            .label("rank"),
+        )
+        .subquery()
+    )
+    expired_batch = select(ranked.c.id).where(ranked.c.rank > keep_last).limit(batch_size)
+    statement = (
+        delete(model)
+        .where(model.id.in_(expired_batch))
+        .returning(func.pg_column_size(model.config) + func.pg_column_size(model.result_summary))
+        .execution_options(synchronize_session=False)
+    )
+
+    rows = 0
+    reclaimed_bytes = 0
+    while True:
+        try:
+            sizes = db.execute(statement).scalars().all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error pruning {model.__tablename__}: {e}")
+            break
+        rows += len(sizes)
+        reclaimed_bytes += sum(size or 0 for size in sizes)
+        if len(sizes) < batch_size:
+            break
+
+    return {"rows": rows, "bytes": reclaimed_bytes}
+
+
+def run_maintenance(db: Session) -> Dict[str, Any]:
+    """
+    Evict finished background tasks and prune historical staging and
+    calculation results. Returns what was reclaimed.
+    """
+    global last_maintenance_report
+
+    started = datetime.utcnow()
+    report = {"started_at": started.isoformat(), "skipped": False}
+
+    report["tasks_evicted"] = len(get_task_manager().clean_old_tasks(settings.TASK_RETENTION_HOURS))
+
+    # Result pruning is PostgreSQL-only (advisory locks, pg_column_size)
+    if db.get_bind().dialect.name != "postgresql":
+        report["skipped"] = True
+        last_maintenance_report = report
+        return report
+
+    # Results are shared, so only one worker prunes at a time
+    locked = db.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}).scalar()
+    if not locked:
+        report["skipped"] = True
+        last_maintenance_report = report
+        return report
+
+    try:
+        report["staging_results"] = prune_results(
+            db,
+            StagingResult,
+            StagingResult.staging_type,
+            settings.RESULT_RETENTION_KEEP_LAST,
+            settings.MAINTENANCE_BATCH_SIZE,
+        )
+        report["calculation_results"] = prune_results(
+            db,
+            CalculationResult,
+            CalculationResult.calculation_type,
+            settings.RESULT_RETENTION_KEEP_LAST,
+            settings.MAINTENANCE_BATCH_SIZE,
+        )
+    finally:
+        db.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+        db.commit()
+
+    report["rows_deleted"] = report["staging_results"]["rows"] + report["calculation_results"]["rows"]
+    report["bytes_reclaimed"] = report["staging_results"]["bytes"] + report["calculation_results"]["bytes"]
+    report["seconds"] = round((datetime.utcnow() - started).total_seconds(), 3)
+    last_maintenance_report = report
+
+    logger.info(
+        f"Maintenance: evicted {report['tasks_evicted']} tasks, deleted {report['rows_deleted']} "
+        f"result rows ({report['bytes_reclaimed']} bytes) in {report['seconds']}s"
+    )
+    return report
+
+
+def run_maintenance_with_session() -> Dict[str, Any]:
+    # Pin the session to one connection: the advisory lock belongs to the
+    # connection and must be released on the same one
+    with background_engine.connect() as connection:
+        db = Session(bind=connection)
+        try:
+            return run_maintenance(db)
+        finally:
+            db.close()
+
+
+async def maintenance_loop() -> None:
+    """Run maintenance every MAINTENANCE_INTERVAL_MINUTES until cancelled."""
+    interval = settings.MAINTENANCE_INTERVAL_MINUTES * 60
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run_maintenance_with_session)
+        except Exception as e:
+            logger.error(f"Maintenance run failed: {e}")
+
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+def start_maintenance_scheduler() -> None:
+    global _maintenance_task
+    if settings.MAINTENANCE_INTERVAL_MINUTES <= 0 or _maintenance_task is not None:
+        return
+    # Pruning relies on advisory locks and pg_column_size
+    if background_engine.dialect.name != "postgresql":
+        logger.info(f"Maintenance scheduler not started: needs PostgreSQL, not {background_engine.dialect.name}")
+        return
+    _maintenance_task = asyncio.get_running_loop().create_task(maintenance_loop())
+
+
+def stop_maintenance_scheduler() -> None:
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        _maintenance_task = None
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+# Response header carrying the cursor for the next page of a keyset-paginated list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Response header carrying the total row count of an offset-paginated list
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque cursor for the sort key of the last row on a page."""
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {"dt": obj.isoformat()}
+        if isinstance(obj, Decimal):
+            return {"dec": str(obj)}
+        raise TypeError(f"Cannot encode {type(obj).__name__} in a cursor")
+
+    return base64.urlsafe_b64encode(json.dumps(values, default=default).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Sort key values from encode_cursor. Raises ValueError if the cursor is
+    malformed or doesn't hold size values.
+    """
+    def object_hook(obj):
+        if set(obj) == {"dt"}:
+            return datetime.fromisoformat(obj["dt"])
+        if set(obj) == {"dec"}:
+            return Decimal(obj["dec"])
+        return obj
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()), object_hook=object_hook)
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def next_cursor(rows: List[Any], limit: Optional[int], *key_attributes: str) -> Optional[str]:
+    """Cursor after the last row, or None if this was the last page."""
+    if not limit or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor([getattr(last, attribute) for attribute in key_attributes])
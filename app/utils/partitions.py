@@ -0,0 +1,80 @@
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.utils.ingestion_watermarks import mark_ingested
+
+logger = logging.getLogger(__name__)
+
+# Tables that can be LIST-partitioned by portfolio_id (see partition_tables.py)
+PARTITIONED_TABLES = ("loans", "clients", "guarantees")
+
+# Columns referencing clients.id from tables without a portfolio_id
+CLIENT_REFERENCES = (("securities", "client_id"), ("other_loans", "client_id"))
+
+# Whether each table is partitioned in this database, looked up once per process
+_partitioned: Dict[str, bool] = {}
+
+
+def partition_name(table: str, portfolio_id: int) -> str:
+    return f"{table}_p{int(portfolio_id)}"
+
+
+def is_partitioned(db: Session, table: str) -> bool:
+    if table not in _partitioned:
+        if db.get_bind().dialect.name != "postgresql":
+            _partitioned[table] = False
+            return False
+        relkind = db.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": table},
+        ).scalar()
+        _partitioned[table] = relkind == "p"
+    return _partitioned[table]
+
+
+def ensure_portfolio_partitions(db: Session, portfolio_id: int) -> None:
+    """Create the portfolio's partition of each partitioned table if it doesn't exist yet."""
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(db, table):
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table, portfolio_id)} "
+                f"PARTITION OF {table} FOR VALUES IN ({int(portfolio_id)})"
+            ))
+
+
+def drop_portfolio_partitions(db: Session, portfolio_id: int) -> None:
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(db, table):
+            db.execute(text(f"DROP TABLE IF EXISTS {partition_name(table, portfolio_id)}"))
+
+
+def clear_portfolio_rows(db: Session, portfolio_id: int, tables: Iterable[str] = PARTITIONED_TABLES) -> Dict[str, int]:
+    """
+    Remove a portfolio's rows from the given tables before a reload and
+    return how many rows each held.
+
+    Partitioned tables have their partition truncated, which leaves no dead
+    tuples behind. TRUNCATE takes an ACCESS EXCLUSIVE lock on the partition
+    until the caller commits, blocking reads of that portfolio (not of the
+    others) for the rest of the transaction; reloads that must keep serving
+    reads go through PortfolioReload, which swaps with DETACH/ATTACH
+    instead. Other tables fall back to DELETE. The tables' ingestion watermarks are bumped in the
+    same transaction. The caller commits.
+    """
+    ensure_portfolio_partitions(db, portfolio_id)
+    mark_ingested(db, portfolio_id, tables)
+    counts = {}
+    for table in tables:
+        if is_partitioned(db, table):
+            partition = partition_name(table, portfolio_id)
+            counts[table] = db.execute(text(f"SELECT count(*) FROM {partition}")).scalar()
+            db.execute(text(f"TRUNCATE {partition}"))
+        else:
+            counts[table] = db.execute(
+                text(f"DELETE FROM {table} WHERE portfolio_id = :portfolio_id"),
+                {"portfolio_id": portfolio_id},
+            ).rowcount
+    return counts
@@ -0,0 +1,185 @@
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import StagingResult, CalculationResult
+from app.utils.ingestion_watermarks import mark_ingested
+from app.utils.partitions import (
+    CLIENT_REFERENCES,
+    ensure_portfolio_partitions,
+    is_partitioned,
+    partition_name,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tables whose loaders can write to a shadow table. Guarantees aren't among
+# them: their file is loaded straight into the guarantees table, so a shadow
+# would always be empty and the swap would wipe the portfolio's guarantees.
+# Securities and other loans have no portfolio_id to swap on; they follow
+# their clients instead (see swap).
+RELOADED_TABLES = ("loans", "clients")
+
+
+class ReloadValidationError(Exception):
+    """Raised when a shadow table doesn't hold the rows the load reported."""
+
+
+class PortfolioReload:
+    """
+    Replaces a portfolio's loans and clients without readers ever seeing it
+    empty or half loaded.
+
+    New rows are loaded into shadow tables (<table>_p<portfolio_id>_shadow)
+    and committed there, where readers don't look. swap() validates them and
+    replaces the portfolio's rows in one short transaction: partitioned
+    tables swap the partition with DETACH/ATTACH, other tables delete and
+    insert the rows. Until then the old rows keep serving reads, and if the
+    load fails discard() drops the shadows and leaves the old data as it was.
+    """
+
+    def __init__(self, db: Session, portfolio_id: int, tables: Iterable[str] = RELOADED_TABLES):
+        self.db = db
+        self.portfolio_id = int(portfolio_id)
+        self.tables = list(tables)
+
+    def shadow(self, table: str) -> str:
+        return f"{partition_name(table, self.portfolio_id)}_shadow"
+
+    def prepare(self) -> None:
+        """Create empty shadow tables, replacing any left by an earlier failed load."""
+        ensure_portfolio_partitions(self.db, self.portfolio_id)
+        for table in self.tables:
+            shadow = self.shadow(table)
+            self.db.execute(text(f"DROP TABLE IF EXISTS {shadow}"))
+            if is_partitioned(self.db, table):
+                # Matching indexes and a CHECK on the partition bound let
+                # ATTACH skip building indexes and scanning the rows
+                self.db.execute(text(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS INCLUDING INDEXES)"))
+                self.db.execute(text(
+                    f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_portfolio_id_check "
+                    f"CHECK (portfolio_id IS NOT NULL AND portfolio_id = {self.portfolio_id})"
+                ))
+            else:
+                self.db.execute(text(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS)"))
+        self.db.commit()
+
+    def validate(self, expected: Dict[str, int]) -> None:
+        """Check each shadow table holds exactly the expected number of this portfolio's rows."""
+        for table, count in expected.items():
+            loaded, stray = self.db.execute(
+                text(
+                    f"SELECT count(*), count(*) FILTER (WHERE portfolio_id IS DISTINCT FROM :portfolio_id) "
+                    f"FROM {self.shadow(table)}"
+                ),
+                {"portfolio_id": self.portfolio_id},
+            ).one()
+            if loaded != count:
+                raise ReloadValidationError(f"Expected {count} {table} rows but loaded {loaded}")
+            if stray:
+                raise ReloadValidationError(f"{stray} loaded {table} rows belong to another portfolio")
+
+    def swap(self, expected: Dict[str, int]) -> Dict[str, int]:
+        """
+        Validate the shadow tables and swap them in. Staging results and
+        calculation results were derived from the old rows, so they are
+        removed in the same transaction. Quality issues are kept for the
+        recheck that follows the load, which matches them to the new rows.
+
+        Reloaded clients get new ids, so securities and other loans are
+        moved to the new client with the same employee_id, and removed
+        when the reload no longer has that client.
+
+        Returns the number of old rows replaced per table.
+        """
+        self.validate(expected)
+
+        # Validate the foreign key now, outside the swap, so ATTACH can reuse it
+        for table in self.tables:
+            if is_partitioned(self.db, table):
+                self.db.execute(text(
+                    f"ALTER TABLE {self.shadow(table)} ADD FOREIGN KEY (portfolio_id) REFERENCES portfolios (id)"
+                ))
+        self.db.commit()
+
+        replaced = {}
+        try:
+            for model in (StagingResult, CalculationResult):
+                self.db.query(model).filter(model.portfolio_id == self.portfolio_id).delete(synchronize_session=False)
+
+            for table in self.tables:
+                shadow = self.shadow(table)
+                if is_partitioned(self.db, table):
+                    if table == "clients":
+                        self._move_client_references(shadow)
+                    partition = partition_name(table, self.portfolio_id)
+                    replaced[table] = self.db.execute(text(f"SELECT count(*) FROM {partition}")).scalar()
+                    self.db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+                    self.db.execute(text(f"DROP TABLE {partition}"))
+                    self.db.execute(text(f"ALTER TABLE {shadow} RENAME TO {partition}"))
+                    self.db.execute(text(
+                        f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES IN ({self.portfolio_id})"
+                    ))
+                else:
+                    # New rows go in first, so the foreign keys from moved
+                    # client references hold when the old rows are deleted
+                    self.db.execute(text(f"INSERT INTO {table} SELECT * FROM {shadow}"))
+                    if table == "clients":
+                        self._move_client_references(shadow)
+                    replaced[table] = self.db.execute(
+                        text(
+                            f"DELETE FROM {table} t WHERE t.portfolio_id = :portfolio_id "
+                            f"AND NOT EXISTS (SELECT 1 FROM {shadow} s WHERE s.id = t.id)"
+                        ),
+                        {"portfolio_id": self.portfolio_id},
+                    ).rowcount
+                    self.db.execute(text(f"DROP TABLE {shadow}"))
+            mark_ingested(self.db, self.portfolio_id, self.tables)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        logger.info(f"Swapped in reloaded data for portfolio {self.portfolio_id}: replaced {replaced}")
+        return replaced
+
+    def _move_client_references(self, shadow: str) -> None:
+        """Point securities and other loans of the old clients at the reloaded ones."""
+        params = {"portfolio_id": self.portfolio_id}
+        # Old clients of the portfolio; the reloaded ones may already be in clients
+        old_clients = (
+            f"SELECT c.id FROM clients c WHERE c.portfolio_id = :portfolio_id "
+            f"AND NOT EXISTS (SELECT 1 FROM {shadow} s WHERE s.id = c.id)"
+        )
+        for referencing, column in CLIENT_REFERENCES:
+            moved = self.db.execute(
+                text(
+                    f"UPDATE {referencing} SET {column} = moved.new_id FROM ("
+                    f"SELECT old.id AS old_id, min(new.id) AS new_id "
+                    f"FROM clients old JOIN {shadow} new ON new.employee_id = old.employee_id "
+                    f"WHERE old.id IN ({old_clients}) GROUP BY old.id"
+                    f") moved WHERE {referencing}.{column} = moved.old_id"
+                ),
+                params,
+            ).rowcount
+            removed = self.db.execute(
+                text(f"DELETE FROM {referencing} WHERE {column} IN ({old_clients})"), params
+            ).rowcount
+            if moved or removed:
+                logger.info(
+                    f"Portfolio {self.portfolio_id} reload: moved {moved} {referencing} rows "
+                    f"to reloaded clients, removed {removed} whose client is gone"
+                )
+
+    def discard(self) -> None:
+        """Drop the shadow tables, leaving the portfolio's current rows untouched."""
+        try:
+            self.db.rollback()
+            for table in self.tables:
+                self.db.execute(text(f"DROP TABLE IF EXISTS {self.shadow(table)}"))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error dropping shadow tables for portfolio {self.portfolio_id}: {str(e)}")
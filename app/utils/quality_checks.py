@@ -1,8 +1,11 @@
-from collections import defaultdict
-from typing import List, Dict, Any
+import logging
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 from app.models import Client, Loan, QualityIssue, Portfolio
-import time
+from app.utils.ingestion_watermarks import mark_checked, stale_tables, watermark_versions
+
+logger = logging.getLogger(__name__)
 
 
 def find_duplicate_customer_ids(db: Session, portfolio_id: int) -> List[Dict]:
@@ -238,6 +241,287 @@ def find_missing_dob(db: Session, portfolio_id: int) -> List[Dict]:
     return missing_dob_clients
 
 
+def duplicate_customer_id_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per group of clients sharing an employee ID."""
+    return [
+        {
+            "issue_type": "duplicate_customer_id",
+            "severity": "high",
+            "description": f"Duplicate employee ID: {group[0]['employee_id']} (found in {len(group)} clients)",
+            "affected_records": [
+                {
+                    "entity_type": "client",
+                    "entity_id": client_info["id"],
+                    "employee_id": client_info["employee_id"],
+                    "name": client_info.get("name", "Unknown"),
+                }
+                for client_info in group
+            ],
+        }
+        for group in find_duplicate_customer_ids(db, portfolio_id)
+    ]
+
+
+def duplicate_address_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per group of clients sharing an address."""
+    return [
+        {
+            "issue_type": "duplicate_address",
+            "severity": "medium",
+            "description": f"Duplicate address: {group[0].get('address', 'Unknown')} (found in {len(group)} clients)",
+            "affected_records": [
+                {
+                    "entity_type": "client",
+                    "entity_id": client_info["id"],
+                    "employee_id": client_info.get("employee_id", "Unknown"),
+                    "name": client_info.get("name", "Unknown"),
+                    "address": client_info.get("address", "Unknown"),
+                }
+                for client_info in group
+            ],
+        }
+        for group in find_duplicate_addresses(db, portfolio_id)
+    ]
+
+
+def duplicate_dob_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per group of clients sharing a date of birth."""
+    issues = []
+    for group in find_duplicate_dobs(db, portfolio_id):
+        dob_value = group[0].get("date_of_birth", "Unknown")
+        issues.append({
+            "issue_type": "duplicate_dob",
+            "severity": "medium",
+            "description": f"Duplicate date of birth: {dob_value} (found in {len(group)} clients)",
+            "affected_records": [
+                {
+                    "entity_type": "client",
+                    "entity_id": client_info["id"],
+                    "employee_id": client_info.get("employee_id", "Unknown"),
+                    "name": client_info.get("name", "Unknown"),
+                    "date_of_birth": dob_value,
+                }
+                for client_info in group
+            ],
+        })
+    return issues
+
+
+def duplicate_loan_id_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per group of loans sharing a loan number."""
+    return [
+        {
+            "issue_type": "duplicate_loan_id",
+            "severity": "high",
+            "description": f"Duplicate loan ID: {group[0]['loan_no']} (found in {len(group)} loans)",
+            "affected_records": [
+                {
+                    "entity_type": "loan",
+                    "entity_id": loan_info["id"],
+                    "loan_no": loan_info["loan_no"],
+                    "employee_id": loan_info.get("employee_id", "Unknown"),
+                    "loan_amount": loan_info.get("loan_amount", 0),
+                }
+                for loan_info in group
+            ],
+        }
+        for group in find_duplicate_loan_ids(db, portfolio_id)
+    ]
+
+
+def duplicate_phone_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per group of clients sharing a phone number."""
+    return [
+        {
+            "issue_type": "duplicate_phone",
+            "severity": "medium",
+            "description": f"Duplicate phone number: {group[0].get('phone_number', 'Unknown')} (found in {len(group)} clients)",
+            "affected_records": [
+                {
+                    "entity_type": "client",
+                    "entity_id": client_info["id"],
+                    "employee_id": client_info.get("employee_id", "Unknown"),
+                    "name": client_info.get("name", "Unknown"),
+                    "phone_number": client_info.get("phone_number", "Unknown"),
+                }
+                for client_info in group
+            ],
+        }
+        for group in find_duplicate_phone_numbers(db, portfolio_id)
+    ]
+
+
+def client_without_matching_loan_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per client with no loan under its employee ID."""
+    return [
+        {
+            "issue_type": "client_without_matching_loan",
+            "severity": "high",
+            "description": f"Client has no matching loan with employee ID: {client_info['employee_id']}",
+            "affected_records": [{
+                "entity_type": "client",
+                "entity_id": client_info["id"],
+                "employee_id": client_info["employee_id"],
+                "name": client_info.get("name", "Unknown"),
+                "phone_number": client_info.get("phone_number", "Unknown"),
+            }],
+        }
+        for client_info in find_clients_without_matching_loans(db, portfolio_id)
+    ]
+
+
+def loan_without_matching_client_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per loan with no client under its employee ID."""
+    return [
+        {
+            "issue_type": "loan_without_matching_client",
+            "severity": "high",
+            "description": f"Loan has no matching client with employee ID: {loan_info['employee_id']}",
+            "affected_records": [{
+                "entity_type": "loan",
+                "entity_id": loan_info["id"],
+                "loan_no": loan_info["loan_no"],
+                "employee_id": loan_info["employee_id"],
+                "loan_amount": loan_info.get("loan_amount", 0),
+            }],
+        }
+        for loan_info in find_loans_without_matching_clients(db, portfolio_id)
+    ]
+
+
+def missing_dob_issues(db: Session, portfolio_id: int) -> List[Dict]:
+    """One issue per client with no date of birth."""
+    return [
+        {
+            "issue_type": "missing_dob",
+            "severity": "medium",
+            "description": "Client has no date of birth",
+            "affected_records": [{
+                "entity_type": "client",
+                "entity_id": client_info["id"],
+                "employee_id": client_info["employee_id"],
+                "name": client_info["name"],
+                "phone_number": client_info.get("phone_number", "Unknown"),
+            }],
+        }
+        for client_info in find_missing_dob(db, portfolio_id)
+    ]
+
+
+# Quality checks in the order they run: the issue type each creates, its key
+# in the issue counts, the tables it reads, its progress message and the
+# function building its issues
+QUALITY_CHECKS = [
+    {
+        "issue_type": "duplicate_customer_id",
+        "count_key": "duplicate_customer_ids",
+        "tables": {"clients"},
+        "message": "Checking for duplicate customer IDs",
+        "build": duplicate_customer_id_issues,
+    },
+    {
+        "issue_type": "duplicate_address",
+        "count_key": "duplicate_addresses",
+        "tables": {"clients"},
+        "message": "Checking for duplicate addresses",
+        "build": duplicate_address_issues,
+    },
+    {
+        "issue_type": "duplicate_dob",
+        "count_key": "duplicate_dob",
+        "tables": {"clients"},
+        "message": "Checking for duplicate DOBs",
+        "build": duplicate_dob_issues,
+    },
+    {
+        "issue_type": "duplicate_loan_id",
+        "count_key": "duplicate_loan_ids",
+        "tables": {"loans"},
+        "message": "Checking for duplicate loan IDs",
+        "build": duplicate_loan_id_issues,
+    },
+    {
+        "issue_type": "duplicate_phone",
+        "count_key": "duplicate_phones",
+        "tables": {"clients"},
+        "message": "Checking for duplicate phone numbers",
+        "build": duplicate_phone_issues,
+    },
+    {
+        "issue_type": "client_without_matching_loan",
+        "count_key": "clients_without_matching_loans",
+        "tables": {"clients", "loans"},
+        "message": "Checking for clients without matching loans",
+        "build": client_without_matching_loan_issues,
+    },
+    {
+        "issue_type": "loan_without_matching_client",
+        "count_key": "loans_without_matching_clients",
+        "tables": {"clients", "loans"},
+        "message": "Checking for loans without matching clients",
+        "build": loan_without_matching_client_issues,
+    },
+    {
+        "issue_type": "missing_dob",
+        "count_key": "missing_dob",
+        "tables": {"clients"},
+        "message": "Checking for missing data",
+        "build": missing_dob_issues,
+    },
+]
+
+# Tables the quality checks read, whose ingestion watermarks they track
+QUALITY_CHECK_TABLES = ("clients", "loans")
+
+# Statuses that don't hold up a portfolio's approval. Closed issues are ones
+# a recheck found the data no longer has.
+RESOLVED_ISSUE_STATUSES = ("approved", "closed")
+
+# Issue types written by older versions, and the check that now covers them
+LEGACY_ISSUE_TYPES = {
+    "unmatched_employee_id": "client_without_matching_loan",
+    "loan_customer_mismatch": "loan_without_matching_client",
+}
+
+
+# Record fields that identify a client or loan across reloads. A reload
+# inserts every row again under a new id, so entity_id can't be used.
+BUSINESS_KEY_FIELDS = {
+    "client": ("employee_id",),
+    "loan": ("loan_no", "employee_id"),
+}
+
+
+def record_key(record: Dict[str, Any]) -> Tuple:
+    """
+    Identity of an affected record across reloads: its entity type and
+    business keys. Records with none of their keys filled in fall back to
+    entity_id.
+    """
+    entity_type = record.get("entity_type")
+    values = tuple(record.get(field) for field in BUSINESS_KEY_FIELDS.get(entity_type, ()))
+    if not any(value not in (None, "", "Unknown") for value in values):
+        return entity_type, "id", record.get("entity_id")
+    return (entity_type,) + values
+
+
+def issue_key(issue_type: str, affected_records: Any) -> Tuple[str, frozenset]:
+    """
+    Identity of an issue across runs: its check and the records it affects,
+    with how many records share each key. Every client in a duplicate
+    employee ID group has the same key, so a group that grows or shrinks
+    counts as a different issue.
+    """
+    if isinstance(affected_records, dict):
+        affected_records = [affected_records]
+    entities = frozenset(Counter(
+        record_key(record)
+        for record in affected_records or []
+        if isinstance(record, dict)
+    ).items())
+    return LEGACY_ISSUE_TYPES.get(issue_type, issue_type), entities
+
+
 def create_quality_issues_if_needed(db: Session, portfolio_id: int) -> Dict[str, int]:
     """
     Retrieve existing quality issues from the database without creating new ones.
@@ -268,10 +552,11 @@ def create_quality_issues_if_needed(db: Session, portfolio_id: int) -> Dict[str,
         "missing_loan_amounts": 0,
     }
 
-    # Get existing quality issues for this portfolio
+    # Get existing quality issues for this portfolio, leaving out issues a
+    # recheck closed because the data no longer has them
     existing_issues = (
         db.query(QualityIssue)
-        .filter(QualityIssue.portfolio_id == portfolio_id)
+        .filter(QualityIssue.portfolio_id == portfolio_id, QualityIssue.status != "closed")
         .all()
     )
     
@@ -349,9 +634,7 @@ def create_and_save_quality_issues(db: Session, portfolio_id: int, task_id: str
         Dictionary with counts of issues by type
     """
     from app.utils.background_tasks import get_task_manager
-    import logging
     
-    logger = logging.getLogger(__name__)
     logger.info(f"Starting quality issue creation for portfolio {portfolio_id}")
     
     # Get the portfolio
@@ -377,13 +660,15 @@ def create_and_save_quality_issues(db: Session, portfolio_id: int, task_id: str
         "missing_loan_amounts": 0,
     }
     
+    # Versions of the data being checked, recorded once the checks finish
+    versions = watermark_versions(db, portfolio_id)
+    
     # First, clear existing quality issues for this portfolio
     if task_id:
         get_task_manager().update_task(
             task_id,
             status_message="Clearing existing quality issues"
         )
-        time.sleep(0.1)
     
     try:
         deleted_count = db.query(QualityIssue).filter(
@@ -395,352 +680,34 @@ def create_and_save_quality_issues(db: Session, portfolio_id: int, task_id: str
         db.rollback()
         logger.error(f"Error deleting existing quality issues: {str(e)}")
     
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for duplicate customer IDs"
-        )
-        time.sleep(0.1)
-    
-    # 1. Check for duplicate customer IDs
-    try:
-        duplicate_ids = find_duplicate_customer_ids(db, portfolio_id)
-        for group in duplicate_ids:
-            employee_id = group[0]['employee_id']
-            count = len(group)
-            
-            # Create affected_records as an array with one entry per affected client
-            affected_records = []
-            for client_info in group:
-                affected_records.append({
-                    "entity_type": "client",
-                    "entity_id": client_info["id"],
-                    "employee_id": client_info["employee_id"],
-                    "name": client_info.get("name", "Unknown")
-                })
-            
-            # Create a single issue for each duplicate employee ID group
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="duplicate_customer_id",
-                severity="high",
-                status="open",
-                description=f"Duplicate employee ID: {employee_id} (found in {count} clients)",
-                affected_records=affected_records
+    for check in QUALITY_CHECKS:
+        # Update progress if task_id provided
+        if task_id:
+            get_task_manager().update_task(
+                task_id,
+                status_message=check["message"]
             )
-            db.add(issue)
-            issue_counts["duplicate_customer_ids"] += 1
         
-        # Commit in batches to avoid memory issues
-        db.commit()
-        logger.info(f"Created {issue_counts['duplicate_customer_ids']} duplicate customer ID issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking duplicate customer IDs: {str(e)}")
-    
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for duplicate addresses"
-        )
-        time.sleep(0.1)
-    
-    # 2. Check for duplicate addresses
-    try:
-        duplicate_addresses = find_duplicate_addresses(db, portfolio_id)
-        for group in duplicate_addresses:
-            address = group[0].get('address', 'Unknown')
-            count = len(group)
-            
-            # Create affected_records as an array with one entry per affected client
-            affected_records = []
-            for client_info in group:
-                affected_records.append({
-                    "entity_type": "client",
-                    "entity_id": client_info["id"],
-                    "employee_id": client_info.get("employee_id", "Unknown"),
-                    "name": client_info.get("name", "Unknown"),
-                    "address": client_info.get("address", "Unknown")
-                })
-            
-            # Create a single issue for each duplicate address group
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="duplicate_address",
-                severity="medium",
-                status="open",
-                description=f"Duplicate address: {address} (found in {count} clients)",
-                affected_records=affected_records
+        try:
+            issues = check["build"](db, portfolio_id)
+            db.add_all(
+                QualityIssue(portfolio_id=portfolio_id, status="open", **issue) for issue in issues
             )
-            db.add(issue)
-            issue_counts["duplicate_addresses"] += 1
-        
-        # Commit in batches
-        db.commit()
-        logger.info(f"Created {issue_counts['duplicate_addresses']} duplicate address issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking duplicate addresses: {str(e)}")
-    
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for duplicate DOBs"
-        )
-        time.sleep(0.1)
-    
-    # 3. Check for duplicate DOBs
-    try:
-        duplicate_dobs = find_duplicate_dobs(db, portfolio_id)
-        for group in duplicate_dobs:
-            dob_value = group[0].get('date_of_birth', 'Unknown')
-            count = len(group)
             
-            # Create affected_records as an array with one entry per affected client
-            affected_records = []
-            for client_info in group:
-                affected_records.append({
-                    "entity_type": "client",
-                    "entity_id": client_info["id"],
-                    "employee_id": client_info.get("employee_id", "Unknown"),
-                    "name": client_info.get("name", "Unknown"),
-                    "date_of_birth": dob_value
-                })
-            
-            # Create a single issue for each duplicate DOB group
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="duplicate_dob",
-                severity="medium",
-                status="open",
-                description=f"Duplicate date of birth: {dob_value} (found in {count} clients)",
-                affected_records=affected_records
-            )
-            db.add(issue)
-            issue_counts["duplicate_dob"] += 1
-        
-        # Commit in batches
-        db.commit()
-        logger.info(f"Created {issue_counts['duplicate_dob']} duplicate DOB issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking duplicate DOBs: {str(e)}")
+            # Commit each check separately to avoid memory issues
+            db.commit()
+            issue_counts[check["count_key"]] = len(issues)
+            logger.info(f"Created {len(issues)} {check['issue_type']} issues")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error checking {check['issue_type']}: {str(e)}")
     
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for duplicate loan IDs"
-        )
-        time.sleep(0.1)
-    
-    # 4. Check for duplicate loan IDs
-    try:
-        duplicate_loans = find_duplicate_loan_ids(db, portfolio_id)
-        for group in duplicate_loans:
-            loan_no = group[0]['loan_no']
-            count = len(group)
-            
-            # Create affected_records as an array with one entry per affected loan
-            affected_records = []
-            for loan_info in group:
-                affected_records.append({
-                    "entity_type": "loan",
-                    "entity_id": loan_info["id"],
-                    "loan_no": loan_info["loan_no"],
-                    "employee_id": loan_info.get("employee_id", "Unknown"),
-                    "loan_amount": loan_info.get("loan_amount", 0)
-                })
-            
-            # Create a single issue for each duplicate loan ID group
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="duplicate_loan_id",
-                severity="high",
-                status="open",
-                description=f"Duplicate loan ID: {loan_no} (found in {count} loans)",
-                affected_records=affected_records
-            )
-            db.add(issue)
-            issue_counts["duplicate_loan_ids"] += 1
-        
-        # Commit in batches
-        db.commit()
-        logger.info(f"Created {issue_counts['duplicate_loan_ids']} duplicate loan ID issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking duplicate loan IDs: {str(e)}")
-    
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for duplicate phone numbers"
-        )
-        time.sleep(0.1)
-    
-    # 4. Check for duplicate phone numbers
-    try:
-        duplicate_phones = find_duplicate_phone_numbers(db, portfolio_id)
-        for group in duplicate_phones:
-            phone = group[0].get('phone_number', 'Unknown')
-            count = len(group)
-            
-            # Create affected_records as an array with one entry per affected client
-            affected_records = []
-            for client_info in group:
-                affected_records.append({
-                    "entity_type": "client",
-                    "entity_id": client_info["id"],
-                    "employee_id": client_info.get("employee_id", "Unknown"),
-                    "name": client_info.get("name", "Unknown"),
-                    "phone_number": client_info.get("phone_number", "Unknown")
-                })
-            
-            # Create a single issue for each duplicate phone number group
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="duplicate_phone",
-                severity="medium",
-                status="open",
-                description=f"Duplicate phone number: {phone} (found in {count} clients)",
-                affected_records=affected_records
-            )
-            db.add(issue)
-            issue_counts["duplicate_phones"] += 1
-        
-        # Commit in batches
-        db.commit()
-        logger.info(f"Created {issue_counts['duplicate_phones']} duplicate phone number issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking duplicate phone numbers: {str(e)}")
-    
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for clients without matching loans"
-        )
-        time.sleep(0.1)
-    
-    # 5. Check for clients without matching loans
-    try:
-        unmatched_clients = find_clients_without_matching_loans(db, portfolio_id)
-        for client_info in unmatched_clients:
-            # Create affected_records as an array with one entry per affected client
-            affected_records = [{
-                "entity_type": "client",
-                "entity_id": client_info["id"],
-                "employee_id": client_info["employee_id"],
-                "name": client_info.get("name", "Unknown"),
-                "phone_number": client_info.get("phone_number", "Unknown")
-            }]
-            
-            # Create a single issue for each unmatched client
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="client_without_matching_loan",
-                severity="high",
-                status="open",
-                description=f"Client has no matching loan with employee ID: {client_info['employee_id']}",
-                affected_records=affected_records
-            )
-            db.add(issue)
-        
-        issue_counts["clients_without_matching_loans"] = len(unmatched_clients)
-        
-        # Commit in batches
-        db.commit()
-        logger.info(f"Created {issue_counts['clients_without_matching_loans']} client without matching loan issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking clients without matching loans: {str(e)}")
-    
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for loans without matching clients"
-        )
-        time.sleep(0.1)
-    
-    # 5b. Check for loans without matching clients
     try:
-        unmatched_loans = find_loans_without_matching_clients(db, portfolio_id)
-        for loan_info in unmatched_loans:
-            # Create affected_records as an array with one entry per affected loan
-            affected_records = [{
-                "entity_type": "loan",
-                "entity_id": loan_info["id"],
-                "loan_no": loan_info["loan_no"],
-                "employee_id": loan_info["employee_id"],
-                "loan_amount": loan_info.get("loan_amount", 0)
-            }]
-            
-            # Create a single issue for each unmatched loan
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="loan_without_matching_client",
-                severity="high",
-                status="open",
-                description=f"Loan has no matching client with employee ID: {loan_info['employee_id']}",
-                affected_records=affected_records
-            )
-            db.add(issue)
-        
-        issue_counts["loans_without_matching_clients"] = len(unmatched_loans)
-        
-        # Commit in batches
-        db.commit()
-        logger.info(f"Created {issue_counts['loans_without_matching_clients']} loan without matching client issues")
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error checking loans without matching clients: {str(e)}")
-    
-    # Update progress if task_id provided
-    if task_id:
-        get_task_manager().update_task(
-            task_id,
-            status_message="Checking for missing data"
-        )
-        time.sleep(0.1)
-    
-    # 6. Check for missing DOB
-    try:
-        missing_dob_clients = find_missing_dob(db, portfolio_id)
-        for client_info in missing_dob_clients:
-            # Create affected_records as an array with one entry per affected client
-            affected_records = [{
-                "entity_type": "client",
-                "entity_id": client_info["id"],
-                "employee_id": client_info["employee_id"],
-                "name": client_info["name"],
-                "phone_number": client_info.get("phone_number", "Unknown")
-            }]
-            
-            # Create a single issue for each client with missing DOB
-            issue = QualityIssue(
-                portfolio_id=portfolio_id,
-                issue_type="missing_dob",
-                severity="medium",
-                status="open",
-                description=f"Client has no date of birth",
-                affected_records=affected_records
-            )
-            db.add(issue)
-        
-        issue_counts["missing_dob"] = len(missing_dob_clients)
-        
-        # Commit in batches
+        mark_checked(db, portfolio_id, {table: versions.get(table, 0) for table in QUALITY_CHECK_TABLES})
         db.commit()
-        logger.info(f"Created {issue_counts['missing_dob']} missing DOB issues")
     except Exception as e:
         db.rollback()
-        logger.error(f"Error checking missing DOB: {str(e)}")
+        logger.error(f"Error recording quality check watermarks: {str(e)}")
     
     # Calculate totals
     total_issues = sum(issue_counts.values())
@@ -760,3 +727,122 @@ def create_and_save_quality_issues(db: Session, portfolio_id: int, task_id: str
     logger.info(f"Completed quality issue creation for portfolio {portfolio_id}: {total_issues} total issues")
     
     return issue_counts
+
+
+def _diff_entry(issue_id: int, issue_type: str, description: str) -> Dict[str, Any]:
+    return {"id": issue_id, "issue_type": issue_type, "description": description}
+
+
+def recheck_quality_issues(db: Session, portfolio_id: int) -> Dict[str, Any]:
+    """
+    Rerun only the quality checks whose tables were reloaded since the last
+    run, and update their issues in place instead of rewriting them all.
+
+    For each rerun check, issues the data no longer has are closed, closed
+    issues that are back are reopened, new issues are added as open, and
+    issues still present keep their status and comments. Issues still
+    present take the affected records and description of this run, so they
+    point at the reloaded rows.
+
+    Returns the issue types rechecked and the issues opened and closed.
+    """
+    portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+    if not portfolio:
+        raise ValueError(f"Portfolio with ID {portfolio_id} not found")
+
+    versions = watermark_versions(db, portfolio_id)
+    stale = stale_tables(db, portfolio_id, QUALITY_CHECK_TABLES)
+    checks = [check for check in QUALITY_CHECKS if check["tables"] & stale]
+    result = {"rechecked": [check["issue_type"] for check in checks], "opened": [], "closed": []}
+    if not checks:
+        logger.info(f"Quality data for portfolio {portfolio_id} unchanged since the last check")
+        return result
+
+    try:
+        for check in checks:
+            issue_types = [check["issue_type"]] + [
+                legacy for legacy, current in LEGACY_ISSUE_TYPES.items() if current == check["issue_type"]
+            ]
+            existing = defaultdict(list)
+            for issue in (
+                db.query(
+                    QualityIssue.id,
+                    QualityIssue.issue_type,
+                    QualityIssue.description,
+                    QualityIssue.affected_records,
+                    QualityIssue.status,
+                )
+                .filter(QualityIssue.portfolio_id == portfolio_id, QualityIssue.issue_type.in_(issue_types))
+            ):
+                existing[issue_key(issue.issue_type, issue.affected_records)].append(issue)
+
+            found = {issue_key(issue["issue_type"], issue["affected_records"]): issue for issue in check["build"](db, portfolio_id)}
+
+            to_close = [
+                issue for key, issues in existing.items() if key not in found
+                for issue in issues if issue.status != "closed"
+            ]
+            # Reopen the latest closed issue for anything back with no other issue
+            to_reopen = [
+                max(issues, key=lambda issue: issue.id) for key, issues in existing.items()
+                if key in found and all(issue.status == "closed" for issue in issues)
+            ]
+            new_issues = [
+                QualityIssue(portfolio_id=portfolio_id, status="open", **issue)
+                for key, issue in found.items() if key not in existing
+            ]
+
+            if to_close:
+                db.query(QualityIssue).filter(QualityIssue.id.in_([issue.id for issue in to_close])).update(
+                    {"status": "closed"}, synchronize_session=False
+                )
+            if to_reopen:
+                db.query(QualityIssue).filter(QualityIssue.id.in_([issue.id for issue in to_reopen])).update(
+                    {"status": "open"}, synchronize_session=False
+                )
+            for key, issues in existing.items():
+                if key in found:
+                    db.query(QualityIssue).filter(QualityIssue.id.in_([issue.id for issue in issues])).update(
+                        {
+                            "description": found[key]["description"],
+                            "affected_records": found[key]["affected_records"],
+                        },
+                        synchronize_session=False,
+                    )
+            db.add_all(new_issues)
+            db.flush()
+
+            result["closed"] += [_diff_entry(issue.id, issue.issue_type, issue.description) for issue in to_close]
+            result["opened"] += [
+                _diff_entry(issue.id, issue.issue_type, found[issue_key(issue.issue_type, issue.affected_records)]["description"])
+                for issue in to_reopen
+            ]
+            result["opened"] += [_diff_entry(issue.id, issue.issue_type, issue.description) for issue in new_issues]
+
+        mark_checked(db, portfolio_id, {table: versions.get(table, 0) for table in stale})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(
+        f"Rechecked {result['rechecked']} for portfolio {portfolio_id}: "
+        f"{len(result['opened'])} opened, {len(result['closed'])} closed"
+    )
+    return result
+
+
+def refresh_quality_issues(db: Session, portfolio_id: int) -> Dict[str, Any]:
+    """
+    Bring a portfolio's quality issues up to date after its data was loaded.
+
+    Goes through recheck_quality_issues, so issues that survive a reload keep
+    their status, comments and approvals. Returns the issue counts, as
+    create_quality_issues_if_needed reports them, with the issues the
+    recheck opened and closed.
+    """
+    result = recheck_quality_issues(db, portfolio_id)
+    issue_counts = create_quality_issues_if_needed(db, portfolio_id)
+    issue_counts["opened_issues"] = len(result["opened"])
+    issue_counts["closed_issues"] = len(result["closed"])
+    return issue_counts
@@ -0,0 +1,293 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.database import BackgroundSessionLocal
+from app.models import QualityIssue, QualityIssueComment, User
+
+# Columns describing the issue on each affected record row of the flat exports
+ISSUE_COLUMNS = ["issue_id", "issue_type", "severity", "status", "description"]
+
+# Prefix of the record's keys in the flat exports' headers, so a record key
+# like "status" can't collide with ISSUE_COLUMNS
+RECORD_COLUMN_PREFIX = "record."
+
+# Rows fetched per round trip when streaming
+BATCH_SIZE = 1000
+
+# Older rows store a single record as a dictionary rather than a list
+AFFECTED_RECORDS_ARRAY = """
+    CASE WHEN json_typeof(quality_issues.affected_records) = 'array'
+        THEN quality_issues.affected_records
+        ELSE json_build_array(quality_issues.affected_records)
+    END
+"""
+
+
+def _issue_filters(portfolio_id: int, status_type: Optional[str], issue_type: Optional[str]) -> list:
+    filters = [QualityIssue.portfolio_id == portfolio_id]
+    if status_type:
+        filters.append(QualityIssue.status == status_type)
+    if issue_type:
+        filters.append(QualityIssue.issue_type == issue_type)
+    return filters
+
+
+def _issue_order() -> tuple:
+    # Most severe first, then newest first
+    return QualityIssue.severity.desc(), QualityIssue.created_at.desc(), QualityIssue.id.desc()
+
+
+def _cell(value: Any) -> Any:
+    """Value openpyxl can write: no timezones, nested data as JSON."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def quality_issue_summary(
+    db: Session, portfolio_id: int, status_type: Optional[str] = None, issue_type: Optional[str] = None
+) -> Dict[str, int]:
+    """Issue counts by severity and status, counted in one query."""
+    counts = (
+        db.query(
+            func.count(QualityIssue.id),
+            func.count(QualityIssue.id).filter(QualityIssue.severity == "high"),
+            func.count(QualityIssue.id).filter(QualityIssue.severity == "medium"),
+            func.count(QualityIssue.id).filter(QualityIssue.severity == "low"),
+            func.count(QualityIssue.id).filter(QualityIssue.status == "open"),
+            func.count(QualityIssue.id).filter(QualityIssue.status == "approved"),
+        )
+        .filter(*_issue_filters(portfolio_id, status_type, issue_type))
+        .one()
+    )
+    total, high, medium, low, open_count, approved = counts
+    return {
+        "Total Issues": total,
+        "High Severity": high,
+        "Medium Severity": medium,
+        "Low Severity": low,
+        "Open": open_count,
+        "Approved": approved,
+        "Other Status": total - open_count - approved,
+    }
+
+
+def write_quality_issues_xlsx(
+    db: Session,
+    portfolio_id: int,
+    status_type: Optional[str],
+    issue_type: Optional[str],
+    include_comments: bool,
+    summary: Dict[str, int],
+    output,
+) -> None:
+    """
+    Write the quality issues workbook (all issues, summary, comments and
+    affected records) to a file object. Comments and records each go on one
+    sheet, keyed by issue ID: write-only sheets stay open until the workbook
+    is saved, so a sheet per issue ran out of file handles.
+
+    Uses openpyxl's write-only mode, which spools each sheet to disk as rows
+    are appended, and reads issues, comments and records in batches, so
+    memory stays bounded.
+    """
+    from openpyxl import Workbook
+
+    filters = _issue_filters(portfolio_id, status_type, issue_type)
+    workbook = Workbook(write_only=True)
+
+    sheet = workbook.create_sheet("All Issues")
+    sheet.append(["ID", "Issue Type", "Description", "Severity", "Status", "Created", "Updated"])
+    issues = (
+        db.query(
+            QualityIssue.id,
+            QualityIssue.issue_type,
+            QualityIssue.description,
+            QualityIssue.severity,
+            QualityIssue.status,
+            QualityIssue.created_at,
+            QualityIssue.updated_at,
+        )
+        .filter(*filters)
+        .order_by(*_issue_order())
+        .yield_per(BATCH_SIZE)
+    )
+    for issue in issues:
+        sheet.append([_cell(value) for value in issue])
+
+    sheet = workbook.create_sheet("Summary")
+    sheet.append(["Type"] + list(summary))
+    sheet.append(["Count"] + list(summary.values()))
+
+    if include_comments:
+        issue_ids = select(QualityIssue.id).where(*filters)
+
+        # Commenters' emails in one query rather than one per comment
+        emails = dict(
+            db.query(User.id, User.email)
+            .filter(
+                User.id.in_(
+                    select(QualityIssueComment.user_id).where(QualityIssueComment.quality_issue_id.in_(issue_ids))
+                )
+            )
+            .all()
+        )
+
+        comments = (
+            db.query(
+                QualityIssueComment.quality_issue_id,
+                QualityIssueComment.id,
+                QualityIssueComment.user_id,
+                QualityIssueComment.comment,
+                QualityIssueComment.created_at,
+            )
+            .join(QualityIssue, QualityIssue.id == QualityIssueComment.quality_issue_id)
+            .filter(*filters)
+            .order_by(*_issue_order(), QualityIssueComment.created_at)
+            .yield_per(BATCH_SIZE)
+        )
+        sheet = workbook.create_sheet("Comments")
+        sheet.append(["Issue ID", "Comment ID", "User ID", "User Email", "Comment", "Created"])
+        for comment in comments:
+            sheet.append([
+                comment.quality_issue_id,
+                comment.id,
+                comment.user_id,
+                emails.get(comment.user_id),
+                comment.comment,
+                _cell(comment.created_at),
+            ])
+
+    keys = affected_record_keys(db, portfolio_id, status_type, issue_type)
+    sheet = workbook.create_sheet("Records")
+    sheet.append(["Issue ID"] + keys)
+    for row in iter_affected_record_rows(db, portfolio_id, status_type, issue_type, keys):
+        sheet.append([row[0]] + [_cell(value) for value in row[len(ISSUE_COLUMNS):]])
+
+    workbook.save(output)
+
+
+def _record_query(portfolio_id: int, status_type: Optional[str], issue_type: Optional[str], select_sql: str, order_sql: str = ""):
+    where = ["quality_issues.portfolio_id = :portfolio_id"]
+    params = {"portfolio_id": portfolio_id}
+    if status_type:
+        where.append("quality_issues.status = :status_type")
+        params["status_type"] = status_type
+    if issue_type:
+        where.append("quality_issues.issue_type = :issue_type")
+        params["issue_type"] = issue_type
+    sql = f"""
+        SELECT {select_sql}
+        FROM quality_issues,
+            json_array_elements({AFFECTED_RECORDS_ARRAY}) WITH ORDINALITY AS record(value, position)
+        WHERE {' AND '.join(where)}
+        {order_sql}
+    """
+    return text(sql), params
+
+
+def affected_record_keys(db: Session, portfolio_id: int, status_type: Optional[str], issue_type: Optional[str]) -> List[str]:
+    """Every key used by the issues' affected records, collected in the database."""
+    statement, params = _record_query(
+        portfolio_id, status_type, issue_type,
+        "DISTINCT json_object_keys("
+        "CASE WHEN json_typeof(record.value) = 'object' THEN record.value ELSE '{}'::json END"
+        ") AS key",
+    )
+    return sorted(db.execute(statement, params).scalars().all())
+
+
+def iter_affected_record_rows(
+    db: Session, portfolio_id: int, status_type: Optional[str], issue_type: Optional[str], keys: List[str]
+) -> Iterator[List[Any]]:
+    """One row per affected record: the ISSUE_COLUMNS followed by the record's value for each key."""
+    statement, params = _record_query(
+        portfolio_id, status_type, issue_type,
+        "quality_issues.id, quality_issues.issue_type, quality_issues.severity, "
+        "quality_issues.status, quality_issues.description, record.value",
+        "ORDER BY quality_issues.severity DESC, quality_issues.created_at DESC, "
+        "quality_issues.id DESC, record.position",
+    )
+    # Server-side cursor, fetched in batches
+    result = db.execute(
+        statement.execution_options(stream_results=True, yield_per=BATCH_SIZE), params
+    )
+    for row in result:
+        record = row.value if isinstance(row.value, dict) else {}
+        yield list(row[:len(ISSUE_COLUMNS)]) + [record.get(key) for key in keys]
+
+
+def stream_affected_records_csv(
+    portfolio_id: int, status_type: Optional[str], issue_type: Optional[str]
+) -> Iterator[str]:
+    """
+    CSV of every affected record, produced as it is read. Runs after the
+    request's session has closed, so it opens its own.
+    """
+    db = BackgroundSessionLocal()
+    try:
+        keys = affected_record_keys(db, portfolio_id, status_type, issue_type)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(ISSUE_COLUMNS + [RECORD_COLUMN_PREFIX + key for key in keys])
+        for count, row in enumerate(iter_affected_record_rows(db, portfolio_id, status_type, issue_type, keys), 1):
+            writer.writerow([_cell(value) for value in row])
+            if count % BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+def write_affected_records_parquet(
+    db: Session, portfolio_id: int, status_type: Optional[str], issue_type: Optional[str], output
+) -> None:
+    """Parquet file of every affected record, written one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    keys = affected_record_keys(db, portfolio_id, status_type, issue_type)
+    # Record values vary in type between issues, so they're stored as strings
+    schema = pa.schema(
+        [("issue_id", pa.int64())]
+        + [(column, pa.string()) for column in ISSUE_COLUMNS[1:]]
+        + [(RECORD_COLUMN_PREFIX + key, pa.string()) for key in keys]
+    )
+
+    def write_batch(writer, rows):
+        columns = list(zip(*rows))
+        arrays = [pa.array(columns[0], pa.int64())] + [
+            pa.array([None if value is None else str(_cell(value)) for value in column], pa.string())
+            for column in columns[1:]
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    with pq.ParquetWriter(output, schema) as writer:
+        rows = []
+        for row in iter_affected_record_rows(db, portfolio_id, status_type, issue_type, keys):
+            rows.append(row)
+            if len(rows) == BATCH_SIZE * 10:
+                write_batch(writer, rows)
+                rows = []
+        if rows:
+            write_batch(writer, rows)
+
+
+def iter_file(output, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Stream a file object from the start in chunks and close it."""
+    try:
+        output.seek(0)
+        while chunk := output.read(chunk_size):
+            yield chunk
+    finally:
+        output.close()
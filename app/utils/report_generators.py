@@ -1,7 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-import numpy as np
-import pandas as pd
+from sqlalchemy import func, and_, case
 from decimal import Decimal
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
@@ -19,15 +17,13 @@ from app.models import (
     CalculationResult,
     StagingResult
 )
-from app.utils.pdf_generator import create_report_pdf
-from app.utils.excel_generator import create_report_excel as create_excel_file
 
 from app.calculators.ecl import (
-    calculate_effective_interest_rate_lender,
+    get_effective_interest_rate,
     calculate_exposure_at_default_percentage,
-    calculate_probability_of_default,
     calculate_loss_given_default,
 )
+from app.utils.risk_inputs import load_portfolio_risk_inputs
 
 
 def generate_collateral_summary(
@@ -35,68 +31,100 @@ def generate_collateral_summary(
 ) -> Dict[str, Any]:
     """
     Generate a summary of collateral data for a portfolio.
+    All statistics are aggregated in the database; only totals and the
+    top 10 securities are returned to Python.
     """
-    # Get portfolio loans
-    loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
-
-    # Get client IDs for these loans
-    employee_ids = [loan.employee_id for loan in loans if loan.employee_id]
-
-    # Get clients
-    clients = (
-        db.query(Client)
-        .filter(Client.portfolio_id == portfolio_id)
-        .filter(Client.employee_id.in_(employee_ids))
-        .all()
+    # Clients in the portfolio that have at least one loan
+    loan_employee_ids = (
+        db.query(Loan.employee_id)
+        .filter(Loan.portfolio_id == portfolio_id, Loan.employee_id.isnot(None))
+    )
+    client_ids = (
+        db.query(Client.id)
+        .filter(
+            Client.portfolio_id == portfolio_id,
+            Client.employee_id.in_(loan_employee_ids),
+        )
+        .subquery()
     )
 
-    # Map client IDs to their database IDs
-    client_id_map = {client.employee_id: client.id for client in clients}
+    total_clients = (
+        db.query(func.count()).select_from(client_ids).scalar_subquery()
+    )
+    total_loan_value = (
+        db.query(func.sum(Loan.outstanding_loan_balance))
+        .filter(Loan.portfolio_id == portfolio_id)
+        .scalar_subquery()
+    )
 
-    # Get securities for these clients
-    securities = (
-        db.query(Security)
-        .filter(Security.client_id.in_(list(client_id_map.values())))
-        .all()
+    # Security statistics, client counts and loan total in one round trip
+    stats = (
+        db.query(
+            func.count(Security.id).label("total_securities"),
+            func.sum(Security.collateral_value).label("total_security_value"),
+            func.count(Security.client_id.distinct()).label("clients_with_collateral"),
+            total_clients.label("total_clients"),
+            total_loan_value.label("total_loan_value"),
+        )
+        .filter(Security.client_id.in_(db.query(client_ids.c.id)))
+        .one()
     )
 
-    # Calculate security statistics
-    total_security_value = sum(security.security_value or Decimal(0) for security in securities)
-    average_security_value = total_security_value / len(securities) if securities else Decimal(0)
+    total_securities = stats.total_securities or 0
+    total_security_value = stats.total_security_value or Decimal(0)
+    average_security_value = (
+        total_security_value / total_securities if total_securities else Decimal(0)
+    )
 
     # Count security types
-    security_types = {}
-    for security in securities:
-        if security.security_type:
-            security_types[security.security_type] = (
-                security_types.get(security.security_type, Decimal(0)) + Decimal(1)
-            )
+    type_counts = (
+        db.query(Security.cash_or_non_cash, func.count(Security.id))
+        .filter(
+            Security.client_id.in_(db.query(client_ids.c.id)),
+            Security.cash_or_non_cash.isnot(None),
+            Security.cash_or_non_cash != "",
+        )
+        .group_by(Security.cash_or_non_cash)
+        .all()
+    )
+    security_types = {
+        security_type: Decimal(count) for security_type, count in type_counts
+    }
 
     # Get top 10 most valuable securities
-    top_securities = sorted(
-        securities, key=lambda x: x.security_value or Decimal(0), reverse=True
-    )[:10]
+    top_securities = (
+        db.query(
+            Security.id,
+            Security.client_id,
+            Security.cash_or_non_cash,
+            Security.collateral_value,
+            Security.collateral_description,
+        )
+        .filter(Security.client_id.in_(db.query(client_ids.c.id)))
+        .order_by(func.coalesce(Security.collateral_value, 0).desc())
+        .limit(10)
+        .all()
+    )
 
     top_securities_data = [
         {
             "id": security.id,
             "client_id": security.client_id,
-            "security_type": security.security_type,
-            "security_value": security.security_value,
-            "description": security.description,
+            "security_type": security.cash_or_non_cash,
+            "security_value": security.collateral_value,
+            "description": security.collateral_description,
         }
         for security in top_securities
     ]
 
     # Calculate collateral coverage ratio
-    total_loan_value = sum(loan.outstanding_loan_balance or Decimal(0) for loan in loans)
+    loan_value = stats.total_loan_value or Decimal(0)
     collateral_coverage_ratio = (
-        total_security_value / total_loan_value if total_loan_value > Decimal(0) else Decimal(0)
+        total_security_value / loan_value if loan_value > Decimal(0) else Decimal(0)
     )
 
-    # Count clients with and without collateral
-    clients_with_collateral = len(set(security.client_id for security in securities))
-    clients_without_collateral = len(client_id_map) - clients_with_collateral
+    clients_with_collateral = stats.clients_with_collateral or 0
+    clients_without_collateral = (stats.total_clients or 0) - clients_with_collateral
 
     return {
         "total_security_value": total_security_value,
@@ -104,7 +132,7 @@ def generate_collateral_summary(
         "security_types": security_types,
         "top_securities": top_securities_data,
         "collateral_coverage_ratio": round(collateral_coverage_ratio, 2),
-        "total_securities": len(securities),
+        "total_securities": total_securities,
         "clients_with_collateral": clients_with_collateral,
         "clients_without_collateral": clients_without_collateral,
         "reporting_date": report_date.isoformat(),
@@ -117,32 +145,43 @@ def generate_guarantee_summary(
     """
     Generate a summary of guarantee data for a portfolio.
     """
-    # Get guarantees for the portfolio
-    guarantees = (
-        db.query(Guarantee).filter(Guarantee.portfolio_id == portfolio_id).all()
+    total_loan_value = (
+        db.query(func.sum(Loan.outstanding_loan_balance))
+        .filter(Loan.portfolio_id == portfolio_id)
+        .scalar_subquery()
     )
 
-    # Calculate guarantee statistics
-    total_guarantee_value = sum(
-        guarantee.pledged_amount or Decimal(0) for guarantee in guarantees
+    # Guarantee statistics and loan total in one round trip
+    stats = (
+        db.query(
+            func.count(Guarantee.id).label("total_guarantees"),
+            func.sum(Guarantee.pledged_amount).label("total_guarantee_value"),
+            total_loan_value.label("total_loan_value"),
+        )
+        .filter(Guarantee.portfolio_id == portfolio_id)
+        .one()
     )
+
+    total_guarantees = stats.total_guarantees or 0
+    total_guarantee_value = Decimal(str(stats.total_guarantee_value or 0))
     average_guarantee_value = (
-        total_guarantee_value / len(guarantees) if guarantees else Decimal(0)
+        total_guarantee_value / total_guarantees if total_guarantees else Decimal(0)
     )
 
-    # Get loans for the portfolio
-    loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
-    total_loan_value = sum(loan.outstanding_loan_balance or Decimal(0) for loan in loans)
-
     # Calculate guarantee coverage ratio
+    loan_value = stats.total_loan_value or Decimal(0)
     guarantee_coverage_ratio = (
-        total_guarantee_value / total_loan_value if total_loan_value > Decimal(0) else Decimal(0)
+        total_guarantee_value / loan_value if loan_value > Decimal(0) else Decimal(0)
     )
 
     # Get top guarantors by pledged amount
-    top_guarantors = sorted(
-        guarantees, key=lambda x: x.pledged_amount or Decimal(0), reverse=True
-    )[:10]
+    top_guarantors = (
+        db.query(Guarantee.id, Guarantee.guarantor, Guarantee.pledged_amount)
+        .filter(Guarantee.portfolio_id == portfolio_id)
+        .order_by(func.coalesce(Guarantee.pledged_amount, 0).desc())
+        .limit(10)
+        .all()
+    )
 
     top_guarantors_data = [
         {
@@ -153,19 +192,14 @@ def generate_guarantee_summary(
         for guarantee in top_guarantors
     ]
 
-    # Count guarantors by type if available
+    # Guarantee has no guarantor type column yet
     guarantor_types = {}
-    for guarantee in guarantees:
-        if hasattr(guarantee, "guarantor_type") and guarantee.guarantor_type:
-            guarantor_types[guarantee.guarantor_type] = (
-                guarantor_types.get(guarantee.guarantor_type, Decimal(0)) + Decimal(1)
-            )
 
     return {
         "total_guarantee_value": total_guarantee_value,
         "average_guarantee_value": average_guarantee_value,
         "guarantee_coverage_ratio": round(guarantee_coverage_ratio, 2),
-        "total_guarantees": len(guarantees),
+        "total_guarantees": total_guarantees,
         "top_guarantors": top_guarantors_data,
         "guarantor_types": guarantor_types,
         "reporting_date": report_date.isoformat(),
@@ -178,93 +212,72 @@ def generate_interest_rate_summary(
     """
     Generate a summary of interest rates for a portfolio.
     """
-    # Get loans for the portfolio
-    loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
+    import numpy as np
+    from app.utils.distribution_stats import summary_stats, bucket_counts, top_n_indices
 
-    # Calculate Effective Interest Rates (EIR) for each loan
+    # Get loans with the inputs needed for an EIR
+    loans = (
+        db.query(Loan)
+        .filter(
+            Loan.portfolio_id == portfolio_id,
+            Loan.loan_amount != 0,
+            Loan.monthly_installment != 0,
+            Loan.loan_term != 0,
+        )
+        .all()
+    )
+
+    # Read the Effective Interest Rate (EIR) stored for each loan at ingestion
     loan_eirs = []
     for loan in loans:
-        if loan.loan_amount and loan.monthly_installment and loan.loan_term:
-            eir = calculate_effective_interest_rate_lender(
-                loan_amount=Decimal(loan.loan_amount),
-                administrative_fees=Decimal(loan.administrative_fees) if loan.administrative_fees else Decimal(0),
-                loan_term=loan.loan_term,
-                monthly_payment=Decimal(loan.monthly_installment),
-            )
-            loan_eirs.append((loan, eir))
+        eir = get_effective_interest_rate(loan)
+        if eir is not None:
+            loan_eirs.append((loan, eir / 100))  # as fraction
+    eir_values = np.array([eir for _, eir in loan_eirs], dtype=float)
 
     # Calculate EIR statistics
-    all_eirs = [eir for _, eir in loan_eirs]
-    if all_eirs:
-        average_eir = sum(all_eirs) / len(all_eirs)
-        min_eir = min(all_eirs)
-        max_eir = max(all_eirs)
-        median_eir = sorted(all_eirs)[len(all_eirs) // 2]
-    else:
-        average_eir = min_eir = max_eir = median_eir = Decimal(0)
+    eir_stats = summary_stats(eir_values)
 
     # Group loans by EIR ranges
-    eir_ranges = {
-        "0-5%": Decimal(0),
-        "5-10%": Decimal(0),
-        "10-15%": Decimal(0),
-        "15-20%": Decimal(0),
-        "20-25%": Decimal(0),
-        "25-30%": Decimal(0),
-        "30%+": Decimal(0),
-    }
-
-    for _, eir in loan_eirs:
-        if eir < Decimal(0.05):
-            eir_ranges["0-5%"] += Decimal(1)
-        elif eir < Decimal(0.10):
-            eir_ranges["5-10%"] += Decimal(1)
-        elif eir < Decimal(0.15):
-            eir_ranges["10-15%"] += Decimal(1)
-        elif eir < Decimal(0.20):
-            eir_ranges["15-20%"] += Decimal(1)
-        elif eir < Decimal(0.25):
-            eir_ranges["20-25%"] += Decimal(1)
-        elif eir < Decimal(0.30):
-            eir_ranges["25-30%"] += Decimal(1)
-        else:
-            eir_ranges["30%+"] += Decimal(1)
+    eir_ranges = bucket_counts(
+        eir_values,
+        [0.05, 0.10, 0.15, 0.20, 0.25, 0.30],
+        ["0-5%", "5-10%", "10-15%", "15-20%", "20-25%", "25-30%", "30%+"],
+        right=False,
+    )
 
     # Group by loan type if available
     loan_type_eirs = {}
     for loan, eir in loan_eirs:
         if loan.loan_type:
-            if loan.loan_type not in loan_type_eirs:
-                loan_type_eirs[loan.loan_type] = []
-            loan_type_eirs[loan.loan_type].append(eir)
+            loan_type_eirs.setdefault(loan.loan_type, []).append(eir)
 
     loan_type_avg_eirs = {
-        loan_type: sum(eirs) / len(eirs) for loan_type, eirs in loan_type_eirs.items()
+        loan_type: float(np.mean(eirs)) for loan_type, eirs in loan_type_eirs.items()
     }
 
     # Get top 10 highest EIR loans
-    top_eir_loans = sorted(loan_eirs, key=lambda x: x[1], reverse=True)[:10]
     top_eir_loans_data = [
         {
-            "loan_id": loan.id,
-            "loan_no": loan.loan_no,
-            "employee_id": loan.employee_id,
-            "loan_amount": loan.loan_amount,
-            "loan_term": loan.loan_term,
-            "monthly_installment": loan.monthly_installment,
-            "effective_interest_rate": round(eir * Decimal(100), 2),  # as percentage
+            "loan_id": loan_eirs[i][0].id,
+            "loan_no": loan_eirs[i][0].loan_no,
+            "employee_id": loan_eirs[i][0].employee_id,
+            "loan_amount": loan_eirs[i][0].loan_amount,
+            "loan_term": loan_eirs[i][0].loan_term,
+            "monthly_installment": loan_eirs[i][0].monthly_installment,
+            "effective_interest_rate": round(float(eir_values[i]) * 100, 2),  # as percentage
         }
-        for loan, eir in top_eir_loans
+        for i in top_n_indices(eir_values, 10)
     ]
 
     return {
-        "average_eir": round(average_eir * Decimal(100), 2),  # as percentage
-        "min_eir": round(min_eir * Decimal(100), 2),
-        "max_eir": round(max_eir * Decimal(100), 2),
-        "median_eir": round(median_eir * Decimal(100), 2),
+        "average_eir": round(eir_stats["mean"] * 100, 2),  # as percentage
+        "min_eir": round(eir_stats["min"] * 100, 2),
+        "max_eir": round(eir_stats["max"] * 100, 2),
+        "median_eir": round(eir_stats["median"] * 100, 2),
         "eir_distribution": eir_ranges,
         "loan_type_avg_eirs": {
-            k: round(v * Decimal(100), 2) for k, v in loan_type_avg_eirs.items()
+            k: round(v * 100, 2) for k, v in loan_type_avg_eirs.items()
         },
         "top_eir_loans": top_eir_loans_data,
         "total_loans_analyzed": len(loan_eirs),
@@ -277,18 +290,42 @@ def generate_repayment_summary(
 ) -> Dict[str, Any]:
     """
     Generate a summary of repayment data for a portfolio.
+    Totals, status counts and the NDIA histogram come from a single
+    aggregate query.
     """
-    # Get loans for the portfolio
-    loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
+    ndia = func.coalesce(Loan.ndia, 0)
+
+    stats = (
+        db.query(
+            func.count(Loan.id).label("total_loans"),
+            func.sum(Loan.principal_due).label("total_principal_due"),
+            func.sum(Loan.interest_due).label("total_interest_due"),
+            func.sum(Loan.total_due).label("total_due"),
+            func.sum(Loan.principal_paid).label("total_principal_paid"),
+            func.sum(Loan.interest_paid).label("total_interest_paid"),
+            func.sum(Loan.total_paid).label("total_paid"),
+            func.count(Loan.id).filter(Loan.paid.is_(True)).label("paid_loans"),
+            func.count(Loan.id).filter(Loan.paid.is_(False)).label("unpaid_loans"),
+            func.count(Loan.id).filter(Loan.ndia > 0).label("delinquent_loans"),
+            # NDIA histogram
+            func.count(Loan.id).filter(ndia == 0).label("ndia_current"),
+            func.count(Loan.id).filter(ndia != 0, ndia <= 30).label("ndia_30"),
+            func.count(Loan.id).filter(ndia > 30, ndia <= 90).label("ndia_90"),
+            func.count(Loan.id).filter(ndia > 90, ndia <= 180).label("ndia_180"),
+            func.count(Loan.id).filter(ndia > 180, ndia <= 360).label("ndia_360"),
+            func.count(Loan.id).filter(ndia > 360).label("ndia_over_360"),
+        )
+        .filter(Loan.portfolio_id == portfolio_id)
+        .one()
+    )
 
-    # Calculate repayment statistics
-    total_principal_due = sum(loan.principal_due or Decimal(0) for loan in loans)
-    total_interest_due = sum(loan.interest_due or Decimal(0) for loan in loans)
-    total_due = sum(loan.total_due or Decimal(0) for loan in loans)
+    total_principal_due = stats.total_principal_due or Decimal(0)
+    total_interest_due = stats.total_interest_due or Decimal(0)
+    total_due = stats.total_due or Decimal(0)
 
-    total_principal_paid = sum(loan.principal_paid or Decimal(0) for loan in loans)
-    total_interest_paid = sum(loan.interest_paid or Decimal(0) for loan in loans)
-    total_paid = sum(loan.total_paid or Decimal(0) for loan in loans)
+    total_principal_paid = stats.total_principal_paid or Decimal(0)
+    total_interest_paid = stats.total_interest_paid or Decimal(0)
+    total_paid = stats.total_paid or Decimal(0)
 
     # Calculate repayment ratios
     principal_repayment_ratio = (
@@ -299,43 +336,35 @@ def generate_repayment_summary(
     )
     overall_repayment_ratio = total_paid / total_due if total_due > Decimal(0) else Decimal(0)
 
-    # Group loans by status
-    paid_loans = sum(1 for loan in loans if loan.paid is True)
-    unpaid_loans = sum(1 for loan in loans if loan.paid is False)
-
     # Calculate delinquency statistics
-    delinquent_loans = sum(1 for loan in loans if loan.ndia and loan.ndia > 0)
-    delinquency_rate = delinquent_loans / len(loans) if loans else Decimal(0)
+    total_loans = stats.total_loans or 0
+    delinquent_loans = stats.delinquent_loans or 0
+    delinquency_rate = delinquent_loans / total_loans if total_loans else Decimal(0)
 
-    # Group loans by NDIA ranges
     ndia_ranges = {
-        "Current (0)": Decimal(0),
-        "1-30 days": Decimal(0),
-        "31-90 days": Decimal(0),
-        "91-180 days": Decimal(0),
-        "181-360 days": Decimal(0),
-        "360+ days": Decimal(0),
+        "Current (0)": Decimal(stats.ndia_current or 0),
+        "1-30 days": Decimal(stats.ndia_30 or 0),
+        "31-90 days": Decimal(stats.ndia_90 or 0),
+        "91-180 days": Decimal(stats.ndia_180 or 0),
+        "181-360 days": Decimal(stats.ndia_360 or 0),
+        "360+ days": Decimal(stats.ndia_over_360 or 0),
     }
 
-    for loan in loans:
-        ndia = loan.ndia or Decimal(0)
-        if ndia == Decimal(0):
-            ndia_ranges["Current (0)"] += Decimal(1)
-        elif ndia <= Decimal(30):
-            ndia_ranges["1-30 days"] += Decimal(1)
-        elif ndia <= Decimal(90):
-            ndia_ranges["31-90 days"] += Decimal(1)
-        elif ndia <= Decimal(180):
-            ndia_ranges["91-180 days"] += Decimal(1)
-        elif ndia <= Decimal(360):
-            ndia_ranges["181-360 days"] += Decimal(1)
-        else:
-            ndia_ranges["360+ days"] += Decimal(1)
-
     # Top 10 loans with highest accumulated arrears
-    top_arrears_loans = sorted(
-        loans, key=lambda x: x.accumulated_arrears or Decimal(0), reverse=True
-    )[:10]
+    top_arrears_loans = (
+        db.query(
+            Loan.id,
+            Loan.loan_no,
+            Loan.employee_id,
+            Loan.accumulated_arrears,
+            Loan.ndia,
+            Loan.outstanding_loan_balance,
+        )
+        .filter(Loan.portfolio_id == portfolio_id)
+        .order_by(func.coalesce(Loan.accumulated_arrears, 0).desc())
+        .limit(10)
+        .all()
+    )
 
     top_arrears_loans_data = [
         {
@@ -359,13 +388,13 @@ def generate_repayment_summary(
         "principal_repayment_ratio": round(principal_repayment_ratio, 2),
         "interest_repayment_ratio": round(interest_repayment_ratio, 2),
         "overall_repayment_ratio": round(overall_repayment_ratio, 2),
-        "paid_loans": paid_loans,
-        "unpaid_loans": unpaid_loans,
+        "paid_loans": stats.paid_loans or 0,
+        "unpaid_loans": stats.unpaid_loans or 0,
         "delinquent_loans": delinquent_loans,
         "delinquency_rate": round(delinquency_rate, 2),
         "ndia_distribution": ndia_ranges,
         "top_arrears_loans": top_arrears_loans_data,
-        "total_loans": len(loans),
+        "total_loans": total_loans,
         "reporting_date": report_date.isoformat(),
     }
 
@@ -387,28 +416,8 @@ def generate_assumptions_summary(
     avg_lgd = Decimal(0)
     avg_ead = Decimal(0)
 
-    # Get client IDs for these loans
-    employee_ids = [loan.employee_id for loan in loans if loan.employee_id]
-
-    # Get clients
-    clients = (
-        db.query(Client)
-        .filter(Client.portfolio_id == portfolio_id)
-        .filter(Client.employee_id.in_(employee_ids))
-        .all()
-    )
-
-    # Map client IDs to their database IDs
-    client_id_map = {client.employee_id: client.id for client in clients}
-
-    client_securities = {}
-    for employee_id in employee_ids:
-        if employee_id in client_id_map:
-            client_id = client_id_map[employee_id]
-            securities = (
-                db.query(Security).filter(Security.client_id == client_id).all()
-            )
-            client_securities[employee_id] = securities
+    # Load client, security and PD inputs in a fixed number of queries
+    risk_inputs = load_portfolio_risk_inputs(db, portfolio_id)
 
     # Calculate PD, LGD, and EAD for each loan
     pd_values = []
@@ -417,12 +426,11 @@ def generate_assumptions_summary(
 
     for loan in loans:
         # Calculate PD
-        ndia = loan.ndia or Decimal(0)
-        pd = calculate_probability_of_default(loan, db)
+        pd = risk_inputs.get_pd(loan.employee_id)
         pd_values.append(pd)
 
         # Calculate LGD
-        securities = client_securities.get(loan.employee_id, [])
+        securities = risk_inputs.get_securities(loan.employee_id)
         lgd = calculate_loss_given_default(loan, securities)
         lgd_values.append(lgd)
 
@@ -482,14 +490,37 @@ def generate_amortised_loan_balances(
     Generate a report of amortised loan balances.
     Note: This report does not consider the BOG non-accrual rule.
     """
-    # Get all loans in the portfolio
-    loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
+    # Amortised percentage per loan, only defined for positive loan amounts
+    has_amount = and_(Loan.loan_amount > 0, Loan.outstanding_loan_balance.isnot(None))
+    amortised_percent = (
+        (Loan.loan_amount - Loan.outstanding_loan_balance) / Loan.loan_amount * 100
+    )
 
-    # Create summary statistics
-    total_original_loan_amount = sum(loan.loan_amount or Decimal(0) for loan in loans)
-    total_current_loan_balance = sum(
-        loan.outstanding_loan_balance or Decimal(0) for loan in loans
+    stats = (
+        db.query(
+            func.count(Loan.id).label("total_loans"),
+            func.sum(Loan.loan_amount).label("total_original_loan_amount"),
+            func.sum(Loan.outstanding_loan_balance).label("total_current_loan_balance"),
+            # Amortisation histogram
+            func.count(Loan.id).filter(has_amount, amortised_percent <= 20).label("pct_20"),
+            func.count(Loan.id).filter(
+                has_amount, amortised_percent > 20, amortised_percent <= 40
+            ).label("pct_40"),
+            func.count(Loan.id).filter(
+                has_amount, amortised_percent > 40, amortised_percent <= 60
+            ).label("pct_60"),
+            func.count(Loan.id).filter(
+                has_amount, amortised_percent > 60, amortised_percent <= 80
+            ).label("pct_80"),
+            func.count(Loan.id).filter(has_amount, amortised_percent > 80).label("pct_100"),
+        )
+        .filter(Loan.portfolio_id == portfolio_id)
+        .one()
     )
+
+    # Create summary statistics
+    total_original_loan_amount = stats.total_original_loan_amount or Decimal(0)
+    total_current_loan_balance = stats.total_current_loan_balance or Decimal(0)
     total_amortisation = total_original_loan_amount - total_current_loan_balance
 
     # Calculate percentage amortised
@@ -499,90 +530,85 @@ def generate_amortised_loan_balances(
         else Decimal(0)
     )
 
-    # Group loans by amortisation percentage
     amortisation_ranges = {
-        "0-20%": Decimal(0),
-        "21-40%": Decimal(0),
-        "41-60%": Decimal(0),
-        "61-80%": Decimal(0),
-        "81-100%": Decimal(0),
+        "0-20%": Decimal(stats.pct_20 or 0),
+        "21-40%": Decimal(stats.pct_40 or 0),
+        "41-60%": Decimal(stats.pct_60 or 0),
+        "61-80%": Decimal(stats.pct_80 or 0),
+        "81-100%": Decimal(stats.pct_100 or 0),
     }
 
-    for loan in loans:
-        if (
-            loan.loan_amount
-            and loan.loan_amount > Decimal(0)
-            and loan.outstanding_loan_balance is not None
-        ):
-            amortised_amount = loan.loan_amount - loan.outstanding_loan_balance
-            amortised_percent = (amortised_amount / loan.loan_amount) * Decimal(100)
-
-            if amortised_percent <= Decimal(20):
-                amortisation_ranges["0-20%"] += Decimal(1)
-            elif amortised_percent <= Decimal(40):
-                amortisation_ranges["21-40%"] += Decimal(1)
-            elif amortised_percent <= Decimal(60):
-                amortisation_ranges["41-60%"] += Decimal(1)
-            elif amortised_percent <= Decimal(80):
-                amortisation_ranges["61-80%"] += Decimal(1)
-            else:
-                amortisation_ranges["81-100%"] += Decimal(1)
+    # Top 50 loans by amortised percentage (descending)
+    sort_percent = case((Loan.loan_amount > 0, amortised_percent), else_=0)
+    top_loans = (
+        db.query(
+            Loan.id,
+            Loan.loan_no,
+            Loan.loan_amount,
+            Loan.outstanding_loan_balance,
+            Loan.loan_term,
+            Loan.loan_issue_date,
+            Loan.principal_due,
+        )
+        .filter(
+            Loan.portfolio_id == portfolio_id,
+            Loan.loan_term.isnot(None),
+            Loan.loan_term != 0,
+            Loan.loan_issue_date.isnot(None),
+            Loan.outstanding_loan_balance.isnot(None),
+            Loan.outstanding_loan_balance != 0,
+        )
+        .order_by(sort_percent.desc())
+        .limit(50)
+        .all()
+    )
 
     # Calculate expected final amortisation dates
     loan_status = []
-    for loan in loans:
-        if loan.loan_term and loan.loan_issue_date and loan.outstanding_loan_balance:
-            # Calculate expected end date
-            expected_end_date = loan.loan_issue_date + timedelta(
-                days=Decimal(30) * loan.loan_term
-            )
+    for loan in top_loans:
+        expected_end_date = loan.loan_issue_date + timedelta(days=30 * loan.loan_term)
 
-            # Calculate days remaining
-            if expected_end_date > report_date:
-                days_remaining = (expected_end_date - report_date).days
-            else:
-                days_remaining = Decimal(0)
-
-            # Calculate expected monthly amortisation
-            monthly_amortisation = (
-                loan.principal_due
-                if loan.principal_due
-                else (loan.loan_amount / loan.loan_term if loan.loan_term > Decimal(0) else Decimal(0))
-            )
+        # Calculate days remaining
+        if expected_end_date > report_date:
+            days_remaining = (expected_end_date - report_date).days
+        else:
+            days_remaining = 0
 
-            loan_status.append(
-                {
-                    "loan_id": loan.id,
-                    "loan_no": loan.loan_no,
-                    "original_amount": loan.loan_amount,
-                    "current_balance": loan.outstanding_loan_balance,
-                    "amortised_amount": (
-                        loan.loan_amount - loan.outstanding_loan_balance
-                        if loan.loan_amount
-                        else Decimal(0)
-                    ),
-                    "amortised_percent": round(
+        # Calculate expected monthly amortisation
+        monthly_amortisation = (
+            loan.principal_due
+            if loan.principal_due
+            else (loan.loan_amount / loan.loan_term if loan.loan_term > 0 else Decimal(0))
+        )
+
+        loan_status.append(
+            {
+                "loan_id": loan.id,
+                "loan_no": loan.loan_no,
+                "original_amount": loan.loan_amount,
+                "current_balance": loan.outstanding_loan_balance,
+                "amortised_amount": (
+                    loan.loan_amount - loan.outstanding_loan_balance
+                    if loan.loan_amount
+                    else Decimal(0)
+                ),
+                "amortised_percent": round(
+                    (
                         (
-                            (
-                                (loan.loan_amount - loan.outstanding_loan_balance)
-                                / loan.loan_amount
-                                * Decimal(100)
-                            )
-                            if loan.loan_amount and loan.loan_amount > Decimal(0)
-                            else Decimal(0)
-                        ),
-                        2,
+                            (loan.loan_amount - loan.outstanding_loan_balance)
+                            / loan.loan_amount
+                            * Decimal(100)
+                        )
+                        if loan.loan_amount and loan.loan_amount > Decimal(0)
+                        else Decimal(0)
                     ),
-                    "expected_end_date": expected_end_date.isoformat(),
-                    "days_remaining": days_remaining,
-                    "monthly_amortisation": monthly_amortisation,
-                }
-            )
-
-    # Sort by amortised percentage (descending)
-    loan_status = sorted(
-        loan_status, key=lambda x: x["amortised_percent"], reverse=True
-    )
+                    2,
+                ),
+                "expected_end_date": expected_end_date.isoformat(),
+                "days_remaining": days_remaining,
+                "monthly_amortisation": monthly_amortisation,
+            }
+        )
 
     return {
         "total_original_loan_amount": total_original_loan_amount,
@@ -590,8 +616,8 @@ def generate_amortised_loan_balances(
         "total_amortisation": total_amortisation,
         "percent_amortised": round(percent_amortised, 2),
         "amortisation_distribution": amortisation_ranges,
-        "loan_status": loan_status[:50],  # Limit to top 50 loans
-        "total_loans_analyzed": len(loans),
+        "loan_status": loan_status,
+        "total_loans_analyzed": stats.total_loans or 0,
         "reporting_date": report_date.isoformat(),
         "note": "This report does not consider the BOG non-accrual rule.",
     }
@@ -603,90 +629,68 @@ def generate_probability_default_report(
     """
     Generate a report on probability of default for the portfolio.
     """
-    # Get all loans in the portfolio
-    loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
+    import numpy as np
+    from app.utils.distribution_stats import to_array, summary_stats, bucket_counts, top_n_indices
+
+    # Get the columns the report needs for all loans in the portfolio
+    loans = (
+        db.query(
+            Loan.id,
+            Loan.loan_no,
+            Loan.employee_id,
+            Loan.ndia,
+            Loan.outstanding_loan_balance,
+        )
+        .filter(Loan.portfolio_id == portfolio_id)
+        .all()
+    )
 
-    # Calculate PD for each loan
-    loan_pds = []
-    pd_values = []
+    # Load PD inputs for every borrower once
+    risk_inputs = load_portfolio_risk_inputs(db, portfolio_id)
 
-    for loan in loans:
-        ndia = loan.ndia or Decimal(0)
-        pd = calculate_probability_of_default(loan, db)
-        pd_values.append(pd)
-
-        loan_pds.append(
-            {
-                "loan_id": loan.id,
-                "loan_no": loan.loan_no,
-                "employee_id": loan.employee_id,
-                "ndia": ndia,
-                "pd": round(pd, 4),
-                "outstanding_balance": loan.outstanding_loan_balance,
-            }
-        )
+    # Build PD and balance columns
+    pd_values = np.array([risk_inputs.get_pd(loan.employee_id) for loan in loans], dtype=float)
+    balances = to_array([loan.outstanding_loan_balance for loan in loans])
 
     # Calculate PD statistics
-    if pd_values:
-        avg_pd = sum(pd_values) / len(pd_values)
-        min_pd = min(pd_values)
-        max_pd = max(pd_values)
-        median_pd = sorted(pd_values)[len(pd_values) // 2]
-    else:
-        avg_pd = min_pd = max_pd = median_pd = Decimal(0)
+    pd_stats = summary_stats(pd_values)
 
     # Group loans by PD ranges
-    pd_ranges = {
-        "0-10%": Decimal(0),
-        "11-25%": Decimal(0),
-        "26-50%": Decimal(0),
-        "51-75%": Decimal(0),
-        "76-90%": Decimal(0),
-        "91-100%": Decimal(0),
-    }
-
-    weighted_pd_sum = Decimal(0)
-    total_outstanding_balance = Decimal(0)
-
-    for loan_pd in loan_pds:
-        pd_percent = loan_pd["pd"] * Decimal(100)
-        outstanding_balance = loan_pd["outstanding_balance"] or Decimal(0)
-
-        # Add to weighted PD calculation
-        weighted_pd_sum += loan_pd["pd"] * outstanding_balance
-        total_outstanding_balance += outstanding_balance
-
-        if pd_percent <= Decimal(10):
-            pd_ranges["0-10%"] += Decimal(1)
-        elif pd_percent <= Decimal(25):
-            pd_ranges["11-25%"] += Decimal(1)
-        elif pd_percent <= Decimal(50):
-            pd_ranges["26-50%"] += Decimal(1)
-        elif pd_percent <= Decimal(75):
-            pd_ranges["51-75%"] += Decimal(1)
-        elif pd_percent <= Decimal(90):
-            pd_ranges["76-90%"] += Decimal(1)
-        else:
-            pd_ranges["91-100%"] += Decimal(1)
+    pd_ranges = bucket_counts(
+        pd_values * 100,
+        [10, 25, 50, 75, 90],
+        ["0-10%", "11-25%", "26-50%", "51-75%", "76-90%", "91-100%"],
+    )
 
     # Calculate portfolio weighted PD
+    total_outstanding_balance = balances.sum()
     weighted_portfolio_pd = (
-        weighted_pd_sum / total_outstanding_balance
-        if total_outstanding_balance > Decimal(0)
-        else Decimal(0)
+        float(np.dot(pd_values, balances) / total_outstanding_balance)
+        if total_outstanding_balance > 0
+        else 0.0
     )
 
-    # Sort loans by PD (descending)
-    loan_pds = sorted(loan_pds, key=lambda x: x["pd"], reverse=True)
+    # Top 25 highest PD loans
+    high_risk_loans = [
+        {
+            "loan_id": loans[i].id,
+            "loan_no": loans[i].loan_no,
+            "employee_id": loans[i].employee_id,
+            "ndia": loans[i].ndia or Decimal(0),
+            "pd": round(float(pd_values[i]), 4),
+            "outstanding_balance": loans[i].outstanding_loan_balance,
+        }
+        for i in top_n_indices(pd_values, 25)
+    ]
 
     return {
-        "average_pd": round(avg_pd, 4),
-        "min_pd": round(min_pd, 4),
-        "max_pd": round(max_pd, 4),
-        "median_pd": round(median_pd, 4),
+        "average_pd": round(pd_stats["mean"], 4),
+        "min_pd": round(pd_stats["min"], 4),
+        "max_pd": round(pd_stats["max"], 4),
+        "median_pd": round(pd_stats["median"], 4),
         "weighted_portfolio_pd": round(weighted_portfolio_pd, 4),
         "pd_distribution": pd_ranges,
-        "high_risk_loans": loan_pds[:25],  # Top 25 highest PD loans
+        "high_risk_loans": high_risk_loans,
         "total_loans_analyzed": len(loans),
         "reporting_date": report_date.isoformat(),
     }
@@ -698,100 +702,58 @@ def generate_exposure_default_report(
     """
     Generate a report on exposure at default for the portfolio.
     """
+    from app.utils.distribution_stats import to_array, summary_stats, bucket_counts, top_n_indices
+
     # Get all loans in the portfolio
     loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
 
-    # Calculate EAD for each loan
-    loan_eads = []
-    ead_values = []
-
-    for loan in loans:
-        ead_percentage = calculate_exposure_at_default_percentage(loan, report_date)
-        ead_values.append(ead_percentage)
-
-        # Calculate actual EAD amount
-        ead_amount = (
-            loan.outstanding_loan_balance * ead_percentage
-            if loan.outstanding_loan_balance
-            else Decimal(0)
-        )
-
-        loan_eads.append(
-            {
-                "loan_id": loan.id,
-                "loan_no": loan.loan_no,
-                "employee_id": loan.employee_id,
-                "outstanding_balance": loan.outstanding_loan_balance,
-                "ead_percentage": round(ead_percentage, 4),
-                "ead_amount": ead_amount,
-            }
-        )
+    # Calculate EAD once per loan
+    ead_values = to_array(
+        [calculate_exposure_at_default_percentage(loan, report_date) for loan in loans]
+    )
+    balances = to_array([loan.outstanding_loan_balance for loan in loans])
+    ead_amounts = balances * ead_values
 
     # Calculate EAD statistics
-    if ead_values:
-        avg_ead = sum(ead_values) / len(ead_values)
-        min_ead = min(ead_values)
-        max_ead = max(ead_values)
-        median_ead = sorted(ead_values)[len(ead_values) // 2]
-    else:
-        avg_ead = min_ead = max_ead = median_ead = Decimal(0)
+    ead_stats = summary_stats(ead_values)
 
     # Calculate total EAD
-    total_outstanding_balance = sum(
-        loan.outstanding_loan_balance or Decimal(0) for loan in loans
-    )
-    total_ead = sum(
-        (loan.outstanding_loan_balance or Decimal(0))
-        * calculate_exposure_at_default_percentage(loan, report_date)
-        for loan in loans
-    )
+    total_outstanding_balance = float(balances.sum())
+    total_ead = float(ead_amounts.sum())
 
     # Group loans by EAD percentage ranges
-    ead_ranges = {
-        "0-80%": Decimal(0),
-        "81-90%": Decimal(0),
-        "91-95%": Decimal(0),
-        "96-99%": Decimal(0),
-        "100%": Decimal(0),
-        "100%+": Decimal(0),
-    }
-
-    for loan_ead in loan_eads:
-        ead_percentage = loan_ead["ead_percentage"] * Decimal(100)
-
-        if ead_percentage <= Decimal(80):
-            ead_ranges["0-80%"] += Decimal(1)
-        elif ead_percentage <= Decimal(90):
-            ead_ranges["81-90%"] += Decimal(1)
-        elif ead_percentage <= Decimal(95):
-            ead_ranges["91-95%"] += Decimal(1)
-        elif ead_percentage <= Decimal(99):
-            ead_ranges["96-99%"] += Decimal(1)
-        elif ead_percentage <= Decimal(100):
-            ead_ranges["100%"] += Decimal(1)
-        else:
-            ead_ranges["100%+"] += Decimal(1)
+    ead_ranges = bucket_counts(
+        ead_values * 100,
+        [80, 90, 95, 99, 100],
+        ["0-80%", "81-90%", "91-95%", "96-99%", "100%", "100%+"],
+    )
 
-    # Sort loans by EAD amount (descending)
-    loan_eads = sorted(loan_eads, key=lambda x: x["ead_amount"], reverse=True)
+    # Top 25 highest exposure loans
+    highest_exposure_loans = [
+        {
+            "loan_id": loans[i].id,
+            "loan_no": loans[i].loan_no,
+            "employee_id": loans[i].employee_id,
+            "outstanding_balance": loans[i].outstanding_loan_balance,
+            "ead_percentage": round(float(ead_values[i]), 4),
+            "ead_amount": float(ead_amounts[i]),
+        }
+        for i in top_n_indices(ead_amounts, 25)
+    ]
 
     return {
-        "average_ead_percentage": round(avg_ead, 4),
-        "min_ead_percentage": round(min_ead, 4),
-        "max_ead_percentage": round(max_ead, 4),
-        "median_ead_percentage": round(median_ead, 4),
+        "average_ead_percentage": round(ead_stats["mean"], 4),
+        "min_ead_percentage": round(ead_stats["min"], 4),
+        "max_ead_percentage": round(ead_stats["max"], 4),
+        "median_ead_percentage": round(ead_stats["median"], 4),
         "total_outstanding_balance": total_outstanding_balance,
         "total_ead": total_ead,
         "ead_to_outstanding_ratio": round(
-            (
-                total_ead / total_outstanding_balance
-                if total_outstanding_balance > Decimal(0)
-                else Decimal(0)
-            ),
+            total_ead / total_outstanding_balance if total_outstanding_balance > 0 else 0.0,
             4,
         ),
         "ead_distribution": ead_ranges,
-        "highest_exposure_loans": loan_eads[:25],  # Top 25 highest exposure loans
+        "highest_exposure_loans": highest_exposure_loans,
         "total_loans_analyzed": len(loans),
         "reporting_date": report_date.isoformat(),
     }
@@ -803,39 +765,23 @@ def generate_loss_given_default_report(
     """
     Generate a report on loss given default for the portfolio.
     """
+    import numpy as np
+    from app.utils.distribution_stats import summary_stats
+
     # Get all loans in the portfolio
     loans = db.query(Loan).filter(Loan.portfolio_id == portfolio_id).all()
 
-    # Get client IDs for these loans
-    employee_ids = [loan.employee_id for loan in loans if loan.employee_id]
-
-    # Get clients
-    clients = (
-        db.query(Client)
-        .filter(Client.portfolio_id == portfolio_id)
-        .filter(Client.employee_id.in_(employee_ids))
-        .all()
-    )
-
-    # Map client IDs to their database IDs
-    client_id_map = {client.employee_id: client.id for client in clients}
-
-    # Get securities for all clients
-    client_securities = {}
-    for employee_id in employee_ids:
-        if employee_id in client_id_map:
-            client_id = client_id_map[employee_id]
-            securities = (
-                db.query(Security).filter(Security.client_id == client_id).all()
-            )
-            client_securities[employee_id] = securities
+    # Load client and security inputs in a fixed number of queries
+    risk_inputs = load_portfolio_risk_inputs(db, portfolio_id)
 
     # Calculate LGD for each loan
     loan_lgds = []
     lgd_values = []
+    total_outstanding_balance = Decimal(0)
+    total_expected_loss = Decimal(0)
 
     for loan in loans:
-        securities = client_securities.get(loan.employee_id, [])
+        securities = risk_inputs.get_securities(loan.employee_id)
         lgd = calculate_loss_given_default(loan, securities)
         lgd_values.append(lgd)
 
@@ -845,9 +791,11 @@ def generate_loss_given_default_report(
             if loan.outstanding_loan_balance
             else Decimal(0)
         )
+        total_outstanding_balance += loan.outstanding_loan_balance or Decimal(0)
+        total_expected_loss += expected_loss
 
         # Calculate security value
-        security_value = sum(security.security_value or Decimal(0) for security in securities)
+        security_value = risk_inputs.get_security_value(loan.employee_id)
 
         loan_lgds.append(
             {
@@ -862,27 +810,11 @@ def generate_loss_given_default_report(
         )
 
     # Calculate LGD statistics
-    if lgd_values:
-        avg_lgd = sum(lgd_values) / len(lgd_values)
-        min_lgd = min(lgd_values)
-        max_lgd = max(lgd_values)
-        median_lgd = sorted(lgd_values)[len(lgd_values) // 2]
-    else:
-        avg_lgd = min_lgd = max_lgd = median_lgd = Decimal(0)
-
-    # Calculate total expected loss
-    total_outstanding_balance = sum(
-        loan.outstanding_loan_balance or Decimal(0) for loan in loans
-    )
-    total_expected_loss = sum(
-        Decimal(loan.outstanding_loan_balance or Decimal(0))
-        * Decimal(
-            calculate_loss_given_default(
-                loan, client_securities.get(loan.employee_id, [])
-            )
-        )
-        for loan in loans
-    )
+    lgd_stats = summary_stats(np.array(lgd_values, dtype=float))
+    avg_lgd = lgd_stats["mean"]
+    min_lgd = lgd_stats["min"]
+    max_lgd = lgd_stats["max"]
+    median_lgd = lgd_stats["median"]
 
     # Group loans by LGD ranges
     lgd_ranges = {"0-20%": Decimal(0), "21-40%": Decimal(0), "41-60%": Decimal(0), "61-80%": Decimal(0), "81-100%": Decimal(0)}
@@ -944,6 +876,8 @@ def generate_ecl_detailed_report(
     Memory-optimized version for servers with limited memory (2GB).
     Includes all loans while minimizing memory usage.
     """
+    from app.utils.excel_generator import create_report_excel as create_excel_file
+
     start_time = time.time()
     print(f"Starting ECL detailed report for portfolio {portfolio_id}")
     
@@ -970,27 +904,9 @@ def generate_ecl_detailed_report(
     total_loan_count = db.query(func.count(Loan.id)).filter(Loan.portfolio_id == portfolio_id).scalar()
     print(f"Portfolio has {total_loan_count} loans to process")
     
-    # OPTIMIZATION 2: Preload all client data in a single query
-    print("Preloading client data...")
-    client_map = {}
-    # Process in batches to avoid memory issues with very large datasets
-    client_batch_size = 5000
-    for offset in range(0, total_loan_count, client_batch_size):
-        # Get employee IDs for this batch
-        employee_ids_subq = db.query(Loan.employee_id).filter(
-            Loan.portfolio_id == portfolio_id
-        ).distinct().offset(offset).limit(client_batch_size).subquery()
-        
-        # Get clients in a single query
-        clients = db.query(Client).filter(
-            Client.employee_id.in_(employee_ids_subq)
-        ).all()
-        
-        # Build client map
-        for client in clients:
-            if client.employee_id:
-                name = f"{client.last_name or ''} {client.other_names or ''}".strip()
-                client_map[client.employee_id] = name if name else "Unknown"
+    # OPTIMIZATION 2: Preload client, security and PD inputs in a fixed number of queries
+    print("Preloading client, security and PD inputs...")
+    risk_inputs = load_portfolio_risk_inputs(db, portfolio_id)
     
     # OPTIMIZATION 3: Preload staging data with O(1) lookup
     print("Preloading staging data...")
@@ -1021,46 +937,20 @@ def generate_ecl_detailed_report(
             if loan_id and stage:
                 loan_stage_map[loan_id] = stage
     
-    # OPTIMIZATION 4: Preload all securities data with a join
-    print("Preloading securities data...")
-    security_map = {}
-    # Process in batches to avoid memory issues with very large datasets
-    security_batch_size = 5000
-    for offset in range(0, total_loan_count, security_batch_size):
-        # Get employee IDs for this batch
-        employee_ids_subq = db.query(Loan.employee_id).filter(
-            Loan.portfolio_id == portfolio_id
-        ).distinct().offset(offset).limit(security_batch_size).subquery()
-        
-        # Get securities with client data in a single query
-        securities_with_clients = (
-            db.query(Security, Client.employee_id)
-            .join(Client, Security.client_id == Client.id)
-            .filter(Client.employee_id.in_(employee_ids_subq))
-            .all()
-        )
-        
-        # Group securities by employee_id for O(1) lookup
-        for security, employee_id in securities_with_clients:
-            if employee_id:
-                if employee_id not in security_map:
-                    security_map[employee_id] = []
-                security_map[employee_id].append(security)
-    
-    # OPTIMIZATION 5: Process loans in larger batches
+    # OPTIMIZATION 4: Process loans in larger batches
     batch_size = 2000  # Larger batch size for better throughput
     
     # Calculate number of batches
     num_batches = (total_loan_count + batch_size - 1) // batch_size
     print(f"Processing {num_batches} batches of {batch_size} loans each")
     
-    # OPTIMIZATION 6: Stream process with running totals
+    # OPTIMIZATION 5: Stream process with running totals
     # Initialize totals
     total_ead = 0.0
     total_lgd = 0.0
     total_ecl = 0.0
     
-    # OPTIMIZATION 7: Use a streaming JSON writer to avoid memory issues
+    # OPTIMIZATION 6: Use a streaming JSON writer to avoid memory issues
     import tempfile
     import json
     import os
@@ -1084,42 +974,33 @@ def generate_ecl_detailed_report(
             Loan.portfolio_id == portfolio_id
         ).order_by(Loan.id).offset(offset).limit(batch_size).all()
         
-        # OPTIMIZATION 8: Parallel processing for independent calculations
+        # OPTIMIZATION 7: Parallel processing for independent calculations
         from concurrent.futures import ThreadPoolExecutor
         
         def process_loan(loan):
             try:
                 # Convert to float early to reduce decimal overhead
-                loan_amount = float(loan.loan_amount) if loan.loan_amount else 0.0
-                admin_fees = float(loan.administrative_fees) if loan.administrative_fees else 0.0
-                loan_term = int(loan.loan_term) if loan.loan_term else 0
-                monthly_payment = float(loan.monthly_installment) if loan.monthly_installment else 0.0
                 outstanding_balance = float(loan.outstanding_loan_balance) if loan.outstanding_loan_balance else 0.0
                 
                 # Get stage using O(1) lookup
                 stage = loan_stage_map.get(loan.id, "Stage 1")  # Default to Stage 1
                 
                 # Get securities using O(1) lookup
-                securities = security_map.get(loan.employee_id, [])
+                securities = risk_inputs.get_securities(loan.employee_id)
                 
                 # Calculate values
-                pd_value = calculate_probability_of_default(loan, db)
+                pd_value = risk_inputs.get_pd(loan.employee_id)
                 lgd = calculate_loss_given_default(loan, securities)
                 ead = calculate_exposure_at_default_percentage(loan, report_date)
                 
-                # Calculate EIR
-                eir = calculate_effective_interest_rate_lender(
-                    loan_amount=loan_amount,
-                    administrative_fees=admin_fees,
-                    loan_term=loan_term,
-                    monthly_payment=monthly_payment
-                )
+                # Read EIR stored at ingestion
+                eir = get_effective_interest_rate(loan)
                 
                 # Calculate ECL
                 ecl = float(ead) * float(pd_value) * float(lgd) / 100.0
                 
                 # Get client name using preloaded map
-                client_name = client_map.get(loan.employee_id, "Unknown")
+                client_name = risk_inputs.get_client_name(loan.employee_id)
                 
                 # Create loan entry
                 loan_entry = {
@@ -1180,7 +1061,7 @@ def generate_ecl_detailed_report(
     temp_file.write('\n]')
     temp_file.close()
     
-    # OPTIMIZATION 9: Create a streaming iterator for the Excel generator
+    # OPTIMIZATION 8: Create a streaming iterator for the Excel generator
     class StreamingLoanDataIterator:
         def __init__(self, file_path):
             self.file_path = file_path
@@ -1369,6 +1250,8 @@ def generate_local_impairment_details_report(
     Returns:
         Dict containing the report data
     """
+    from app.utils.excel_generator import create_report_excel as create_excel_file
+
     start_time = time.time()
     print(f"Starting local impairment details report for portfolio {portfolio_id}")
     
@@ -1435,53 +1318,9 @@ def generate_local_impairment_details_report(
     total_loan_count = db.query(func.count(Loan.id)).filter(Loan.portfolio_id == portfolio_id).scalar()
     print(f"Portfolio has {total_loan_count} loans to process")
     
-    # OPTIMIZATION 4: Preload all client data in a single query
-    print("Preloading client data...")
-    client_map = {}
-    # Process in batches to avoid memory issues with very large datasets
-    client_batch_size = 5000
-    for offset in range(0, total_loan_count, client_batch_size):
-        # Get employee IDs for this batch
-        employee_ids_subq = db.query(Loan.employee_id).filter(
-            Loan.portfolio_id == portfolio_id
-        ).distinct().offset(offset).limit(client_batch_size).subquery()
-        
-        # Get clients in a single query
-        clients = db.query(Client).filter(
-            Client.employee_id.in_(employee_ids_subq)
-        ).all()
-        
-        # Build client map
-        for client in clients:
-            if client.employee_id:
-                name = f"{client.last_name or ''} {client.other_names or ''}".strip()
-                client_map[client.employee_id] = name if name else "Unknown"
-    
-    # OPTIMIZATION 5: Preload all securities data with a join
-    print("Preloading securities data...")
-    security_map = {}
-    # Process in batches to avoid memory issues with very large datasets
-    security_batch_size = 5000
-    for offset in range(0, total_loan_count, security_batch_size):
-        # Get employee IDs for this batch
-        employee_ids_subq = db.query(Loan.employee_id).filter(
-            Loan.portfolio_id == portfolio_id
-        ).distinct().offset(offset).limit(security_batch_size).subquery()
-        
-        # Get securities with client data in a single query
-        securities_with_clients = (
-            db.query(Security, Client.employee_id)
-            .join(Client, Security.client_id == Client.id)
-            .filter(Client.employee_id.in_(employee_ids_subq))
-            .all()
-        )
-        
-        # Group securities by employee_id for O(1) lookup
-        for security, employee_id in securities_with_clients:
-            if employee_id:
-                if employee_id not in security_map:
-                    security_map[employee_id] = []
-                security_map[employee_id].append(security)
+    # OPTIMIZATION 4: Preload client and security inputs in a fixed number of queries
+    print("Preloading client and security data...")
+    risk_inputs = load_portfolio_risk_inputs(db, portfolio_id)
     
     # Initialize category totals
     category_totals = {
@@ -1492,14 +1331,14 @@ def generate_local_impairment_details_report(
         "Loss": {"count": 0, "balance": 0.0, "provision": 0.0}
     }
     
-    # OPTIMIZATION 6: Process loans in larger batches
+    # OPTIMIZATION 5: Process loans in larger batches
     batch_size = 2000  # Increased batch size for better throughput
     
     # Calculate number of batches
     num_batches = (total_loan_count + batch_size - 1) // batch_size
     print(f"Processing {num_batches} batches of {batch_size} loans each")
     
-    # OPTIMIZATION 7: Write loan data directly to a temporary file to avoid keeping it all in memory
+    # OPTIMIZATION 6: Write loan data directly to a temporary file to avoid keeping it all in memory
     import tempfile
     import json
     import os
@@ -1523,7 +1362,7 @@ def generate_local_impairment_details_report(
             Loan.portfolio_id == portfolio_id
         ).order_by(Loan.id).offset(offset).limit(batch_size).all()
         
-        # OPTIMIZATION 8: Parallel processing for independent calculations
+        # OPTIMIZATION 7: Parallel processing for independent calculations
         from concurrent.futures import ThreadPoolExecutor
         
         def process_loan(loan):
@@ -1538,7 +1377,7 @@ def generate_local_impairment_details_report(
                 provision_rate = provision_rates.get(category, 0.01)  # Default to 1% if category not found
                 
                 # Get securities using O(1) lookup
-                securities = security_map.get(loan.employee_id, [])
+                securities = risk_inputs.get_securities(loan.employee_id)
                 
                 # Calculate LGD for more accurate provision
                 lgd = calculate_loss_given_default(loan, securities) / 100.0  # Convert to decimal
@@ -1547,7 +1386,7 @@ def generate_local_impairment_details_report(
                 provision_amount = outstanding_balance * provision_rate * lgd
                 
                 # Get client name using preloaded map
-                client_name = client_map.get(loan.employee_id, "Unknown")
+                client_name = risk_inputs.get_client_name(loan.employee_id)
                 
                 # Create loan entry
                 loan_entry = {
@@ -1609,7 +1448,7 @@ def generate_local_impairment_details_report(
     temp_file.write('\n]')
     temp_file.close()
     
-    # OPTIMIZATION 9: Create a streaming iterator for the Excel generator
+    # OPTIMIZATION 8: Create a streaming iterator for the Excel generator
     class StreamingLoanDataIterator:
         def __init__(self, file_path):
             self.file_path = file_path
@@ -1774,6 +1613,41 @@ def generate_local_impairment_report_summarised(
     }
 
 
+def latest_calculation_summaries(
+    db: Session, calculation_types: List[str], portfolio_ids: List[int]
+) -> Dict[Tuple[int, str], Any]:
+    """
+    Result summary of the latest calculation of each type for each of the
+    portfolios, keyed by (portfolio_id, calculation_type), in one query.
+
+    Ordering every DISTINCT ON key descending lets Postgres read the
+    (portfolio_id, calculation_type, created_at) index backwards instead of
+    sorting.
+    """
+    latest_results = (
+        db.query(
+            CalculationResult.portfolio_id,
+            CalculationResult.calculation_type,
+            CalculationResult.result_summary,
+        )
+        .filter(
+            CalculationResult.portfolio_id.in_(portfolio_ids),
+            CalculationResult.calculation_type.in_(calculation_types),
+        )
+        .distinct(CalculationResult.portfolio_id, CalculationResult.calculation_type)
+        .order_by(
+            CalculationResult.portfolio_id.desc(),
+            CalculationResult.calculation_type.desc(),
+            CalculationResult.created_at.desc(),
+        )
+        .all()
+    )
+    return {
+        (result.portfolio_id, result.calculation_type): result.result_summary
+        for result in latest_results
+    }
+
+
 def generate_journal_report(
     db: Session, portfolio_ids: List[int], report_date: date
 ) -> Dict[str, Any]:
@@ -1797,54 +1671,44 @@ def generate_journal_report(
     total_local_impairment = 0
     total_risk_reserve = 0
     
-    # Get all portfolios
-    all_portfolios = db.query(Portfolio).all()
+    # Get all portfolios with the account information the journal needs,
+    # reading only the columns it uses
+    all_portfolios = db.query(
+        Portfolio.id,
+        Portfolio.name,
+        Portfolio.ecl_impairment_account,
+        Portfolio.loan_assets,
+        Portfolio.credit_risk_reserve,
+    ).all()
+    journal_portfolios = [
+        portfolio for portfolio in all_portfolios
+        if portfolio.ecl_impairment_account and portfolio.loan_assets and portfolio.credit_risk_reserve
+    ]
+    
+    # Latest ECL and local impairment result of each of them in one query
+    latest_summaries = latest_calculation_summaries(
+        db, ["ecl", "local_impairment"], [portfolio.id for portfolio in journal_portfolios]
+    ) if journal_portfolios else {}
     
-    for portfolio in all_portfolios:
+    for portfolio in journal_portfolios:
         portfolio_id = portfolio.id
         
-        # Skip portfolios without required account information
-        if not portfolio.ecl_impairment_account or not portfolio.loan_assets or not portfolio.credit_risk_reserve:
-            continue
-        
         try:
-            # Get the latest ECL calculation
-            ecl_calculation = (
-                db.query(CalculationResult)
-                .filter(
-                    CalculationResult.portfolio_id == portfolio_id,
-                    CalculationResult.calculation_type == "ecl"
-                )
-                .order_by(CalculationResult.created_at.desc())
-                .first()
-            )
-            
-            if not ecl_calculation:
+            ecl_summary = latest_summaries.get((portfolio_id, "ecl"))
+            if ecl_summary is None:
                 continue  # Skip portfolios without ECL calculations
             
-            # Get the latest local impairment calculation
-            local_calculation = (
-                db.query(CalculationResult)
-                .filter(
-                    CalculationResult.portfolio_id == portfolio_id,
-                    CalculationResult.calculation_type == "local_impairment"
-                )
-                .order_by(CalculationResult.created_at.desc())
-                .first()
-            )
-            
-            if not local_calculation:
+            local_summary = latest_summaries.get((portfolio_id, "local_impairment"))
+            if local_summary is None:
                 continue  # Skip portfolios without local impairment calculations
             
             # Extract total ECL from ECL calculation
-            ecl_summary = ecl_calculation.result_summary
             portfolio_ecl = 0
             for stage_key in ["Stage 1", "Stage 2", "Stage 3"]:
                 stage_data = ecl_summary.get(stage_key, {})
                 portfolio_ecl += stage_data.get("provision_amount", 0)
             
             # Extract total local impairment from local impairment calculation
-            local_summary = local_calculation.result_summary
             portfolio_local_impairment = 0
             for category in ["Current", "OLEM", "Substandard", "Doubtful", "Loss"]:
                 category_data = local_summary.get(category, {})
@@ -1934,6 +1798,8 @@ def generate_report_pdf(
     Returns:
         bytes: PDF file as bytes
     """
+    from app.utils.pdf_generator import create_report_pdf
+
     portfolio_name = get_portfolio_name(db, portfolio_id)
 
     # Generate the PDF
@@ -1967,6 +1833,8 @@ def generate_report_excel(
     Returns:
         bytes: Excel file as bytes
     """
+    from app.utils.excel_generator import create_report_excel as create_excel_file
+
     portfolio_name = get_portfolio_name(db, portfolio_id)
 
     # Generate the Excel file
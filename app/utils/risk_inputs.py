@@ -0,0 +1,102 @@
+import logging
+from decimal import Decimal
+from typing import Dict, List, Any, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Client, Security
+from app.calculators.ecl import predict_probability_of_default
+
+logger = logging.getLogger(__name__)
+
+
+class PortfolioRiskInputs:
+    """
+    Client, security and PD inputs for every borrower in a portfolio,
+    keyed by employee_id so per-loan lookups are O(1).
+    """
+
+    def __init__(
+        self,
+        clients: Dict[str, Any],
+        securities: Dict[str, List[Any]],
+        pd_values: Dict[str, float],
+    ):
+        self.clients = clients
+        self.securities = securities
+        self.pd_values = pd_values
+
+    def get_client_name(self, employee_id: Optional[str]) -> str:
+        client = self.clients.get(employee_id)
+        if not client:
+            return "Unknown"
+        name = f"{client.last_name or ''} {client.other_names or ''}".strip()
+        return name if name else "Unknown"
+
+    def get_securities(self, employee_id: Optional[str]) -> List[Any]:
+        return self.securities.get(employee_id, [])
+
+    def get_security_value(self, employee_id: Optional[str]) -> Decimal:
+        return sum(
+            (security.collateral_value or Decimal(0) for security in self.get_securities(employee_id)),
+            Decimal(0),
+        )
+
+    def get_pd(self, employee_id: Optional[str]) -> float:
+        """PD as a percentage (0-100); 0 when the client or DOB is missing."""
+        return self.pd_values.get(employee_id, 0)
+
+
+def load_portfolio_risk_inputs(db: Session, portfolio_id: int) -> PortfolioRiskInputs:
+    """
+    Load risk inputs for a portfolio with a fixed number of queries:
+    one for clients, one for securities joined to their clients, and a
+    single PD model call over the distinct birth years.
+    """
+    clients = {}
+    for client in (
+        db.query(
+            Client.id,
+            Client.employee_id,
+            Client.last_name,
+            Client.other_names,
+            Client.date_of_birth,
+        )
+        .filter(Client.portfolio_id == portfolio_id, Client.employee_id.isnot(None))
+        .all()
+    ):
+        clients[client.employee_id] = client
+
+    securities = {}
+    for security in (
+        db.query(
+            Client.employee_id,
+            Security.id,
+            Security.client_id,
+            Security.cash_or_non_cash,
+            Security.collateral_value,
+            Security.forced_sale_value,
+        )
+        .join(Client, Security.client_id == Client.id)
+        .filter(Client.portfolio_id == portfolio_id, Client.employee_id.isnot(None))
+        .all()
+    ):
+        securities.setdefault(security.employee_id, []).append(security)
+
+    # Score every distinct birth year once
+    years_by_employee = {
+        employee_id: client.date_of_birth.year
+        for employee_id, client in clients.items()
+        if client.date_of_birth and hasattr(client.date_of_birth, "year")
+    }
+    try:
+        pd_by_year = predict_probability_of_default(years_by_employee.values())
+        pd_values = {
+            employee_id: pd_by_year[year]
+            for employee_id, year in years_by_employee.items()
+        }
+    except Exception as e:
+        logger.error(f"Error calculating probability of default: {str(e)}")
+        pd_values = {employee_id: 5.0 for employee_id in years_by_employee}
+
+    return PortfolioRiskInputs(clients, securities, pd_values)
@@ -0,0 +1,149 @@
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import LoanRiskParameter
+
+# Rows upserted per statement when saving
+SAVE_BATCH_SIZE = 5000
+
+
+def fingerprint(*inputs: Any) -> str:
+    """Stable hash of the inputs a parameter is computed from."""
+    return hashlib.blake2b(repr(inputs).encode(), digest_size=16).hexdigest()
+
+
+def eir_fingerprint(loan) -> str:
+    """Contractual terms the effective interest rate is solved from."""
+    return fingerprint(loan.loan_amount, loan.administrative_fees, loan.loan_term, loan.monthly_installment)
+
+
+def pd_fingerprint(year_of_birth: Optional[int], model_version: str) -> str:
+    """The PD model's only feature, and the model that scored it."""
+    return fingerprint(year_of_birth, model_version)
+
+
+def lgd_fingerprint(loan, securities: Iterable[Any]) -> str:
+    """Outstanding balance and the client's collateral, in any order."""
+    collateral = sorted(
+        (str(security.cash_or_non_cash), str(security.collateral_value), str(security.forced_sale_value))
+        for security in securities
+    )
+    return fingerprint(loan.outstanding_loan_balance, tuple(collateral))
+
+
+def ead_fingerprint(loan, reporting_date: date) -> str:
+    """Terms, arrears and the reporting month, which fixes the months elapsed."""
+    return fingerprint(
+        loan.loan_amount,
+        loan.effective_interest_rate,
+        loan.administrative_fees,
+        loan.loan_term,
+        loan.monthly_installment,
+        loan.loan_issue_date,
+        loan.accumulated_arrears,
+        reporting_date.year,
+        reporting_date.month,
+    )
+
+
+# Types the parameters are computed as, other than float
+PARAMETER_TYPES = {"eir": str, "ead": Decimal}
+
+
+def _encode(value: Any) -> str:
+    return str(value) if isinstance(value, (Decimal, str)) else repr(float(value))
+
+
+def _decode(parameter: str, value: str) -> Any:
+    return PARAMETER_TYPES.get(parameter, float)(value)
+
+
+class RiskParameterMemo:
+    """
+    Per-loan risk parameters from earlier ECL runs of a portfolio, keyed on
+    loan_no and reused while the fingerprint of their inputs is unchanged.
+
+    load() reads the portfolio's stored values in one query, get() returns a
+    stored value or computes and remembers a new one, and save() upserts the
+    new values. Loans without a loan_no are always computed.
+    """
+
+    def __init__(self, db: Session, portfolio_id: int):
+        self.db = db
+        self.portfolio_id = portfolio_id
+        self.hits = 0
+        self.misses = 0
+        self._stored: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+        self._changed: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+
+    def load(self) -> "RiskParameterMemo":
+        for row in (
+            self.db.query(
+                LoanRiskParameter.loan_no,
+                LoanRiskParameter.parameter,
+                LoanRiskParameter.fingerprint,
+                LoanRiskParameter.value,
+            )
+            .filter(LoanRiskParameter.portfolio_id == self.portfolio_id)
+            .yield_per(SAVE_BATCH_SIZE)
+        ):
+            self._stored[(row.loan_no, row.parameter)] = (row.fingerprint, _decode(row.parameter, row.value))
+        return self
+
+    def get(self, loan_no: Optional[str], parameter: str, inputs_fingerprint: str, compute: Callable[[], Any]) -> Any:
+        """
+        The stored value if its fingerprint matches, otherwise compute().
+        Exceptions from compute() propagate and nothing is stored; neither
+        is a None result.
+        """
+        key = (loan_no, parameter)
+        stored = self._stored.get(key) if loan_no else None
+        if stored is not None and stored[0] == inputs_fingerprint:
+            self.hits += 1
+            return stored[1]
+
+        self.misses += 1
+        value = compute()
+        if loan_no and value is not None:
+            self._stored[key] = self._changed[key] = (inputs_fingerprint, value)
+        return value
+
+    def save(self) -> int:
+        """Upsert the values computed in this run. The caller commits."""
+        rows = [
+            {
+                "portfolio_id": self.portfolio_id,
+                "loan_no": loan_no,
+                "parameter": parameter,
+                "fingerprint": inputs_fingerprint,
+                "value": _encode(value),
+                "updated_at": datetime.utcnow(),
+            }
+            for (loan_no, parameter), (inputs_fingerprint, value) in self._changed.items()
+        ]
+        for start in range(0, len(rows), SAVE_BATCH_SIZE):
+            stmt = insert(LoanRiskParameter.__table__).values(rows[start:start + SAVE_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["portfolio_id", "loan_no", "parameter"],
+                set_={
+                    "fingerprint": stmt.excluded.fingerprint,
+                    "value": stmt.excluded.value,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            self.db.execute(stmt)
+        self._changed = {}
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
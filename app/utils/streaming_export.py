@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+# Rows fetched per round trip, and written per chunk
+BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# (header, function returning the value for a row)
+ExportColumn = Tuple[str, Callable[[Any], Any]]
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def stream_rows(
+    rows: Iterable[Any],
+    columns: Sequence[ExportColumn],
+    file_format: str = "csv",
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[str]:
+    """Write rows as CSV (with a header) or NDJSON, yielding a chunk every batch_size rows."""
+    buffer = io.StringIO()
+    if file_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _ in columns])
+
+        def write(row):
+            writer.writerow([_csv_value(value(row)) for _, value in columns])
+    else:
+        def write(row):
+            buffer.write(json.dumps({header: value(row) for header, value in columns}, default=_json_default))
+            buffer.write("\n")
+
+    for count, row in enumerate(rows, 1):
+        write(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_query(
+    build_query: Callable[[Session], Any],
+    columns: Sequence[ExportColumn],
+    file_format: str = "csv",
+    session_factory: Optional[Callable[[], Session]] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[str]:
+    """
+    Export the rows of build_query(db) as they are read from a server-side
+    cursor (yield_per), so neither the rows nor the file are held in memory.
+
+    The response body is produced after the request's session has closed,
+    so this opens its own session from session_factory, by default on the
+    background pool since a large export can hold it for minutes.
+    """
+    if session_factory is None:
+        from app.database import BackgroundSessionLocal
+
+        session_factory = BackgroundSessionLocal
+
+    db = session_factory()
+    try:
+        rows = build_query(db).yield_per(batch_size)
+        yield from stream_rows(rows, columns, file_format, batch_size)
+    finally:
+        db.close()
+
+
+def export_response(
+    build_query: Callable[[Session], Any],
+    columns: List[ExportColumn],
+    file_format: str,
+    filename: str,
+) -> StreamingResponse:
+    """StreamingResponse for stream_query, as a download named filename.<file_format>."""
+    return StreamingResponse(
+        stream_query(build_query, columns, file_format),
+        media_type=MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{file_format}"},
+    )
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Set
+
+from app.config import settings
+from app.utils.background_tasks import get_task_manager
+
+logger = logging.getLogger(__name__)
+
+
+class TaskWatcher:
+    """
+    One WebSocket watching one task.
+
+    Holds at most one pending snapshot: a newer snapshot replaces one the
+    client has not received yet, so a slow client skips intermediate
+    progress instead of building up a backlog.
+    """
+
+    def __init__(self, websocket, task_id: str):
+        self.websocket = websocket
+        self.task_id = task_id
+        self.latest: Optional[Dict[str, Any]] = None
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def offer(self, snapshot: Dict[str, Any]) -> None:
+        if self.latest is not None:
+            self.dropped += 1
+        self.latest = snapshot
+        self._ready.set()
+
+    async def next_message(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """The latest snapshot, or None if nothing arrived within timeout."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        snapshot, self.latest = self.latest, None
+        return snapshot
+
+
+class TaskBroadcaster:
+    """
+    Fans task updates out to WebSocket watchers.
+
+    Each watched task has a single subscription on the task manager. An
+    update only replaces each watcher's pending snapshot; sending happens
+    in one coroutine per connection, so a slow client never delays others.
+    """
+
+    def __init__(self):
+        self.watchers: Dict[str, Set[TaskWatcher]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add(self, websocket, task_id: str) -> TaskWatcher:
+        self._loop = asyncio.get_running_loop()
+        watcher = TaskWatcher(websocket, task_id)
+        watchers = self.watchers.get(task_id)
+        if watchers is None:
+            watchers = self.watchers[task_id] = set()
+            get_task_manager().subscribe(task_id, self._on_task_update)
+        watchers.add(watcher)
+        return watcher
+
+    def remove(self, watcher: TaskWatcher) -> None:
+        watchers = self.watchers.get(watcher.task_id)
+        if watchers is None:
+            return
+        watchers.discard(watcher)
+        if not watchers:
+            del self.watchers[watcher.task_id]
+            get_task_manager().unsubscribe(watcher.task_id, self._on_task_update)
+
+    async def _on_task_update(self, task_data: Dict[str, Any]) -> None:
+        # Updates may be published from worker threads running their own loop
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self._loop is None or running_loop is self._loop:
+            self._fan_out(task_data)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, task_data)
+
+    def _fan_out(self, task_data: Dict[str, Any]) -> None:
+        for watcher in list(self.watchers.get(task_data.get("id"), ())):
+            watcher.offer(task_data)
+
+    async def stream(self, watcher: TaskWatcher) -> None:
+        """
+        Send snapshots to one client until it disconnects or a send times out.
+        Sends a heartbeat when no update arrives within WS_HEARTBEAT_SECONDS.
+        """
+        while True:
+            message = await watcher.next_message(settings.WS_HEARTBEAT_SECONDS)
+            if message is None:
+                message = {"type": "heartbeat", "timestamp": datetime.utcnow().isoformat()}
+            await asyncio.wait_for(
+                watcher.websocket.send_json(message), settings.WS_SEND_TIMEOUT_SECONDS
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tasks": len(self.watchers),
+            "watchers": sum(len(watchers) for watchers in self.watchers.values()),
+            "dropped_snapshots": sum(
+                watcher.dropped for watchers in self.watchers.values() for watcher in watchers
+            ),
+        }
+
+
+_broadcaster_instance = None
+
+
+def get_task_broadcaster() -> TaskBroadcaster:
+    """Get or create the broadcaster for this process."""
+    global _broadcaster_instance
+    if _broadcaster_instance is None:
+        _broadcaster_instance = TaskBroadcaster()
+    return _broadcaster_instance
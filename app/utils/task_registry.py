@@ -0,0 +1,230 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def _json_state(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a task dict to plain JSON types (datetimes to ISO strings, Decimals to str)."""
+    def default(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        if isinstance(obj, set):
+            return list(obj)
+        return str(obj)
+
+    return json.loads(json.dumps(task, default=default))
+
+
+class InMemoryTaskRegistry:
+    """
+    Task state for a single process, guarded by a lock.
+
+    Every read returns a copy, so callers never see a dict that another
+    thread is halfway through updating.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def create(self, task: Dict[str, Any]) -> None:
+        with self._lock:
+            self._tasks[task["id"]] = dict(task)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task is not None else None
+
+    def is_local(self, task_id: str) -> bool:
+        """True if the task was created by this process."""
+        with self._lock:
+            return task_id in self._tasks
+
+    def update(self, task_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply updates to a local task and return the new state, or None if unknown."""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            task.update(updates)
+            return dict(task)
+
+    def remove_old(self, max_age_hours: int) -> List[str]:
+        """Drop completed or failed tasks older than max_age_hours and return their IDs."""
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        with self._lock:
+            to_remove = [
+                task_id
+                for task_id, task in self._tasks.items()
+                if task["status"] in TERMINAL_STATUSES
+                and task.get("completed_at")
+                and task["completed_at"] < cutoff
+            ]
+            for task_id in to_remove:
+                del self._tasks[task_id]
+        return to_remove
+
+    def flush(self) -> None:
+        """Publish pending updates. Nothing is shared, so there is nothing to do."""
+
+
+class DatabaseTaskRegistry(InMemoryTaskRegistry):
+    """
+    Task state shared between worker processes through the background_tasks table.
+
+    The owning process keeps the live state in memory and publishes it to the
+    table. Status changes are written immediately; progress updates are
+    coalesced so a task is written at most once per publish_interval, and the
+    latest pending state is always flushed. Tasks created by other workers
+    are read from the table.
+    """
+
+    def __init__(self, session_factory: Callable, publish_interval: float = 1.0):
+        super().__init__()
+        self.session_factory = session_factory
+        self.publish_interval = publish_interval
+        self._last_published: Dict[str, float] = {}
+        self._pending: set = set()
+        self._flush_timer: Optional[threading.Timer] = None
+
+    def create(self, task: Dict[str, Any]) -> None:
+        super().create(task)
+        self._publish([task["id"]])
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        task = super().get(task_id)
+        if task is not None:
+            return task
+        return self._load(task_id)
+
+    def update(self, task_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        task = super().update(task_id, updates)
+        if task is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            due = now - self._last_published.get(task_id, 0) >= self.publish_interval
+            if "status" in updates or due:
+                self._pending.discard(task_id)
+                publish = True
+            else:
+                self._pending.add(task_id)
+                self._schedule_flush()
+                publish = False
+
+        if publish:
+            self._publish([task_id])
+        return task
+
+    def remove_old(self, max_age_hours: int) -> List[str]:
+        removed = super().remove_old(max_age_hours)
+        with self._lock:
+            for task_id in removed:
+                self._last_published.pop(task_id, None)
+                self._pending.discard(task_id)
+
+        from app.models import BackgroundTask
+
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        db = self.session_factory()
+        try:
+            db.query(BackgroundTask).filter(
+                BackgroundTask.status.in_(TERMINAL_STATUSES),
+                BackgroundTask.updated_at < cutoff,
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error removing old background tasks: {e}")
+        finally:
+            db.close()
+        return removed
+
+    def flush(self) -> None:
+        with self._lock:
+            task_ids = list(self._pending)
+            self._pending.clear()
+            self._flush_timer = None
+        if task_ids:
+            self._publish(task_ids)
+
+    def _schedule_flush(self) -> None:
+        """Make sure coalesced updates reach the table even if no further update arrives."""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.publish_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _publish(self, task_ids: List[str]) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from app.models import BackgroundTask
+
+        rows = []
+        now = time.monotonic()
+        with self._lock:
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is None:
+                    continue
+                self._last_published[task_id] = now
+                rows.append({
+                    "id": task_id,
+                    "task_type": task["type"],
+                    "status": task["status"],
+                    "state": _json_state(task),
+                    "updated_at": datetime.utcnow(),
+                })
+        if not rows:
+            return
+
+        db = self.session_factory()
+        try:
+            stmt = insert(BackgroundTask.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    "status": stmt.excluded.status,
+                    "state": stmt.excluded.state,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error publishing background task state: {e}")
+        finally:
+            db.close()
+
+    def _load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        from app.models import BackgroundTask
+
+        db = self.session_factory()
+        try:
+            row = db.query(BackgroundTask.state).filter(BackgroundTask.id == task_id).first()
+            return dict(row.state) if row else None
+        except Exception as e:
+            logger.error(f"Error loading background task {task_id}: {e}")
+            return None
+        finally:
+            db.close()
+
+
+def create_task_registry() -> InMemoryTaskRegistry:
+    """Build the registry selected by TASK_REGISTRY_BACKEND ("memory" or "database")."""
+    from app.config import settings
+
+    if settings.TASK_REGISTRY_BACKEND == "database":
+        from app.database import BackgroundSessionLocal
+
+        return DatabaseTaskRegistry(BackgroundSessionLocal, settings.TASK_PUBLISH_INTERVAL_SECONDS)
+    return InMemoryTaskRegistry()
@@ -0,0 +1,1093 @@
+"""
+Benchmarks for report generation and background processing.
+
+Runs against the database configured in the environment, e.g.
+
+    python benchmark.py report-queries --portfolio-id 1
+"""
+import argparse
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import engine, SessionLocal
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed on the engine inside the block."""
+    counter = {"queries": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def bench_report_queries(args):
+    """Print query count and wall time for each report generator."""
+    from app.utils import report_generators
+
+    generators = [
+        "generate_collateral_summary",
+        "generate_guarantee_summary",
+        "generate_interest_rate_summary",
+        "generate_repayment_summary",
+        "generate_assumptions_summary",
+        "generate_amortised_loan_balances",
+        "generate_probability_default_report",
+        "generate_exposure_default_report",
+        "generate_loss_given_default_report",
+        "generate_ecl_detailed_report",
+        "generate_local_impairment_details_report",
+    ]
+    if args.report:
+        generators = [name for name in generators if args.report in name]
+
+    report_date = date.fromisoformat(args.report_date) if args.report_date else date.today()
+
+    print(f"{'report':45} {'queries':>8} {'seconds':>9}")
+    for name in generators:
+        db = SessionLocal()
+        try:
+            with count_queries() as counter:
+                start = time.perf_counter()
+                try:
+                    getattr(report_generators, name)(db, args.portfolio_id, report_date)
+                    status = ""
+                except Exception as e:
+                    status = f"  error: {e}"
+                elapsed = time.perf_counter() - start
+            print(f"{name:45} {counter['queries']:>8} {elapsed:>9.3f}{status}")
+        finally:
+            db.close()
+
+
+def bench_progress_updates(args):
+    """
+    Replay the progress pattern of a loan ingestion (one update per chunk)
+    from a worker thread, as ingestion publishes them, against an in-memory
+    task manager with one subscriber, and compare with the per-update sleeps
+    the pipeline used to make. Fails if the subscriber is called anywhere
+    but the event loop it subscribed on.
+    """
+    from app.utils.background_tasks import BackgroundTaskManager
+    from app.utils.task_registry import InMemoryTaskRegistry
+
+    chunk_size = 25  # Matches the loan details processor
+    num_chunks = (args.loans + chunk_size - 1) // chunk_size
+
+    async def run(legacy_sleep: bool):
+        loop = asyncio.get_running_loop()
+        manager = BackgroundTaskManager(registry=InMemoryTaskRegistry())
+        manager.bind_loop()
+        task_id = manager.create_task("benchmark", "Progress update benchmark")
+        delivered = {"count": 0, "last_progress": None, "wrong_loop": 0}
+
+        async def on_update(task_data):
+            delivered["count"] += 1
+            delivered["last_progress"] = task_data["progress"]
+            if asyncio.get_running_loop() is not loop:
+                delivered["wrong_loop"] += 1
+
+        manager.subscribe(task_id, on_update)
+        manager.mark_as_started(task_id)
+
+        def publish():
+            for chunk_idx in range(num_chunks):
+                manager.update_task(task_id, status_message=f"Processing chunk {chunk_idx + 1}/{num_chunks}")
+                manager.update_progress(
+                    task_id,
+                    progress=round(min(95, (chunk_idx + 1) / num_chunks * 95), 2),
+                    processed_items=(chunk_idx + 1) * chunk_size,
+                )
+                if legacy_sleep:
+                    time.sleep(0.1)
+            manager.update_progress(task_id, progress=100, processed_items=args.loans)
+
+        start = time.perf_counter()
+        await asyncio.to_thread(publish)
+        elapsed = time.perf_counter() - start
+
+        # Let the trailing throttled update land before reading the counters
+        await asyncio.sleep(manager.progress_throttle.interval + 0.1)
+        await asyncio.sleep(0)
+        return elapsed, 2 * num_chunks + 1, delivered
+
+    print(f"{args.loans} loans, {num_chunks} chunks of {chunk_size}")
+    print(f"{'mode':10} {'seconds':>9} {'updates':>8} {'delivered':>10} {'final':>6} {'off-loop':>9}")
+    modes = [("throttled", False)] + ([("legacy", True)] if args.legacy else [])
+    wrong_loop = 0
+    for mode, legacy_sleep in modes:
+        elapsed, updates, delivered = asyncio.run(run(legacy_sleep))
+        wrong_loop += delivered["wrong_loop"]
+        print(
+            f"{mode:10} {elapsed:>9.3f} {updates:>8} {delivered['count']:>10} "
+            f"{delivered['last_progress']!s:>6} {delivered['wrong_loop']:>9}"
+        )
+    if not args.legacy:
+        print(f"legacy sleeps alone would add {num_chunks * 0.1:.1f}s (run with --legacy to measure)")
+    if wrong_loop:
+        raise SystemExit(f"FAIL: {wrong_loop} notifications ran outside the subscriber's event loop")
+
+
+def bench_ws_fanout(args):
+    """
+    Load-test the WebSocket broadcaster: many in-process watchers of one task,
+    some of them slow, while the task publishes progress. Reports delivery
+    latency and memory.
+    """
+    import statistics
+    import tracemalloc
+    from app.utils.background_tasks import get_task_manager
+    from app.utils.task_broadcaster import get_task_broadcaster
+
+    class FakeWebSocket:
+        def __init__(self, delay: float):
+            self.delay = delay
+            self.latencies = []
+            self.received = 0
+
+        async def send_json(self, data):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            self.received += 1
+            published_at = published.get(data.get("processed_items"))
+            if published_at is not None:
+                self.latencies.append(time.perf_counter() - published_at)
+
+    published = {}
+
+    async def run():
+        manager = get_task_manager()
+        broadcaster = get_task_broadcaster()
+        task_id = manager.create_task("benchmark", "WebSocket fan-out benchmark")
+        manager.mark_as_started(task_id)
+
+        num_slow = int(args.watchers * args.slow_fraction)
+        sockets = [FakeWebSocket(args.slow_delay if i < num_slow else 0) for i in range(args.watchers)]
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        watchers = [broadcaster.add(websocket, task_id) for websocket in sockets]
+        streams = [asyncio.create_task(broadcaster.stream(watcher)) for watcher in watchers]
+
+        start = time.perf_counter()
+        for i in range(1, args.updates + 1):
+            published[i] = time.perf_counter()
+            manager.update_progress(task_id, progress=round(i / args.updates * 100, 2), processed_items=i)
+            await asyncio.sleep(args.interval)
+        await asyncio.sleep(1 + args.slow_delay)
+        elapsed = time.perf_counter() - start
+
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = broadcaster.stats()
+
+        for stream in streams:
+            stream.cancel()
+        for watcher in watchers:
+            broadcaster.remove(watcher)
+        return sockets[:num_slow], sockets[num_slow:], elapsed, current - baseline, peak - baseline, stats
+
+    slow, fast, elapsed, memory, peak, stats = asyncio.run(run())
+
+    def describe(label, sockets):
+        latencies = sorted(latency for websocket in sockets for latency in websocket.latencies)
+        if not latencies:
+            print(f"{label:6} no messages")
+            return
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        received = statistics.mean(websocket.received for websocket in sockets)
+        print(
+            f"{label:6} {len(sockets):>6} watchers  {received:>7.1f} msgs each  "
+            f"p50 {statistics.median(latencies) * 1000:>7.2f}ms  p99 {p99 * 1000:>7.2f}ms"
+        )
+
+    print(f"{args.updates} updates over {elapsed:.2f}s, {stats['dropped_snapshots']} stale snapshots dropped")
+    describe("fast", fast)
+    describe("slow", slow)
+    print(f"memory {memory / 1024:.0f} KiB retained, {peak / 1024:.0f} KiB peak")
+
+
+def bench_ws_endpoint(args):
+    """
+    Load-test the /ws/tasks endpoint itself: serve the app in this process,
+    open many authenticated WebSocket connections to one task, publish
+    progress and report connect and delivery latency, plus the database
+    connections checked out while every watcher is streaming.
+    """
+    import json
+    import uvicorn
+    import websockets
+    from datetime import timedelta
+    from app.auth.utils import create_access_token
+    from app.models import User
+    from app.utils.background_tasks import get_task_manager
+    from main import app
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == args.email).first()
+        if user is None:
+            raise SystemExit(f"No user with email {args.email}")
+        token = create_access_token(
+            data={"sub": user.email, "id": user.id, "role": user.role, "is_active": user.is_active},
+            expires_delta=timedelta(hours=1),
+        )
+    finally:
+        db.close()
+
+    published = {}
+
+    async def watch(url, connected, latencies, connect_times, done):
+        start = time.perf_counter()
+        async with websockets.connect(url, max_queue=None) as websocket:
+            connect_times.append(time.perf_counter() - start)
+            connected.release()
+            while True:
+                message = json.loads(await websocket.recv())
+                published_at = published.get(message.get("processed_items"))
+                if published_at is not None:
+                    latencies.append(time.perf_counter() - published_at)
+                if message.get("processed_items") == args.updates:
+                    break
+        done.release()
+
+    async def run():
+        server = uvicorn.Server(uvicorn.Config(app, port=args.port, lifespan="off", log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+
+        manager = get_task_manager()
+        task_id = manager.create_task("benchmark", "WebSocket endpoint benchmark")
+        manager.mark_as_started(task_id)
+        url = f"ws://127.0.0.1:{args.port}/ws/tasks/{task_id}?token={token}"
+
+        connected, done = asyncio.Semaphore(0), asyncio.Semaphore(0)
+        latencies, connect_times = [], []
+        watchers = [
+            asyncio.create_task(watch(url, connected, latencies, connect_times, done))
+            for _ in range(args.watchers)
+        ]
+        for _ in range(args.watchers):
+            await connected.acquire()
+        checked_out = engine.pool.checkedout()
+
+        start = time.perf_counter()
+        for i in range(1, args.updates + 1):
+            published[i] = time.perf_counter()
+            manager.update_progress(task_id, progress=round(i / args.updates * 100, 2), processed_items=i)
+            await asyncio.sleep(args.interval)
+        try:
+            for _ in range(args.watchers):
+                await asyncio.wait_for(done.acquire(), timeout=30)
+        except asyncio.TimeoutError:
+            print("some watchers never saw the last update")
+        elapsed = time.perf_counter() - start
+
+        for watcher in watchers:
+            watcher.cancel()
+        server.should_exit = True
+        await serving
+        return sorted(connect_times), sorted(latencies), checked_out, elapsed
+
+    connect_times, latencies, checked_out, elapsed = asyncio.run(run())
+    print(f"{args.watchers} watchers, {args.updates} updates over {elapsed:.2f}s")
+    print(
+        f"connect  p50 {_percentile(connect_times, 0.5):>7.1f} ms  "
+        f"p99 {_percentile(connect_times, 0.99):>7.1f} ms"
+    )
+    if latencies:
+        print(
+            f"delivery p50 {_percentile(latencies, 0.5):>7.1f} ms  p99 {_percentile(latencies, 0.99):>7.1f} ms  "
+            f"{len(latencies) / args.watchers:.1f} msgs each"
+        )
+    print(f"database connections checked out while streaming: {checked_out} (pool size {engine.pool.size()})")
+
+
+def _percentile(values, p):
+    """p-th percentile of sorted durations in seconds, in milliseconds."""
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def bench_endpoint_latency(args):
+    """
+    Fire concurrent GET requests at a running server and report latency
+    percentiles per endpoint. Run once against a server with
+    DB_ASYNC_ENABLED=true and once with false to compare the async engine
+    with the threadpool fallback.
+    """
+    import httpx
+    from datetime import timedelta
+    from app.auth.utils import create_access_token
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == args.email).first()
+        if user is None:
+            raise SystemExit(f"No user with email {args.email}")
+        token = create_access_token(
+            data={"sub": user.email, "id": user.id, "role": user.role, "is_active": user.is_active},
+            expires_delta=timedelta(hours=1),
+        )
+    finally:
+        db.close()
+
+    paths = args.path or [
+        "/dashboard",
+        "/portfolios/",
+        f"/portfolios/{args.portfolio_id}",
+        f"/reports/{args.portfolio_id}/history",
+    ]
+
+    async def run(path):
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async with httpx.AsyncClient(
+            base_url=args.base_url,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - start
+        return sorted(latencies), errors, elapsed
+
+    print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}")
+    print(f"{'endpoint':40} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path in paths:
+        latencies, errors, elapsed = asyncio.run(run(path))
+        print(
+            f"{path:40} {len(latencies) / elapsed:>8.1f} {_percentile(latencies, 0.5):>9.1f} "
+            f"{_percentile(latencies, 0.95):>9.1f} {_percentile(latencies, 0.99):>9.1f} {errors:>7}"
+        )
+
+
+def bench_login(args):
+    """
+    Fire concurrent logins at a running server and report logins/sec and
+    latency percentiles, after timing one hash and verify in this process
+    with the configured argon2 parameters.
+    """
+    import httpx
+    from app.auth.utils import get_password_hash, verify_password
+
+    start = time.perf_counter()
+    hashed = get_password_hash(args.password)
+    hash_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    verify_password(args.password, hashed)
+    verify_ms = (time.perf_counter() - start) * 1000
+    print(
+        f"argon2 time_cost={settings.ARGON2_TIME_COST} memory_cost={settings.ARGON2_MEMORY_COST} "
+        f"parallelism={settings.ARGON2_PARALLELISM}: hash {hash_ms:.1f} ms, verify {verify_ms:.1f} ms"
+    )
+
+    async def run():
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async with httpx.AsyncClient(
+            base_url=args.base_url,
+            timeout=120,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post("/login", json={"email": args.email, "password": args.password})
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - start
+        return sorted(latencies), errors, elapsed
+
+    latencies, errors, elapsed = asyncio.run(run())
+    print(f"{args.requests} logins, concurrency {args.concurrency}")
+    print(
+        f"{len(latencies) / elapsed:.1f} logins/s  p50 {_percentile(latencies, 0.5):.1f} ms  "
+        f"p99 {_percentile(latencies, 0.99):.1f} ms  errors {errors}"
+    )
+
+
+def bench_journal_report(args):
+    """
+    Seed portfolios with ECL and local impairment results inside a
+    transaction that is rolled back, then time the journal report and check
+    its single latest-results query matches the old per-portfolio queries.
+    """
+    import random
+    from datetime import timedelta
+    from app.models import CalculationResult, Portfolio, User
+    from app.utils.report_generators import generate_journal_report, latest_calculation_summaries
+
+    db = SessionLocal()
+    try:
+        user = User(email="journal-benchmark@example.com", role="admin")
+        db.add(user)
+        db.flush()
+        now = datetime.now()
+        for i in range(args.portfolios):
+            portfolio = Portfolio(
+                user_id=user.id,
+                name=f"Journal benchmark {i}",
+                ecl_impairment_account="1001",
+                loan_assets="1002",
+                credit_risk_reserve="1003",
+            )
+            db.add(portfolio)
+            db.flush()
+            for calculation_type, keys in (
+                ("ecl", ["Stage 1", "Stage 2", "Stage 3"]),
+                ("local_impairment", ["Current", "OLEM", "Substandard", "Doubtful", "Loss"]),
+            ):
+                for run in range(args.runs):
+                    db.add(CalculationResult(
+                        portfolio_id=portfolio.id,
+                        calculation_type=calculation_type,
+                        config={},
+                        result_summary={key: {"provision_amount": random.uniform(0, 1e6)} for key in keys},
+                        total_provision=0,
+                        provision_percentage=0,
+                        reporting_date=now.date(),
+                        created_at=now - timedelta(days=run),
+                    ))
+        db.flush()
+        print(f"Seeded {args.portfolios} portfolios with {args.runs} results of each type")
+
+        with count_queries() as counter:
+            start = time.perf_counter()
+            report = generate_journal_report(db, [], date.today())
+            elapsed = time.perf_counter() - start
+        print(f"journal report: {len(report['portfolios'])} rows, {counter['queries']} queries, {elapsed:.3f}s")
+
+        with count_queries() as counter:
+            start = time.perf_counter()
+            legacy = {}
+            for (portfolio_id,) in db.query(Portfolio.id).all():
+                for calculation_type in ("ecl", "local_impairment"):
+                    result = (
+                        db.query(CalculationResult)
+                        .filter(
+                            CalculationResult.portfolio_id == portfolio_id,
+                            CalculationResult.calculation_type == calculation_type,
+                        )
+                        .order_by(CalculationResult.created_at.desc())
+                        .first()
+                    )
+                    if result:
+                        legacy[(portfolio_id, calculation_type)] = result.result_summary
+            elapsed = time.perf_counter() - start
+        print(f"per-portfolio queries: {counter['queries']} queries, {elapsed:.3f}s")
+
+        portfolio_ids = [portfolio_id for (portfolio_id,) in db.query(Portfolio.id).all()]
+        if latest_calculation_summaries(db, ["ecl", "local_impairment"], portfolio_ids) != legacy:
+            raise SystemExit("Latest results differ from the per-portfolio queries")
+        print("latest results match")
+    finally:
+        db.rollback()
+        db.close()
+
+
+def bench_calculation_loans(args):
+    """
+    Seed an ECL calculation with per-loan results inside a transaction that
+    is rolled back, then time pages of the drill-down query at the start and
+    deep into the results for each sort, with and without filters, and the
+    totals footer.
+    """
+    import random
+    from decimal import Decimal
+    from sqlalchemy import text
+    from app.models import CalculationLoanResult, CalculationResult, Portfolio, User
+    from app.utils.calculation_loan_results import (
+        LOAN_RESULT_SORTS, loan_result_totals, page_loan_results, save_loan_results
+    )
+
+    rng = random.Random(0)
+    stages = ["Stage 1"] * 8 + ["Stage 2", "Stage 3"]
+    branches = [f"BR{i:02d}" for i in range(40)]
+
+    def rows():
+        for i in range(args.loans):
+            balance = Decimal(rng.randrange(100_00, 5_000_000)) / 100
+            pd, lgd = rng.uniform(1, 20), rng.uniform(0.1, 0.9)
+            yield {
+                "loan_id": i + 1,
+                "loan_no": f"L{i}",
+                "employee_id": f"E{i}",
+                "branch": rng.choice(branches),
+                "stage": rng.choice(stages),
+                "outstanding_loan_balance": balance,
+                "ead_value": balance,
+                "pd": pd,
+                "lgd": lgd,
+                "ecl": (balance * Decimal(pd * lgd / 100)).quantize(Decimal("0.01")),
+                "provision": (balance * Decimal("0.05")).quantize(Decimal("0.01")),
+            }
+
+    db = SessionLocal()
+    try:
+        user = User(email="drilldown-benchmark@example.com", role="admin")
+        db.add(user)
+        db.flush()
+        portfolio = Portfolio(user_id=user.id, name="Drill-down benchmark")
+        db.add(portfolio)
+        db.flush()
+        calculation = CalculationResult(
+            portfolio_id=portfolio.id,
+            calculation_type="ecl",
+            config={},
+            result_summary={},
+            total_provision=0,
+            provision_percentage=0,
+            reporting_date=date.today(),
+        )
+        db.add(calculation)
+        db.flush()
+        start = time.perf_counter()
+        save_loan_results(db, calculation, rows())
+        db.execute(text("ANALYZE calculation_loan_results"))
+        print(f"Seeded {args.loans} loan results in {time.perf_counter() - start:.1f}s")
+
+        def timed(fn):
+            durations = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                result = fn()
+                durations.append(time.perf_counter() - start)
+            durations.sort()
+            return result, durations
+
+        def deep_key(sort, descending):
+            """Sort key of the loan halfway through the results, as a cursor would carry it."""
+            keys = [CalculationLoanResult.id] if sort == "id" else [LOAN_RESULT_SORTS[sort], CalculationLoanResult.id]
+            row = (
+                db.query(*keys)
+                .filter(CalculationLoanResult.calculation_id == calculation.id)
+                .order_by(*[key.desc() if descending else key for key in keys])
+                .offset(args.loans // 2)
+                .first()
+            )
+            return list(row)
+
+        print(f"{'sort':<26} {'filters':<8} {'page':<6} {'p50 ms':>8} {'max ms':>8}")
+        for sort in ["id", *LOAN_RESULT_SORTS]:
+            descending = sort != "id"
+            after = deep_key(sort, descending)
+            for label, filters in (("none", {}), ("stage", {"stages": ["Stage 2"], "branches": branches[:5]})):
+                for page, cursor in (("first", None), ("deep", after)):
+                    _, durations = timed(lambda: page_loan_results(
+                        db, calculation.id, sort=sort, descending=descending, after=cursor, limit=args.limit, **filters
+                    ))
+                    order = "desc" if descending else "asc"
+                    print(
+                        f"{sort + ' ' + order:<26} {label:<8} {page:<6} "
+                        f"{_percentile(durations, 0.5):>8.1f} {durations[-1] * 1000:>8.1f}"
+                    )
+
+        for label, filters in (("none", {}), ("stage", {"stages": ["Stage 2"], "branches": branches[:5]})):
+            _, durations = timed(lambda: loan_result_totals(db, calculation.id, **filters))
+            print(f"{'totals':<26} {label:<8} {'':<6} {_percentile(durations, 0.5):>8.1f} {durations[-1] * 1000:>8.1f}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+def bench_risk_memo(args):
+    """
+    Simulate monthly ECL runs over synthetic loans where a fraction of the
+    loans change their terms, collateral or client each month, and report
+    how many EIR, PD, LGD and EAD values the risk parameter memo reuses.
+    Runs in memory: nothing is read from or written to the database.
+    """
+    import random
+    from decimal import Decimal
+    from types import SimpleNamespace
+    from app.calculators.ecl import predict_probability_of_default
+    from app.utils.ecl_calculator import (
+        calculate_effective_interest_rate_lender,
+        calculate_exposure_at_default_percentage,
+        calculate_loss_given_default,
+    )
+    from app.utils.risk_parameter_memo import (
+        RiskParameterMemo, ead_fingerprint, eir_fingerprint, lgd_fingerprint, pd_fingerprint
+    )
+
+    rng = random.Random(args.seed)
+
+    def new_terms(loan):
+        loan.loan_amount = Decimal(rng.randrange(1_000, 50_000))
+        loan.loan_term = rng.choice([12, 24, 36, 48, 60])
+        loan.monthly_installment = (loan.loan_amount / loan.loan_term * Decimal("1.2")).quantize(Decimal("0.01"))
+        loan.administrative_fees = Decimal(rng.randrange(0, 500))
+        loan.outstanding_loan_balance = loan.loan_amount * Decimal(rng.random())
+        loan.accumulated_arrears = Decimal(rng.choice([0, 0, 0, 100, 500]))
+        loan.securities = [
+            SimpleNamespace(
+                cash_or_non_cash=rng.choice(["cash", "non-cash"]),
+                collateral_value=Decimal(rng.randrange(0, 20_000)),
+                forced_sale_value=Decimal(rng.randrange(0, 15_000)),
+            )
+            for _ in range(rng.choice([0, 0, 1, 2]))
+        ]
+        loan.year_of_birth = rng.randrange(1960, 2002)
+
+    loans = []
+    for i in range(args.loans):
+        loan = SimpleNamespace(
+            loan_no=f"L{i}", effective_interest_rate=None, loan_issue_date=date(2023, rng.randrange(1, 13), 1)
+        )
+        new_terms(loan)
+        loans.append(loan)
+
+    pd_by_year = {}
+
+    def probability_of_default(year):
+        if year not in pd_by_year:
+            pd_by_year[year] = predict_probability_of_default([year])[year]
+        return pd_by_year[year]
+
+    memo = RiskParameterMemo(None, 0)
+    model_version = "benchmark"
+    print(f"{args.loans} loans, {args.churn:.0%} churn per month")
+    print(f"{'month':>5} {'changed':>8} {'eir':>7} {'pd':>7} {'lgd':>7} {'ead':>7} {'overall':>8} {'seconds':>8}")
+    for month in range(args.months):
+        reporting_date = date(2025 + month // 12, month % 12 + 1, 28)
+        changed = 0 if month == 0 else int(args.loans * args.churn)
+        for loan in rng.sample(loans, changed):
+            new_terms(loan)
+
+        counts = {parameter: [0, 0] for parameter in ("eir", "pd", "lgd", "ead")}
+        start = time.perf_counter()
+        for loan in loans:
+            for parameter, inputs_fingerprint, compute in (
+                ("eir", eir_fingerprint(loan), lambda: calculate_effective_interest_rate_lender(
+                    float(loan.loan_amount), float(loan.administrative_fees), loan.loan_term, float(loan.monthly_installment)
+                )),
+                ("pd", pd_fingerprint(loan.year_of_birth, model_version), lambda: probability_of_default(loan.year_of_birth)),
+                ("lgd", lgd_fingerprint(loan, loan.securities), lambda: calculate_loss_given_default(loan, loan.securities)),
+                ("ead", ead_fingerprint(loan, reporting_date), lambda: calculate_exposure_at_default_percentage(loan, reporting_date)),
+            ):
+                hits = memo.hits
+                memo.get(loan.loan_no, parameter, inputs_fingerprint, compute)
+                counts[parameter][memo.hits - hits] += 1
+        elapsed = time.perf_counter() - start
+
+        def rate(miss_hit):
+            return miss_hit[1] / sum(miss_hit)
+
+        overall = sum(hit for _, hit in counts.values()) / (4 * len(loans))
+        print(
+            f"{month + 1:>5} {changed:>8} " + " ".join(f"{rate(counts[p]):>7.1%}" for p in ("eir", "pd", "lgd", "ead"))
+            + f" {overall:>8.1%} {elapsed:>8.2f}"
+        )
+
+
+def _legacy_impairment_summary(portfolio_id, loans, config, reporting_date):
+    """The per-loan loop calculate_impairment_summary used before it went columnar."""
+    from decimal import Decimal
+    from app.calculators.local_impairment import calculate_days_past_due, parse_days_range
+    from app.schemas import ImpairmentCategoryData, ImpairmentSummaryMetrics, LocalImpairmentSummary
+
+    names = ["current", "olem", "substandard", "doubtful", "loss"]
+    ranges = [parse_days_range(getattr(config, name).days_range) for name in names]
+    buckets = {name: [] for name in names}
+    for loan in loans:
+        days_past_due = calculate_days_past_due(loan)
+        for name, (min_days, max_days) in zip(names[:-1], ranges[:-1]):
+            if min_days <= days_past_due <= (max_days or float("inf")):
+                buckets[name].append(loan)
+                break
+        else:
+            if ranges[-1][0] <= days_past_due:
+                buckets["loss"].append(loan)
+
+    data = {}
+    for name in names:
+        category = getattr(config, name)
+        total_value = sum(loan.outstanding_loan_balance or 0 for loan in buckets[name])
+        provision = Decimal(total_value) * Decimal(category.rate / 100)
+        data[name] = ImpairmentCategoryData(
+            days_range=category.days_range,
+            rate=category.rate,
+            total_loan_value=round(total_value, 2),
+            provision_amount=round(provision, 2),
+        )
+    return LocalImpairmentSummary(
+        portfolio_id=portfolio_id,
+        calculation_date=reporting_date.strftime("%Y-%m-%d"),
+        **data,
+        summary_metrics=ImpairmentSummaryMetrics(
+            total_loans=round(sum(d.total_loan_value for d in data.values()), 2),
+            total_provision=round(sum(d.provision_amount for d in data.values()), 2),
+        ),
+    )
+
+
+def bench_local_impairment(args):
+    """
+    Time the columnar local impairment summary on synthetic loans, and
+    check it matches the per-loan loop exactly.
+    """
+    import random
+    from decimal import Decimal
+    from types import SimpleNamespace
+    from app.calculators.local_impairment import (
+        calculate_impairment_summary,
+        calculate_impairment_summary_from_columns,
+        impairment_columns,
+    )
+    from app.schemas import ImpairmentConfig, ImpairmentCategory
+
+    config = ImpairmentConfig(
+        current=ImpairmentCategory(days_range="0-30", rate=1),
+        olem=ImpairmentCategory(days_range="31-90", rate=5),
+        substandard=ImpairmentCategory(days_range="91-180", rate=25),
+        doubtful=ImpairmentCategory(days_range="181-360", rate=50),
+        loss=ImpairmentCategory(days_range="361+", rate=100),
+    )
+
+    rng = random.Random(args.seed)
+    loans = []
+    for _ in range(args.loans):
+        has_ndia = rng.random() > 0.01  # A few loans fall back to arrears
+        loans.append(SimpleNamespace(
+            ndia=Decimal(rng.randint(0, 50000)) / 100 if has_ndia else None,
+            accumulated_arrears=Decimal(rng.randint(0, 500000)) / 100,
+            monthly_installment=Decimal(rng.randint(1000, 200000)) / 100,
+            outstanding_loan_balance=Decimal(rng.randint(0, 10000000)) / 100 if rng.random() > 0.01 else None,
+        ))
+    reporting_date = date.today()
+
+    def timed(fn, *fn_args):
+        start = time.perf_counter()
+        result = fn(*fn_args)
+        return result, time.perf_counter() - start
+
+    columns, columns_seconds = timed(impairment_columns, loans)
+    summary, summary_seconds = timed(calculate_impairment_summary_from_columns, 1, *columns, config, reporting_date)
+    _, total_seconds = timed(calculate_impairment_summary, 1, loans, config, reporting_date)
+
+    print(f"{args.loans} loans")
+    print(f"{'step':28} {'seconds':>9}")
+    print(f"{'load columns':28} {columns_seconds:>9.3f}")
+    print(f"{'bin and total columns':28} {summary_seconds:>9.3f}")
+    print(f"{'columnar end to end':28} {total_seconds:>9.3f}")
+    if args.legacy:
+        legacy, legacy_seconds = timed(_legacy_impairment_summary, 1, loans, config, reporting_date)
+        print(f"{'per-loan loop':28} {legacy_seconds:>9.3f}")
+        matches = legacy.model_dump() == summary.model_dump()
+        print(f"output matches per-loan loop: {matches}")
+        if not matches:
+            raise SystemExit(1)
+
+
+# (description, SQL, index the plan should use)
+INDEX_CHECKS = [
+    (
+        "loans joined to clients on employee_id",
+        "SELECT l.id FROM loans l JOIN clients c "
+        "ON c.portfolio_id = l.portfolio_id AND c.employee_id = l.employee_id "
+        "WHERE l.portfolio_id = :portfolio_id",
+        "ix_clients_portfolio_id_employee_id",
+    ),
+    (
+        "loans by employee_id",
+        "SELECT id FROM loans WHERE portfolio_id = :portfolio_id AND employee_id = 'x'",
+        "ix_loans_portfolio_id_employee_id",
+    ),
+    (
+        "loans in an ndia range",
+        "SELECT id FROM loans WHERE portfolio_id = :portfolio_id AND ndia BETWEEN 30 AND 90",
+        "ix_loans_portfolio_id_ndia",
+    ),
+    (
+        "loans by loan_no",
+        "SELECT id FROM loans WHERE portfolio_id = :portfolio_id AND loan_no = 'x'",
+        "ix_loans_portfolio_id_loan_no",
+    ),
+    (
+        "securities of a client",
+        "SELECT id FROM securities WHERE client_id = 1",
+        "ix_securities_client_id",
+    ),
+    (
+        "open quality issues",
+        "SELECT id FROM quality_issues WHERE portfolio_id = :portfolio_id AND status != 'approved'",
+        "ix_quality_issues_portfolio_id_status",
+    ),
+    (
+        "quality issues page",
+        "SELECT id FROM quality_issues WHERE portfolio_id = :portfolio_id "
+        "ORDER BY severity DESC, created_at DESC, id DESC LIMIT 50",
+        "ix_quality_issues_portfolio_id_severity_created_at_id",
+    ),
+    (
+        "latest ECL staging result",
+        "SELECT id FROM staging_results WHERE portfolio_id = :portfolio_id "
+        "AND staging_type = 'ecl' ORDER BY created_at DESC LIMIT 1",
+        "ix_staging_results_portfolio_id_type_created_at",
+    ),
+    (
+        "latest ECL calculation result",
+        "SELECT id FROM calculation_results WHERE portfolio_id = :portfolio_id "
+        "AND calculation_type = 'ecl' ORDER BY created_at DESC LIMIT 1",
+        "ix_calculation_results_portfolio_id_type_created_at",
+    ),
+    (
+        "latest calculation result per portfolio",
+        "SELECT DISTINCT ON (portfolio_id, calculation_type) portfolio_id, calculation_type, result_summary "
+        "FROM calculation_results WHERE calculation_type IN ('ecl', 'local_impairment') "
+        "ORDER BY portfolio_id DESC, calculation_type DESC, created_at DESC",
+        "ix_calculation_results_portfolio_id_type_created_at",
+    ),
+    (
+        "report history",
+        "SELECT id FROM reports WHERE portfolio_id = :portfolio_id ORDER BY created_at DESC LIMIT 20",
+        "ix_reports_portfolio_id_created_at",
+    ),
+]
+
+
+def _plan_indexes(plan):
+    """Index names used anywhere in an EXPLAIN (FORMAT JSON) plan node."""
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _plan_indexes(child)
+    return names
+
+
+def bench_explain_indexes(args):
+    """
+    EXPLAIN the hot staging, calculation and report queries and check that
+    each uses its composite index. The planner is left to its own costs, so
+    point this at a database with production-sized, analyzed data: on small
+    tables a sequential scan is the right plan and shows up as a failure.
+    tests/test_indexes.py checks that the indexes exist, and runs the same
+    checks against seeded, analyzed tables.
+    Exits non-zero when an index isn't used.
+    """
+    from sqlalchemy import text
+
+    failures = 0
+    with engine.connect() as connection:
+        for description, sql, expected in INDEX_CHECKS:
+            plan = connection.execute(
+                text(f"EXPLAIN (FORMAT JSON) {sql}"), {"portfolio_id": args.portfolio_id}
+            ).scalar()[0]["Plan"]
+            used = _plan_indexes(plan)
+            ok = expected in used
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {description:40} {expected}" + ("" if ok else f" (used: {sorted(used)})"))
+    if failures:
+        raise SystemExit(1)
+
+
+# Heavy packages imported where they're used rather than at startup
+STARTUP_DEFERRED_MODULES = ["numpy", "pandas", "polars", "openpyxl", "pyarrow", "reportlab", "sklearn"]
+
+
+def _import_times(module):
+    """
+    Self and cumulative import time in microseconds of every module loaded by
+    importing module in a fresh interpreter, from python -X importtime.
+    """
+    import os
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def bench_startup(args):
+    """
+    Import time of main in fresh interpreters, the packages it is spent in,
+    and a budget check: exits non-zero if the median import time exceeds
+    --budget-ms or a deferred heavy dependency is imported at startup.
+    """
+    runs = [_import_times("main") for _ in range(args.runs)]
+    totals = sorted(times["main"][1] / 1000 for times in runs)
+    median = totals[len(totals) // 2]
+    print(f"import main: median {median:.0f} ms, min {totals[0]:.0f} ms, max {totals[-1]:.0f} ms over {args.runs} runs")
+
+    # Self time grouped by top-level package, from the last run
+    by_package = {}
+    for name, (self_us, _) in runs[-1].items():
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    print(f"{'package':<24} {'self ms':>8}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<24} {self_us / 1000:>8.1f}")
+
+    failures = []
+    loaded = sorted(module for module in STARTUP_DEFERRED_MODULES if module in runs[-1])
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+    if median > args.budget_ms:
+        failures.append(f"import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if failures:
+        raise SystemExit("\n".join(failures))
+    print(f"within the {args.budget_ms:.0f} ms budget, no deferred modules loaded")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IFRS9Pro benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    report_queries = subparsers.add_parser(
+        "report-queries", help="Count queries issued by each report generator"
+    )
+    report_queries.add_argument("--portfolio-id", type=int, required=True)
+    report_queries.add_argument("--report-date", help="YYYY-MM-DD, defaults to today")
+    report_queries.add_argument("--report", help="Only run generators whose name contains this")
+    report_queries.set_defaults(func=bench_report_queries)
+
+    progress_updates = subparsers.add_parser(
+        "progress-updates", help="Time progress reporting for a simulated loan ingestion"
+    )
+    progress_updates.add_argument("--loans", type=int, default=70000)
+    progress_updates.add_argument(
+        "--legacy", action="store_true", help="Also run with the old 0.1s sleep after every update"
+    )
+    progress_updates.set_defaults(func=bench_progress_updates)
+
+    ws_fanout = subparsers.add_parser(
+        "ws-fanout", help="Load-test WebSocket progress fan-out to many watchers"
+    )
+    ws_fanout.add_argument("--watchers", type=int, default=1000)
+    ws_fanout.add_argument("--updates", type=int, default=200)
+    ws_fanout.add_argument("--interval", type=float, default=0.01, help="Seconds between updates")
+    ws_fanout.add_argument("--slow-fraction", type=float, default=0.1)
+    ws_fanout.add_argument("--slow-delay", type=float, default=0.5, help="Seconds per send for slow clients")
+    ws_fanout.set_defaults(func=bench_ws_fanout)
+
+    ws_endpoint = subparsers.add_parser(
+        "ws-endpoint", help="Load-test the WebSocket progress endpoint over real connections"
+    )
+    ws_endpoint.add_argument("--email", required=True, help="User to issue the access token for")
+    ws_endpoint.add_argument("--watchers", type=int, default=500)
+    ws_endpoint.add_argument("--updates", type=int, default=200)
+    ws_endpoint.add_argument("--interval", type=float, default=0.01, help="Seconds between updates")
+    ws_endpoint.add_argument("--port", type=int, default=8765)
+    ws_endpoint.set_defaults(func=bench_ws_endpoint)
+
+    endpoint_latency = subparsers.add_parser(
+        "endpoint-latency", help="Latency percentiles of read endpoints under concurrent load"
+    )
+    endpoint_latency.add_argument("--base-url", default="http://localhost:8000")
+    endpoint_latency.add_argument("--email", required=True, help="User to issue the access token for")
+    endpoint_latency.add_argument("--portfolio-id", type=int, required=True)
+    endpoint_latency.add_argument("--requests", type=int, default=500)
+    endpoint_latency.add_argument("--concurrency", type=int, default=50)
+    endpoint_latency.add_argument("--path", action="append", help="Endpoint to hit; repeatable")
+    endpoint_latency.set_defaults(func=bench_endpoint_latency)
+
+    login = subparsers.add_parser(
+        "login", help="Login throughput and latency under concurrency"
+    )
+    login.add_argument("--base-url", default="http://localhost:8000")
+    login.add_argument("--email", required=True)
+    login.add_argument("--password", required=True)
+    login.add_argument("--requests", type=int, default=200)
+    login.add_argument("--concurrency", type=int, default=20)
+    login.set_defaults(func=bench_login)
+
+    journal_report = subparsers.add_parser(
+        "journal-report", help="Time the journal report over many seeded portfolios (rolled back)"
+    )
+    journal_report.add_argument("--portfolios", type=int, default=200)
+    journal_report.add_argument("--runs", type=int, default=5, help="Results per portfolio and type")
+    journal_report.set_defaults(func=bench_journal_report)
+
+    calculation_loans = subparsers.add_parser(
+        "calculation-loans", help="Time drill-down pages over a calculation's seeded loan results (rolled back)"
+    )
+    calculation_loans.add_argument("--loans", type=int, default=1_000_000)
+    calculation_loans.add_argument("--limit", type=int, default=100, help="Page size")
+    calculation_loans.add_argument("--runs", type=int, default=20, help="Timed runs per query")
+    calculation_loans.set_defaults(func=bench_calculation_loans)
+
+    risk_memo = subparsers.add_parser(
+        "risk-memo", help="Risk parameter reuse across monthly ECL runs with simulated churn"
+    )
+    risk_memo.add_argument("--loans", type=int, default=100_000)
+    risk_memo.add_argument("--months", type=int, default=6)
+    risk_memo.add_argument("--churn", type=float, default=0.05, help="Fraction of loans changing each month")
+    risk_memo.add_argument("--seed", type=int, default=0)
+    risk_memo.set_defaults(func=bench_risk_memo)
+
+    local_impairment = subparsers.add_parser(
+        "local-impairment", help="Time the columnar local impairment summary"
+    )
+    local_impairment.add_argument("--loans", type=int, default=1_000_000)
+    local_impairment.add_argument("--seed", type=int, default=0)
+    local_impairment.add_argument("--legacy", action="store_true", help="Also time the per-loan loop and compare outputs")
+    local_impairment.set_defaults(func=bench_local_impairment)
+
+    explain_indexes = subparsers.add_parser(
+        "explain-indexes", help="Check hot queries use their composite indexes"
+    )
+    explain_indexes.add_argument("--portfolio-id", type=int, default=1)
+    explain_indexes.set_defaults(func=bench_explain_indexes)
+
+    startup = subparsers.add_parser(
+        "startup", help="Import time of main, failing over budget or when heavy dependencies load eagerly"
+    )
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument(
+        "--budget-ms",
+        type=float,
+        default=settings.STARTUP_IMPORT_BUDGET_MS,
+        help="Highest acceptable median import time",
+    )
+    startup.add_argument("--top", type=int, default=15, help="Packages to list by import time")
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -1,25 +1,27 @@
 import os
 import logging
 from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database import get_db, init_db
 # Import all routers including websocket
 from app.routes import auth, portfolio, admin, reports, dashboard, user as user_router, quality_issues, websocket
 from app.models import User, UserRole
+from app.utils.job_executor import JobQueueFull
+from app.utils.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
 from app.auth.utils import get_password_hash
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from app.auth.utils import (
     get_password_hash,
-    verify_password,
+    verify_and_update_password,
     create_access_token,
 )
 from app.config import settings
-import pickle
-import numpy as np
 import asyncio
 
 
@@ -46,6 +48,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
 )
 
 # Register routers
@@ -58,6 +61,17 @@ app.include_router(user_router.router)
 app.include_router(quality_issues.router)
 app.include_router(websocket.router)
 
+
+@app.exception_handler(JobQueueFull)
+async def job_queue_full_handler(request, exc: JobQueueFull):
+    """A full job queue is temporary: ask the client to retry rather than fail with a 500."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(settings.JOB_QUEUE_RETRY_AFTER_SECONDS)},
+    )
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to IFRS9Pro API"}
@@ -70,13 +84,24 @@ async def get_token(
 ):
     # Reuse same logic as your login endpoint
     user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+
+    # Verify off the event loop, so a burst of logins doesn't stall other requests
+    valid, new_hash = (False, None)
+    if user and user.hashed_password:
+        valid, new_hash = await run_in_threadpool(
+            verify_and_update_password, form_data.password, user.hashed_password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Rehash with the configured argon2 parameters if they changed
+    if new_hash:
+        user.hashed_password = new_hash
+
     # Update last login
     user.last_login = datetime.utcnow()
     db.commit()
@@ -103,6 +128,8 @@ def get_model():
     """Lazy-load the ML model only when needed"""
     global model
     if model is None:
+        import pickle
+
         try:
             logger.info("Loading ML model...")
             with open("app/ml_models/logistic_model.pkl", "rb") as file:
@@ -205,6 +232,33 @@ async def create_admin_user_async():
     except Exception as e:
         logger.error(f"Error in create_admin_user_async: {e}")
         
+@app.on_event("shutdown")
+async def shutdown_job_executor_async():
+    """Stop background job worker threads and processes"""
+    from app.utils.job_executor import shutdown_job_executor
+
+    shutdown_job_executor()
+
+@app.on_event("startup")
+async def bind_task_manager_loop_async():
+    """Notify task subscribers on the server's event loop, whichever thread publishes"""
+    from app.utils.background_tasks import get_task_manager
+
+    get_task_manager().bind_loop()
+
+@app.on_event("startup")
+async def start_maintenance_async():
+    """Schedule periodic task eviction and result retention"""
+    from app.utils.maintenance import start_maintenance_scheduler
+
+    start_maintenance_scheduler()
+
+@app.on_event("shutdown")
+async def stop_maintenance_async():
+    from app.utils.maintenance import stop_maintenance_scheduler
+
+    stop_maintenance_scheduler()
+
 @app.on_event("startup")
 async def startup_event():
     """
@@ -0,0 +1,142 @@
+"""
+Rebuild loans, clients and guarantees as LIST-partitioned tables with one
+partition per portfolio (plus one for rows without a portfolio), so a
+re-ingestion can TRUNCATE or swap a partition instead of deleting rows.
+
+Partitioning is opt-in and changes constraints the rest of the schema
+relies on, so it's a separate step rather than an alembic revision: alembic
+history stays the same for every deployment, and the app detects
+partitioned tables at runtime (app/utils/partitions.py).
+
+    python partition_tables.py partition
+    python partition_tables.py unpartition
+
+Run it after `alembic upgrade head`, with the app stopped: each rebuild
+copies the table under an ACCESS EXCLUSIVE lock.
+
+What partitioning changes, since Postgres requires every unique constraint
+on a partitioned table to include the partition key:
+
+- The partitioned tables have no primary key on id. Ids still come from the
+  original sequences, so they stay unique, and id keeps its plain index.
+  The models still declare id as the primary key, which is what the ORM
+  uses for identity; it doesn't need the database constraint.
+- The foreign keys from securities.client_id and other_loans.client_id to
+  clients.id can't be recreated: a foreign key to a partitioned table must
+  reference a unique key that includes portfolio_id, and neither table has
+  a portfolio_id. They are dropped, and unpartition recreates them. The
+  models keep the ForeignKey for their relationships.
+"""
+import argparse
+import logging
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.utils.partitions import CLIENT_REFERENCES, PARTITIONED_TABLES
+
+logger = logging.getLogger(__name__)
+
+
+def is_partitioned(connection, table: str) -> bool:
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    ).scalar()
+    return relkind == "p"
+
+
+def index_definitions(connection, table: str):
+    """CREATE INDEX statements for the table's non-unique indexes."""
+    return connection.execute(
+        text(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :table "
+            "AND indexdef NOT LIKE 'CREATE UNIQUE%'"
+        ),
+        {"table": table},
+    ).all()
+
+
+def rebuild(connection, table: str, partitioned: bool) -> None:
+    """Recreate table as (un)partitioned, keeping its rows, sequence and indexes."""
+    old = f"{table}_old"
+    indexes = index_definitions(connection, table)
+    sequence = connection.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}
+    ).scalar()
+
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    for name, _ in indexes:
+        connection.execute(text(f"DROP INDEX {name}"))
+
+    if partitioned:
+        connection.execute(text(
+            f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY LIST (portfolio_id)"
+        ))
+        portfolio_ids = connection.execute(text("SELECT id FROM portfolios ORDER BY id")).scalars().all()
+        for portfolio_id in portfolio_ids:
+            connection.execute(text(
+                f"CREATE TABLE {table}_p{portfolio_id} PARTITION OF {table} FOR VALUES IN ({portfolio_id})"
+            ))
+        connection.execute(text(f"CREATE TABLE {table}_orphans PARTITION OF {table} FOR VALUES IN (NULL)"))
+    else:
+        connection.execute(text(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)"))
+        connection.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id)"))
+
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+    # CASCADE drops the foreign keys from securities and other_loans to
+    # clients; unpartition() recreates them once clients has its key back
+    connection.execute(text(f"DROP TABLE {old} CASCADE"))
+
+    connection.execute(text(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_portfolio_id_fkey "
+        f"FOREIGN KEY (portfolio_id) REFERENCES portfolios (id)"
+    ))
+    for _, definition in indexes:
+        connection.execute(text(definition))
+    connection.execute(text(f"ANALYZE {table}"))
+
+
+def partition() -> None:
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(connection, table):
+                logger.info(f"{table} is already partitioned")
+                continue
+            rebuild(connection, table, partitioned=True)
+            logger.info(f"Partitioned {table} by portfolio_id")
+
+
+def unpartition() -> None:
+    with engine.begin() as connection:
+        rebuilt_clients = False
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(connection, table):
+                logger.info(f"{table} isn't partitioned")
+                continue
+            rebuild(connection, table, partitioned=False)
+            rebuilt_clients = rebuilt_clients or table == "clients"
+            logger.info(f"Rebuilt {table} without partitions")
+        if rebuilt_clients:
+            for referencing, column in CLIENT_REFERENCES:
+                connection.execute(text(
+                    f"ALTER TABLE {referencing} ADD CONSTRAINT {referencing}_{column}_fkey "
+                    f"FOREIGN KEY ({column}) REFERENCES clients (id)"
+                ))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["partition", "unpartition"])
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        parser.exit(1, f"Partitioning needs PostgreSQL, not {engine.dialect.name}\n")
+    if args.action == "partition":
+        partition()
+    else:
+        unpartition()
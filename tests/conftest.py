@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite database before anything imports
+# app.database. Tests that need PostgreSQL read TEST_POSTGRES_URL instead.
+_database_dir = tempfile.mkdtemp(prefix="ifrs9pro-tests-")
+os.environ.pop("AZURE_POSTGRESQL_CONNECTIONSTRING", None)
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{_database_dir}/test.db?check_same_thread=false"
+os.environ["DB_ASYNC_ENABLED"] = "false"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema, dropped again after the test."""
+    import app.models  # noqa: F401  (registers the tables)
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="session")
+def migrated_postgres():
+    """
+    Engine on the TEST_POSTGRES_URL database, upgraded to the latest alembic
+    revision. Tests using it are skipped when the variable isn't set.
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(root, "alembic"))
+
+    # alembic/env.py connects to the app's configured database
+    sqlite_url = os.environ["SQLALCHEMY_DATABASE_URL"]
+    os.environ["SQLALCHEMY_DATABASE_URL"] = url
+    try:
+        command.upgrade(config, "head")
+    finally:
+        os.environ["SQLALCHEMY_DATABASE_URL"] = sqlite_url
+
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def postgres_db(migrated_postgres):
+    """A session on the migrated PostgreSQL database, rolled back after the test."""
+    from sqlalchemy.orm import Session
+
+    connection = migrated_postgres.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.utils import is_admin
+from app.models import AccessRequest, Feedback, Help, User
+from app.routes import admin
+from app.utils.streaming_export import stream_rows
+
+
+@pytest.fixture
+def admin_user(db):
+    user = User(email="admin@example.com", role="admin", is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def client(admin_user):
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.dependency_overrides[is_admin] = lambda: admin_user
+    with TestClient(app) as client:
+        yield client
+
+
+def add_users(db, count):
+    db.add_all(User(email=f"user{i}@example.com", role="user", is_active=True) for i in range(count))
+    db.commit()
+    return [user_id for user_id, in db.query(User.id).order_by(User.id)]
+
+
+def test_users_without_limit_returns_everyone(client, db):
+    ids = add_users(db, 150)
+
+    response = client.get("/admin/users")
+
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == ids
+    assert response.headers["X-Total-Count"] == str(len(ids))
+
+
+def test_users_pages_with_skip_and_limit(client, db):
+    ids = add_users(db, 150)
+
+    response = client.get("/admin/users", params={"skip": 100, "limit": 20})
+
+    assert [user["id"] for user in response.json()] == ids[100:120]
+    assert response.headers["X-Total-Count"] == str(len(ids))
+
+
+@pytest.mark.parametrize("path", ["/admin/requests", "/admin/users", "/admin/feedback", "/admin/help"])
+@pytest.mark.parametrize("limit", [0, 1001])
+def test_limit_out_of_range_is_rejected(client, path, limit):
+    assert client.get(path, params={"limit": limit}).status_code == 422
+
+
+def test_access_requests_lists_verified_requests_only(client, db):
+    db.add_all(
+        AccessRequest(email=f"request{i}@example.com", is_email_verified=i % 2 == 0)
+        for i in range(10)
+    )
+    db.commit()
+
+    everyone = client.get("/admin/requests")
+    page = client.get("/admin/requests", params={"limit": 2})
+
+    assert len(everyone.json()) == 5
+    assert everyone.headers["X-Total-Count"] == "5"
+    assert len(page.json()) == 2
+
+
+@pytest.mark.parametrize("model, path", [(Feedback, "/admin/feedback"), (Help, "/admin/help")])
+def test_feedback_and_help_without_limit_return_every_entry(client, db, admin_user, model, path):
+    db.add_all(model(description=f"Entry number {i}", user_id=admin_user.id) for i in range(120))
+    db.commit()
+
+    everyone = client.get(path)
+    page = client.get(path, params={"skip": 110, "limit": 50})
+
+    assert len(everyone.json()) == 120
+    assert everyone.headers["X-Total-Count"] == "120"
+    assert len(page.json()) == 10
+
+
+def test_user_export_csv_includes_every_user(client, db):
+    # More users than one streamed batch
+    ids = add_users(db, 2500)
+
+    response = client.get("/admin/users/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"].endswith(".csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["ID"]) for row in rows] == ids
+    assert rows[1]["Email"] == "user0@example.com"
+
+
+def test_user_export_ndjson_has_one_object_per_user(client, db):
+    ids = add_users(db, 30)
+
+    response = client.get("/admin/users/export", params={"format": "ndjson"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["ID"] for row in rows] == ids
+    assert rows[0]["Role"] == "admin"
+
+
+def test_stream_rows_yields_a_chunk_per_batch():
+    columns = [("n", lambda row: row), ("square", lambda row: row * row)]
+
+    chunks = list(stream_rows(range(5), columns, "csv", batch_size=2))
+
+    assert len(chunks) == 3
+    assert chunks[0].splitlines() == ["n,square", "0,0", "1,1"]
+    assert "".join(chunks).splitlines()[-1] == "4,16"
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from app.database import Base
+from app.models import Portfolio, User
+from benchmark import INDEX_CHECKS, _plan_indexes
+
+
+def declared_indexes():
+    """The composite and partial indexes declared in the models' __table_args__."""
+    import app.models  # noqa: F401  (registers the tables)
+
+    return [
+        (table.name, index)
+        for table in Base.metadata.sorted_tables
+        for index in sorted(table.indexes, key=lambda index: index.name)
+        # Leave out the ones generated by Column(index=True)
+        if not (len(index.columns) == 1 and next(iter(index.columns)).index)
+    ]
+
+
+@pytest.mark.parametrize(
+    "table, index", declared_indexes(), ids=[index.name for _, index in declared_indexes()]
+)
+def test_migrations_create_declared_index(migrated_postgres, table, index):
+    migrated = {found["name"]: found for found in inspect(migrated_postgres).get_indexes(table)}
+
+    assert index.name in migrated
+    assert migrated[index.name]["column_names"] == [column.name for column in index.columns]
+    # Partial indexes keep their WHERE clause
+    assert bool(migrated[index.name].get("dialect_options", {}).get("postgresql_where")) == (
+        index.dialect_options["postgresql"]["where"] is not None
+    )
+
+
+PORTFOLIOS = 50
+LOANS_PER_PORTFOLIO = 2000
+RESULTS_PER_TYPE = 100
+
+
+@pytest.fixture
+def seeded_postgres(postgres_db):
+    """
+    Enough rows in the hot query tables, analyzed, that the planner prefers
+    the composite indexes to sequential scans. Returns a portfolio id.
+    """
+    user = User(email="indexes@example.com", role="analyst", is_active=True)
+    postgres_db.add(user)
+    postgres_db.flush()
+    portfolios = [Portfolio(user_id=user.id, name=f"Portfolio {i}") for i in range(PORTFOLIOS)]
+    postgres_db.add_all(portfolios)
+    postgres_db.flush()
+
+    params = {"user_id": user.id, "loans": LOANS_PER_PORTFOLIO, "results": RESULTS_PER_TYPE}
+    seeded = "FROM portfolios p CROSS JOIN generate_series(1, {}) g WHERE p.user_id = :user_id ORDER BY p.id, g"
+    for statement in [
+        "INSERT INTO clients (portfolio_id, employee_id) SELECT p.id, 'E' || g " + seeded.format(":loans"),
+        "INSERT INTO loans (portfolio_id, loan_no, employee_id, loan_amount, ndia) "
+        "SELECT p.id, 'L' || g, 'E' || g, 1000, g % 365 " + seeded.format(":loans"),
+        "INSERT INTO securities (client_id, collateral_value) "
+        "SELECT c.id, 500 FROM clients c JOIN portfolios p ON p.id = c.portfolio_id WHERE p.user_id = :user_id",
+        "INSERT INTO quality_issues (portfolio_id, issue_type, description, affected_records, severity, status, created_at) "
+        "SELECT p.id, 'missing_dob', 'Missing date of birth', '[]', "
+        "CASE WHEN g % 3 = 0 THEN 'high' ELSE 'medium' END, "
+        "CASE WHEN g % 10 = 0 THEN 'open' ELSE 'approved' END, "
+        "timestamp '2025-01-01' + g * interval '1 minute' " + seeded.format(":results"),
+        "INSERT INTO staging_results (portfolio_id, staging_type, config, result_summary, created_at) "
+        "SELECT p.id, t.type, '{}', '{}', timestamptz '2025-01-01' + g * interval '1 day' "
+        "FROM portfolios p CROSS JOIN (VALUES ('ecl'), ('local_impairment')) t(type) "
+        "CROSS JOIN generate_series(1, :results) g WHERE p.user_id = :user_id ORDER BY p.id, t.type, g",
+        "INSERT INTO calculation_results (portfolio_id, calculation_type, config, result_summary, "
+        "total_provision, provision_percentage, reporting_date, created_at) "
+        "SELECT p.id, t.type, '{}', '{}', 100, 1, date '2025-01-01' + g, timestamptz '2025-01-01' + g * interval '1 day' "
+        "FROM portfolios p CROSS JOIN (VALUES ('ecl'), ('local_impairment')) t(type) "
+        "CROSS JOIN generate_series(1, :results) g WHERE p.user_id = :user_id ORDER BY p.id, t.type, g",
+        "INSERT INTO reports (portfolio_id, report_type, report_date, report_name, report_data, created_at, created_by) "
+        "SELECT p.id, 'ecl_summary', date '2025-01-01' + g, 'Report ' || g, '{}', "
+        "timestamptz '2025-01-01' + g * interval '1 day', :user_id " + seeded.format(":results"),
+    ]:
+        postgres_db.execute(text(statement), params)
+    for table in ("clients", "loans", "securities", "quality_issues", "staging_results", "calculation_results", "reports"):
+        postgres_db.execute(text(f"ANALYZE {table}"))
+    return portfolios[PORTFOLIOS // 2].id
+
+
+@pytest.mark.parametrize(
+    "sql, expected", [(sql, expected) for _, sql, expected in INDEX_CHECKS],
+    ids=[description for description, _, _ in INDEX_CHECKS],
+)
+def test_hot_query_uses_composite_index(postgres_db, seeded_postgres, sql, expected):
+    plan = postgres_db.execute(
+        text(f"EXPLAIN (FORMAT JSON) {sql}"), {"portfolio_id": seeded_postgres}
+    ).scalar()[0]["Plan"]
+
+    assert expected in _plan_indexes(plan)
@@ -0,0 +1,95 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.models import CalculationResult, Portfolio, User
+from app.utils.report_generators import generate_journal_report
+
+PORTFOLIOS = 200
+RUNS_PER_TYPE = 3
+
+
+@pytest.fixture
+def portfolios(postgres_db):
+    """
+    Portfolios with journal accounts and several ECL and local impairment
+    runs each, plus one without accounts that the journal leaves out.
+    """
+    user = User(email="journal@example.com", role="analyst", is_active=True)
+    postgres_db.add(user)
+    postgres_db.flush()
+
+    portfolios = [
+        Portfolio(
+            user_id=user.id,
+            name=f"Portfolio {i}",
+            ecl_impairment_account="4100",
+            loan_assets="1200",
+            credit_risk_reserve="3300",
+        )
+        for i in range(PORTFOLIOS)
+    ]
+    postgres_db.add_all(portfolios)
+    postgres_db.add(Portfolio(user_id=user.id, name="No accounts"))
+    postgres_db.flush()
+
+    # now() is fixed for the transaction, so give each run its own time
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for portfolio in portfolios:
+        for run in range(RUNS_PER_TYPE):
+            created_at = start + timedelta(days=run)
+            postgres_db.add_all([
+                CalculationResult(
+                    portfolio_id=portfolio.id,
+                    calculation_type="ecl",
+                    config={},
+                    result_summary={"Stage 1": {"provision_amount": 100 * (run + 1)}},
+                    total_provision=100 * (run + 1),
+                    provision_percentage=1,
+                    reporting_date=created_at.date(),
+                    created_at=created_at,
+                ),
+                CalculationResult(
+                    portfolio_id=portfolio.id,
+                    calculation_type="local_impairment",
+                    config={},
+                    result_summary={"Current": {"provision_amount": 150 * (run + 1)}},
+                    total_provision=150 * (run + 1),
+                    provision_percentage=1,
+                    reporting_date=created_at.date(),
+                    created_at=created_at,
+                ),
+            ])
+    postgres_db.flush()
+    return portfolios
+
+
+def test_journal_report_takes_two_queries_for_200_portfolios(postgres_db, portfolios):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    connection = postgres_db.connection()
+    event.listen(connection, "before_cursor_execute", record)
+    try:
+        report = generate_journal_report(postgres_db, [], date.today())
+    finally:
+        event.remove(connection, "before_cursor_execute", record)
+
+    # The portfolios, then the latest result of each type for all of them
+    assert len(statements) == 2
+    assert len(report["portfolios"]) == PORTFOLIOS + 1
+
+
+def test_journal_report_uses_each_portfolios_latest_results(postgres_db, portfolios):
+    report = generate_journal_report(postgres_db, [], date.today())
+
+    rows = {row["portfolio_id"]: row for row in report["portfolios"]}
+    assert set(rows) == {portfolio.id for portfolio in portfolios} | {None}
+    for portfolio in portfolios:
+        assert rows[portfolio.id]["total_ecl"] == 100 * RUNS_PER_TYPE
+        assert rows[portfolio.id]["total_local_impairment"] == 150 * RUNS_PER_TYPE
+        assert rows[portfolio.id]["risk_reserve"] == 50 * RUNS_PER_TYPE
+    assert rows[None]["total_ecl"] == 100 * RUNS_PER_TYPE * PORTFOLIOS
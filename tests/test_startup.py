@@ -0,0 +1,39 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from app.config import settings
+from benchmark import STARTUP_DEFERRED_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MAIN = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"elapsed_ms": elapsed_ms, "modules": sorted(sys.modules)}))
+"""
+
+
+def import_main():
+    """Import main in a fresh interpreter; its import time and loaded modules."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_MAIN], capture_output=True, text=True, cwd=ROOT, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_main_leaves_heavy_packages_unloaded():
+    modules = set(import_main()["modules"])
+
+    assert [module for module in STARTUP_DEFERRED_MODULES if module in modules] == []
+
+
+def test_import_main_is_within_budget():
+    # The first run warms the bytecode cache
+    runs = [import_main()["elapsed_ms"] for _ in range(4)][1:]
+
+    assert statistics.median(runs) <= settings.STARTUP_IMPORT_BUDGET_MS